@@ -1,26 +1,43 @@
-from services.database import Base, engine
+import multiprocessing
+from services.database import engine
+from services.migrations import migrate
 from ui.main_window import MainWindow
-from business.budgets import Budget
+from business.budgets import Budget, BudgetManager
 from business.recurring import RecurringTransaction, RecurringManager
+from services.scheduler import RecurringScheduler
+from services.backup import BackupScheduler
 
 def setup_database():
-    Base.metadata.create_all(engine)
+    migrate(engine)
     print("Database setup complete!")
 
-def process_recurring_transactions():
-    """Process any due recurring transactions at startup"""
+def close_budget_periods():
+    """Snapshot budget periods that finished since the last run"""
     try:
-        recurring_manager = RecurringManager()
-        processed = recurring_manager.process_due_recurring()
-        if processed > 0:
-            print(f"Processed {processed} recurring transactions")
+        closed = BudgetManager().close_finished_periods()
+        if closed > 0:
+            print(f"Closed {closed} budget periods")
     except Exception as e:
-        print(f"Error processing recurring transactions: {e}")
+        print(f"Error closing budget periods: {e}")
 
 if __name__ == "__main__":
+    # Statement ingest and rendering spawn worker processes; in the frozen
+    # build each worker re-runs this file and must stop here
+    multiprocessing.freeze_support()
     setup_database()
-    process_recurring_transactions()
+    close_budget_periods()
+
+    # Recurring items are posted in the background; the window shows immediately
+    scheduler = RecurringScheduler()
+    scheduler.start()
+    # Daily compressed backups, also off the UI thread
+    backups = BackupScheduler()
+    backups.start()
 
     # Start GUI
-    app = MainWindow()
-    app.run()
+    app = MainWindow(scheduler=scheduler)
+    try:
+        app.run()
+    finally:
+        scheduler.stop()
+        backups.stop()
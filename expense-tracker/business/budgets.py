@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index, UniqueConstraint, event, func, case, and_, or_, insert
 from sqlalchemy.orm import relationship
 from services.database import Base, SessionLocal, Transaction
-from datetime import datetime, timedelta
+from utils.helpers import parse_date
+from datetime import datetime, timedelta, date
 from collections import defaultdict
 
 class Budget(Base):
@@ -13,9 +14,141 @@ class Budget(Base):
     period = Column(String, default="monthly")  # monthly, weekly, yearly
     start_date = Column(String, nullable=False)
 
+class BudgetCounter(Base):
+    """Running expense total for one budget in one period"""
+    __tablename__ = "budget_counters"
+
+    budget_id = Column(Integer, primary_key=True)
+    period_start = Column(String, primary_key=True)  # YYYY-MM-DD
+    spent = Column(Float, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+class BudgetPeriod(Base):
+    """Closed budget period: what was budgeted and what was actually spent"""
+    __tablename__ = "budget_periods"
+    __table_args__ = (
+        UniqueConstraint("budget_id", "period_start", name="uq_budget_periods_budget_start"),
+        Index("ix_budget_periods_category_start", "category", "period_start"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    budget_id = Column(Integer, nullable=False)
+    category = Column(String, nullable=False)
+    period = Column(String, nullable=False)
+    period_start = Column(String, nullable=False)  # YYYY-MM-DD
+    period_end = Column(String, nullable=False)  # inclusive
+    budget_amount = Column(Float, nullable=False)
+    actual_spent = Column(Float, nullable=False)
+    variance = Column(Float, nullable=False)  # budget_amount - actual_spent
+    txn_count = Column(Integer, nullable=False)
+
+def period_start(period, day):
+    """First day of the budget period containing ``day``"""
+    if period == "weekly":
+        return day - timedelta(days=day.weekday())
+    elif period == "monthly":
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+def next_period_start(period, start):
+    """First day of the budget period following the one starting at ``start``"""
+    if period == "weekly":
+        return start + timedelta(weeks=1)
+    elif period == "monthly":
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return date(start.year + 1, 1, 1)
+
+def period_start_sql(period, day):
+    """SQL expression for the first day of the budget period containing ``day``"""
+    return case(
+        (period == "weekly", func.date(day, "-6 days", "weekday 1")),
+        (period == "monthly", func.date(day, "start of month")),
+        else_=func.date(day, "start of year")
+    )
+
+# Same rule as period_start_sql, for use inside trigger bodies
+_PERIOD_START = ("CASE {period} WHEN 'weekly' THEN date({day}, '-6 days', 'weekday 1') "
+                 "WHEN 'monthly' THEN date({day}, 'start of month') "
+                 "ELSE date({day}, 'start of year') END")
+
+# -------------------
+# Counter maintenance
+# -------------------
+_ADD_EXPENSE = f"""
+    INSERT INTO budget_counters (budget_id, period_start, spent, count)
+    SELECT b.id, {_PERIOD_START.format(period="b.period", day="NEW.txn_date")}, NEW.amount, 1
+    FROM budgets b
+    WHERE b.category = NEW.category AND NEW.type = 'expense' AND NEW.txn_date IS NOT NULL
+    ON CONFLICT (budget_id, period_start)
+    DO UPDATE SET spent = spent + excluded.spent, count = count + 1;
+"""
+
+_REMOVE_EXPENSE = f"""
+    UPDATE budget_counters SET spent = spent - OLD.amount, count = count - 1
+    WHERE OLD.type = 'expense' AND OLD.txn_date IS NOT NULL
+      AND period_start = (
+          SELECT {_PERIOD_START.format(period="b.period", day="OLD.txn_date")}
+          FROM budgets b
+          WHERE b.id = budget_counters.budget_id AND b.category = OLD.category
+      );
+    DELETE FROM budget_counters WHERE count <= 0;
+"""
+
+COUNTER_TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_budget_counters_insert
+    AFTER INSERT ON transactions
+    BEGIN {_ADD_EXPENSE} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_budget_counters_delete
+    AFTER DELETE ON transactions
+    BEGIN {_REMOVE_EXPENSE} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_budget_counters_update
+    AFTER UPDATE OF txn_date, amount, type, category ON transactions
+    BEGIN {_REMOVE_EXPENSE} {_ADD_EXPENSE} END
+    """,
+)
+
+_LEDGER_COUNTERS = f"""
+    SELECT b.id, {_PERIOD_START.format(period="b.period", day="t.txn_date")} AS period_start,
+           SUM(t.amount), COUNT(*)
+    FROM budgets b
+    JOIN transactions t ON t.category = b.category
+    WHERE t.type = 'expense' AND t.txn_date IS NOT NULL {{budget_filter}}
+    GROUP BY 1, 2
+"""
+
+def install_counter_triggers(conn):
+    """Create the budget_counters triggers on a connection (idempotent)"""
+    for ddl in COUNTER_TRIGGERS:
+        conn.exec_driver_sql(ddl)
+
+@event.listens_for(Transaction.__table__, "after_create")
+def _create_counter_triggers(target, connection, **kw):
+    install_counter_triggers(connection)
+
+def rebuild_budget_counters(conn, budget_id=None):
+    """Recompute running counters from the ledger for one budget (or all)"""
+    budget_filter = "" if budget_id is None else "AND b.id = ?"
+    params = () if budget_id is None else (budget_id,)
+
+    if budget_id is None:
+        conn.exec_driver_sql("DELETE FROM budget_counters")
+    else:
+        conn.exec_driver_sql("DELETE FROM budget_counters WHERE budget_id = ?", params)
+
+    conn.exec_driver_sql(
+        "INSERT INTO budget_counters (budget_id, period_start, spent, count) "
+        + _LEDGER_COUNTERS.format(budget_filter=budget_filter),
+        params
+    )
+
 class BudgetManager:
-    def __init__(self):
-        self.db = SessionLocal()
+    def __init__(self, db=None):
+        self.db = db or SessionLocal()
     
     def create_budget(self, category, amount, period="monthly"):
         """Create a new budget for a category"""
@@ -26,6 +159,7 @@ class BudgetManager:
                 existing.amount = amount
                 existing.period = period
                 existing.start_date = datetime.now().strftime("%Y-%m-%d")
+                budget = existing
             else:
                 budget = Budget(
                     category=category,
@@ -35,9 +169,13 @@ class BudgetManager:
                 )
                 self.db.add(budget)
             
+            # Counters depend on the period, so recount this budget's history
+            self.db.flush()
+            rebuild_budget_counters(self.db.connection(), budget.id)
             self.db.commit()
             return True
         except Exception as e:
+            self.db.rollback()
             print(f"Error creating budget: {e}")
             return False
     
@@ -45,64 +183,63 @@ class BudgetManager:
         """Get all budgets"""
         return self.db.query(Budget).all()
     
-    def get_budget_status(self, category, period="monthly"):
-        """Get current spending vs budget for a category"""
-        try:
-            budget = self.db.query(Budget).filter(Budget.category == category).first()
-            if not budget:
-                return None
-            
-            # Calculate date range based on period
-            today = datetime.now()
-            if period == "monthly":
-                start_date = today.replace(day=1)
-            elif period == "weekly":
-                start_date = today - timedelta(days=today.weekday())
-            else:  # yearly
-                start_date = today.replace(month=1, day=1)
-            
-            start_date_str = start_date.strftime("%Y-%m-%d")
-            
-            # Get total spending in this period for this category
-            spent = self.db.query(Transaction).filter(
-                Transaction.category == category,
-                Transaction.type == "expense",
-                Transaction.date >= start_date_str
-            ).all()
-            
-            total_spent = sum(t.amount for t in spent)
-            
-            return {
+    def _query_budget_status(self, category=None, today=None):
+        """Read each budget's counter for its current period in one query.
+
+        Counters are keyed by period start, so a new week, month or year
+        simply starts reading a fresh (empty) counter.
+        """
+        today = (today or datetime.now()).strftime("%Y-%m-%d")
+        spent = func.coalesce(BudgetCounter.spent, 0)
+
+        query = self.db.query(Budget, spent).outerjoin(BudgetCounter, and_(
+            BudgetCounter.budget_id == Budget.id,
+            BudgetCounter.period_start == period_start_sql(Budget.period, today)
+        ))
+        if category is not None:
+            query = query.filter(Budget.category == category)
+
+        status_list = []
+        for budget, total_spent in query.order_by(Budget.id).all():
+            status_list.append({
+                'budget_id': budget.id,
+                'category': budget.category,
+                'period': budget.period,
                 'budget_amount': budget.amount,
                 'spent_amount': total_spent,
                 'remaining': budget.amount - total_spent,
                 'percentage': (total_spent / budget.amount * 100) if budget.amount > 0 else 0,
                 'is_over_budget': total_spent > budget.amount
-            }
-            
+            })
+        return status_list
+
+    def get_budget_status(self, category, period=None, today=None):
+        """Get current spending vs budget for a category.
+
+        ``period`` is accepted for backwards compatibility; counters always
+        follow the budget's configured period.
+        """
+        try:
+            status_list = self._query_budget_status(category=category, today=today)
+            return status_list[0] if status_list else None
         except Exception as e:
             print(f"Error getting budget status: {e}")
             return None
     
-    def get_all_budget_status(self):
+    def get_all_budget_status(self, today=None):
         """Get budget status for all categories"""
-        budgets = self.get_all_budgets()
-        status_list = []
-        
-        for budget in budgets:
-            status = self.get_budget_status(budget.category, budget.period)
-            if status:
-                status['category'] = budget.category
-                status['period'] = budget.period
-                status_list.append(status)
-        
-        return status_list
+        try:
+            return self._query_budget_status(today=today)
+        except Exception as e:
+            print(f"Error getting budget status: {e}")
+            return []
     
     def delete_budget(self, category):
         """Delete a budget"""
         try:
             budget = self.db.query(Budget).filter(Budget.category == category).first()
             if budget:
+                self.db.query(BudgetCounter).filter(BudgetCounter.budget_id == budget.id).delete()
                 self.db.delete(budget)
                 self.db.commit()
                 return True
@@ -111,23 +248,129 @@ class BudgetManager:
             print(f"Error deleting budget: {e}")
             return False
     
-    def get_budget_alerts(self):
+    def reconcile_counters(self, repair=True):
+        """Verify running counters against the ledger.
+
+        Returns a list of (budget_id, period_start, counter_spent, ledger_spent)
+        mismatches; when ``repair`` is set the counters are rebuilt.
+        """
+        conn = self.db.connection()
+        expected = {(row[0], row[1]): (row[2], row[3]) for row in
+                    conn.exec_driver_sql(_LEDGER_COUNTERS.format(budget_filter="")).fetchall()}
+        actual = {(c.budget_id, c.period_start): (c.spent, c.count)
+                  for c in self.db.query(BudgetCounter).all()}
+
+        mismatches = []
+        for key in sorted(set(expected) | set(actual)):
+            ledger_spent, ledger_count = expected.get(key, (0, 0))
+            counter_spent, counter_count = actual.get(key, (0, 0))
+            if ledger_count != counter_count or abs(ledger_spent - counter_spent) > 0.005:
+                mismatches.append((key[0], key[1], counter_spent, ledger_spent))
+
+        if mismatches and repair:
+            rebuild_budget_counters(conn)
+            self.db.commit()
+
+        return mismatches
+
+    def close_finished_periods(self, today=None):
+        """Snapshot every finished budget period that is not yet in budget_periods.
+
+        The first run backfills all history; later runs only append the
+        periods that ended since. Spend comes from the running counters,
+        so the ledger itself is never scanned. Returns the rows written.
+        """
+        today = (today or datetime.now()).date()
+
+        last_closed = self.db.query(
+            BudgetPeriod.budget_id.label("budget_id"),
+            func.max(BudgetPeriod.period_end).label("last_end")
+        ).group_by(BudgetPeriod.budget_id).subquery()
+
+        pending = defaultdict(dict)
+        for counter in self.db.query(BudgetCounter).outerjoin(
+                last_closed, last_closed.c.budget_id == BudgetCounter.budget_id).filter(or_(
+                last_closed.c.last_end.is_(None),
+                BudgetCounter.period_start > last_closed.c.last_end)):
+            pending[counter.budget_id][counter.period_start] = counter
+
+        last_ends = {budget_id: last_end for budget_id, last_end in
+                     self.db.query(last_closed.c.budget_id, last_closed.c.last_end)}
+
+        rows = []
+        for budget in self.get_all_budgets():
+            counters = pending.get(budget.id, {})
+            if budget.id in last_ends:
+                last_end = parse_date(last_ends[budget.id])
+                start = period_start(budget.period, last_end + timedelta(days=1))
+                if start <= last_end:
+                    start = next_period_start(budget.period, start)
+            elif counters:
+                start = parse_date(min(counters))
+            else:
+                start = period_start(budget.period, parse_date(budget.start_date) or today)
+
+            current = period_start(budget.period, today)
+            while start < current:
+                following = next_period_start(budget.period, start)
+                counter = counters.get(start.isoformat())
+                spent = counter.spent if counter else 0
+                rows.append({
+                    'budget_id': budget.id,
+                    'category': budget.category,
+                    'period': budget.period or "yearly",
+                    'period_start': start.isoformat(),
+                    'period_end': (following - timedelta(days=1)).isoformat(),
+                    'budget_amount': budget.amount,
+                    'actual_spent': spent,
+                    'variance': budget.amount - spent,
+                    'txn_count': counter.count if counter else 0
+                })
+                start = following
+
+        if rows:
+            self.db.execute(insert(BudgetPeriod), rows)
+        self.db.commit()
+        return len(rows)
+
+    def get_budget_history(self, category, start_date=None, end_date=None):
+        """Get closed periods for a category, oldest first"""
+        query = self.db.query(BudgetPeriod).filter(BudgetPeriod.category == category)
+        if start_date:
+            query = query.filter(BudgetPeriod.period_start >= str(start_date))
+        if end_date:
+            query = query.filter(BudgetPeriod.period_start <= str(end_date))
+        return query.order_by(BudgetPeriod.period_start).all()
+
+    def _build_alert(self, status):
+        """Turn a budget status into an alert dict (None when on track)"""
+        if status['is_over_budget']:
+            return {
+                'type': 'over_budget',
+                'category': status['category'],
+                'message': f"Over budget in {status['category']}: ₹{status['spent_amount']:.0f} / ₹{status['budget_amount']:.0f}"
+            }
+        elif status['percentage'] >= 80:  # Warning at 80%
+            return {
+                'type': 'warning',
+                'category': status['category'],
+                'message': f"Near budget limit in {status['category']}: {status['percentage']:.0f}% used"
+            }
+        return None
+
+    def get_budget_alerts(self, today=None):
         """Get alerts for budgets that are over or near limit"""
         alerts = []
-        status_list = self.get_all_budget_status()
+        status_list = self.get_all_budget_status(today=today)
         
         for status in status_list:
-            if status['is_over_budget']:
-                alerts.append({
-                    'type': 'over_budget',
-                    'category': status['category'],
-                    'message': f"Over budget in {status['category']}: ₹{status['spent_amount']:.0f} / ₹{status['budget_amount']:.0f}"
-                })
-            elif status['percentage'] >= 80:  # Warning at 80%
-                alerts.append({
-                    'type': 'warning',
-                    'category': status['category'],
-                    'message': f"Near budget limit in {status['category']}: {status['percentage']:.0f}% used"
-                })
+            alert = self._build_alert(status)
+            if alert:
+                alerts.append(alert)
         
-        return alerts
\ No newline at end of file
+        return alerts
+
+    def get_category_alert(self, category, today=None):
+        """Get the alert for a single category, if any (one counter lookup)"""
+        status = self.get_budget_status(category, today=today)
+        return self._build_alert(status) if status else None
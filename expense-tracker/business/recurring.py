@@ -1,10 +1,16 @@
-from sqlalchemy import Column, Integer, String, Float, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, Index
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from services.database import Base, SessionLocal, Transaction
+from utils.helpers import parse_date, content_hash
+from config import RECURRING_HORIZON_DAYS
 from datetime import datetime, timedelta
-import json
+import numpy as np
 
 class RecurringTransaction(Base):
     __tablename__ = "recurring_transactions"
+    __table_args__ = (
+        Index("ix_recurring_transactions_active_next_date", "is_active", "next_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -14,13 +20,154 @@ class RecurringTransaction(Base):
     notes = Column(String, nullable=True)
     frequency = Column(String, nullable=False)  # daily, weekly, monthly, yearly
     next_date = Column(String, nullable=False)
-    is_active = Column(String, default="true")
+    is_active = Column(Boolean, nullable=False, default=True)
+    # RRULE-style options; rows created before these existed use the defaults
+    start_date = Column(String, nullable=True)  # rule anchor for intervals and counts
+    interval = Column(Integer, default=1)  # every N days/weeks/months/years
+    weekday = Column(Integer, nullable=True)  # 0=Monday .. 6=Sunday, used with week_of_month
+    week_of_month = Column(Integer, nullable=True)  # 1-5, or -1 for the last one
+    month_end = Column(Boolean, default=False)  # always the last day of the month
+    end_date = Column(String, nullable=True)  # no occurrences after this date
+    max_occurrences = Column(Integer, nullable=True)  # stop after this many
+
+class RecurringOccurrence(Base):
+    """Precomputed occurrence of an active recurring transaction within the horizon"""
+    __tablename__ = "recurring_occurrences"
+
+    recurring_id = Column(Integer, primary_key=True)
+    occurrence_date = Column(String, primary_key=True, index=True)  # YYYY-MM-DD
+
+# Span that always contains the next occurrence, per unit of interval
+_LOOKAHEAD_DAYS = {"daily": 1, "weekly": 7, "monthly": 62, "yearly": 397}
+
+# 1970-01-01 (day 0 of datetime64) was a Thursday
+_EPOCH_WEEKDAY = 3
+
+def _clamp_to_month(months, day_offset):
+    """Day ``day_offset`` (0-based) of each month, clamped to the month's last day"""
+    month_days = months.astype("datetime64[D]")
+    month_length = (months + 1).astype("datetime64[D]") - month_days
+    return month_days + np.minimum(day_offset, month_length - np.timedelta64(1, "D"))
+
+def _weekday(days):
+    return (days.astype(np.int64) + _EPOCH_WEEKDAY) % 7
+
+class RecurrenceRule:
+    """RRULE-style schedule evaluated with NumPy datetime64 arrays.
+
+    Supports daily, weekly, monthly and yearly frequencies with an
+    interval, the nth (or last) weekday of the month, month-end, an end
+    date and a maximum count. Monthly and yearly schedules stay anchored
+    to the start day (Jan 31 -> Feb 29 -> Mar 31) instead of drifting.
+    """
+
+    def __init__(self, frequency, start, interval=1, weekday=None, week_of_month=None,
+                 month_end=False, until=None, count=None):
+        self.frequency = frequency
+        self.start = np.datetime64(start, "D")
+        self.interval = max(int(interval or 1), 1)
+        self.weekday = weekday
+        self.week_of_month = week_of_month
+        self.month_end = bool(month_end)
+        self.until = np.datetime64(until, "D") if until else None
+        self.count = count
+
+    @classmethod
+    def from_recurring(cls, recurring):
+        """Build the rule for a RecurringTransaction row"""
+        return cls(
+            recurring.frequency,
+            parse_date(recurring.start_date or recurring.next_date),
+            interval=recurring.interval,
+            weekday=recurring.weekday,
+            week_of_month=recurring.week_of_month,
+            month_end=recurring.month_end,
+            until=parse_date(recurring.end_date),
+            count=recurring.max_occurrences
+        )
+
+    @property
+    def is_finite(self):
+        return self.until is not None or self.count is not None
+
+    def _days_in_months(self, months):
+        """Pick the occurrence day within each month"""
+        first = months.astype("datetime64[D]")
+        following = (months + 1).astype("datetime64[D]")
+
+        if self.month_end:
+            return following - np.timedelta64(1, "D")
+
+        if self.weekday is not None and self.week_of_month:
+            if self.week_of_month > 0:
+                offset = (self.weekday - _weekday(first)) % 7 + (self.week_of_month - 1) * 7
+                days = first + offset.astype("timedelta64[D]")
+                return days[days < following]  # e.g. no 5th Monday this month
+            last = following - np.timedelta64(1, "D")
+            return last - ((_weekday(last) - self.weekday) % 7).astype("timedelta64[D]")
+
+        first_month = self.start.astype("datetime64[M]")
+        return _clamp_to_month(months, self.start - first_month.astype("datetime64[D]"))
+
+    def occurrences(self, until):
+        """All occurrences from the rule start through ``until`` (inclusive)"""
+        last = np.datetime64(until, "D")
+        if self.until is not None:
+            last = min(last, self.until)
+        if last < self.start:
+            return np.array([], dtype="datetime64[D]")
+
+        if self.frequency == "daily":
+            dates = np.arange(self.start, last + 1, np.timedelta64(self.interval, "D"))
+        elif self.frequency == "weekly":
+            dates = np.arange(self.start, last + 1, np.timedelta64(7 * self.interval, "D"))
+        elif self.frequency in ("monthly", "yearly"):
+            step = self.interval if self.frequency == "monthly" else 12 * self.interval
+            months = np.arange(self.start.astype("datetime64[M]"), last.astype("datetime64[M]") + 1, step)
+            dates = self._days_in_months(months)
+        else:
+            dates = np.array([self.start])
+
+        dates = dates[(dates >= self.start) & (dates <= last)]
+        if self.count is not None:
+            dates = dates[:self.count]
+        return dates
+
+    def next_after(self, day):
+        """First occurrence strictly after ``day`` (None when the schedule has ended)"""
+        day = np.datetime64(day, "D")
+        span = _LOOKAHEAD_DAYS.get(self.frequency, 0) * self.interval
+        dates = self.occurrences(day + np.timedelta64(span, "D"))
+        following = dates[dates > day]
+        return following[0].astype(object) if len(following) else None
+
+# Called with no arguments after a recurring item is created, edited or deleted
+_CHANGE_HOOKS = []
+
+def register_change_hook(callback):
+    """Call ``callback()`` after every change to a recurring item, e.g. to wake the scheduler"""
+    _CHANGE_HOOKS.append(callback)
+    return callback
+
+def unregister_change_hook(callback):
+    """Stop calling a hook added with register_change_hook"""
+    if callback in _CHANGE_HOOKS:
+        _CHANGE_HOOKS.remove(callback)
+
+def _notify_change():
+    for hook in list(_CHANGE_HOOKS):
+        try:
+            hook()
+        except Exception as e:
+            print(f"Error in recurring change hook: {e}")
 
 class RecurringManager:
-    def __init__(self):
-        self.db = SessionLocal()
+    def __init__(self, db=None):
+        self.db = db or SessionLocal()
     
-    def create_recurring(self, name, amount, transaction_type, category, notes, frequency, start_date):
+    def create_recurring(self, name, amount, transaction_type, category, notes, frequency, start_date,
+                         interval=1, weekday=None, week_of_month=None, month_end=False,
+                         end_date=None, max_occurrences=None):
         """Create a new recurring transaction"""
         try:
             recurring = RecurringTransaction(
@@ -31,11 +178,27 @@ class RecurringManager:
                 notes=notes,
                 frequency=frequency,
                 next_date=start_date,
-                is_active="true"
+                is_active=True,
+                start_date=start_date,
+                interval=interval,
+                weekday=weekday,
+                week_of_month=week_of_month,
+                month_end=month_end,
+                end_date=end_date,
+                max_occurrences=max_occurrences
             )
             
+            # The first occurrence may differ from start_date (e.g. "last Friday")
+            first = RecurrenceRule.from_recurring(recurring).occurrences(
+                parse_date(start_date) + timedelta(days=_LOOKAHEAD_DAYS.get(frequency, 0) * (interval or 1)))
+            if len(first):
+                recurring.next_date = first[0].astype(object).isoformat()
+            
             self.db.add(recurring)
+            self.db.flush()
+            self.refresh_occurrence_index(recurring_list=[recurring], commit=False)
             self.db.commit()
+            _notify_change()
             return True
         except Exception as e:
             print(f"Error creating recurring transaction: {e}")
@@ -43,76 +206,99 @@ class RecurringManager:
     
     def get_all_recurring(self):
         """Get all recurring transactions"""
-        return self.db.query(RecurringTransaction).filter(RecurringTransaction.is_active == "true").all()
+        return self.db.query(RecurringTransaction).filter(RecurringTransaction.is_active.is_(True)).all()
     
-    def calculate_next_date(self, current_date, frequency):
-        """Calculate next occurrence date based on frequency"""
-        date_obj = datetime.strptime(current_date, "%Y-%m-%d")
-        
-        if frequency == "daily":
-            next_date = date_obj + timedelta(days=1)
-        elif frequency == "weekly":
-            next_date = date_obj + timedelta(weeks=1)
-        elif frequency == "monthly":
-            # Handle month-end dates properly
-            if date_obj.month == 12:
-                next_date = date_obj.replace(year=date_obj.year + 1, month=1)
-            else:
-                try:
-                    next_date = date_obj.replace(month=date_obj.month + 1)
-                except ValueError:
-                    # Handle cases like Jan 31 -> Feb 28
-                    next_date = date_obj.replace(month=date_obj.month + 1, day=28)
-        elif frequency == "yearly":
-            try:
-                next_date = date_obj.replace(year=date_obj.year + 1)
-            except ValueError:
-                # Handle leap year Feb 29
-                next_date = date_obj.replace(year=date_obj.year + 1, day=28)
-        else:
-            return current_date
-        
-        return next_date.strftime("%Y-%m-%d")
+    def get_due_recurring(self, as_of):
+        """Get active recurring transactions due on or before a date, oldest first"""
+        return self.db.query(RecurringTransaction).filter(
+            RecurringTransaction.is_active.is_(True),
+            RecurringTransaction.next_date <= str(as_of)
+        ).order_by(RecurringTransaction.next_date).all()
     
-    def process_due_recurring(self):
-        """Process all recurring transactions that are due"""
-        today = datetime.now().strftime("%Y-%m-%d")
-        recurring_list = self.get_all_recurring()
-        processed_count = 0
+    def process_due_recurring(self, today=None):
+        """Post every missed occurrence of due recurring transactions in one bulk insert.
+
+        Each generated transaction carries its recurring id, and the
+        (recurring_id, txn_date) pair is unique, so a run interrupted
+        after the insert can never post the same occurrence twice.
+        """
+        today = (today or datetime.now()).date()
+        recurring_list = self.get_due_recurring(today)
+        rows = []
+        
+        touched = []
         
         for recurring in recurring_list:
-            if recurring.next_date <= today:
-                # Create the actual transaction
-                transaction = Transaction(
-                    date=recurring.next_date,
-                    amount=recurring.amount,
-                    type=recurring.type,
-                    category=recurring.category,
-                    notes=f"[Recurring: {recurring.name}] {recurring.notes or ''}"
-                )
+            start = parse_date(recurring.next_date)
+            if not start or start > today:
+                continue
                 
-                self.db.add(transaction)
+            rule = RecurrenceRule.from_recurring(recurring)
+            dates = rule.occurrences(today)
+            due = dates[dates >= np.datetime64(start)]
                 
-                # Update next occurrence date
-                recurring.next_date = self.calculate_next_date(recurring.next_date, recurring.frequency)
+            notes = f"[Recurring: {recurring.name}] {recurring.notes or ''}"
+            for occurrence in due.astype(object):
+                rows.append({
+                    'date': occurrence.isoformat(),
+                    'txn_date': occurrence,
+                    'amount': recurring.amount,
+                    'type': recurring.type,
+                    'category': recurring.category,
+                    'notes': notes,
+                    'recurring_id': recurring.id,
+                    'content_hash': content_hash(occurrence, recurring.amount, recurring.type,
+                                                 recurring.category, notes)
+                })
                 
-                processed_count += 1
-        
-        if processed_count > 0:
-            self.db.commit()
+            # Update next occurrence date; finished schedules are deactivated
+            following = rule.next_after(today)
+            if following:
+                recurring.next_date = following.isoformat()
+            elif rule.is_finite:
+                recurring.is_active = False
+            touched.append(recurring)
         
+        processed_count = 0
+        if rows:
+            # RETURNING only yields rows that were actually inserted
+            stmt = sqlite_insert(Transaction.__table__).on_conflict_do_nothing().returning(
+                Transaction.__table__.c.id)
+            processed_count = len(self.db.execute(stmt, rows).all())
+        if touched:
+            self.refresh_occurrence_index(recurring_list=touched, commit=False, today=today)
+        self.db.commit()
+
         return processed_count
     
+    # Fields that change when a schedule's occurrences fall
+    RULE_FIELDS = ("frequency", "start_date", "interval", "weekday", "week_of_month", "month_end",
+                   "end_date", "max_occurrences")
+    
     def update_recurring(self, recurring_id, **kwargs):
-        """Update a recurring transaction"""
+        """Update a recurring transaction; a changed schedule gets its next_date recomputed"""
         try:
             recurring = self.db.query(RecurringTransaction).filter(RecurringTransaction.id == recurring_id).first()
             if recurring:
+                # First date not yet posted under the old schedule
+                pending = parse_date(kwargs.get("next_date") or recurring.next_date)
                 for key, value in kwargs.items():
                     if hasattr(recurring, key):
                         setattr(recurring, key, value)
                 
+                if any(key in kwargs for key in self.RULE_FIELDS) and pending:
+                    rule = RecurrenceRule.from_recurring(recurring)
+                    # A start moved past the pending date is where the schedule resumes
+                    first = max(np.datetime64(pending, "D"), rule.start)
+                    following = rule.next_after(first - np.timedelta64(1, "D"))
+                    if following:
+                        recurring.next_date = following.isoformat()
+                    elif rule.is_finite:
+                        recurring.is_active = False
+                
+                self.refresh_occurrence_index(recurring_list=[recurring], commit=False)
                 self.db.commit()
+                _notify_change()
                 return True
             return False
         except Exception as e:
@@ -124,30 +310,77 @@ class RecurringManager:
         try:
             recurring = self.db.query(RecurringTransaction).filter(RecurringTransaction.id == recurring_id).first()
             if recurring:
-                recurring.is_active = "false"
+                recurring.is_active = False
+                self.db.query(RecurringOccurrence).filter(
+                    RecurringOccurrence.recurring_id == recurring.id).delete()
                 self.db.commit()
+                _notify_change()
                 return True
             return False
         except Exception as e:
             print(f"Error deleting recurring transaction: {e}")
             return False
     
+    @staticmethod
+    def _pending_occurrences(recurring, until):
+        """'YYYY-MM-DD' occurrences of an item from its next_date through ``until``"""
+        start = parse_date(recurring.next_date)
+        if not recurring.is_active or not start:
+            return []
+        dates = RecurrenceRule.from_recurring(recurring).occurrences(until)
+        return dates[dates >= np.datetime64(start)].astype(str).tolist()
+    
+    def refresh_occurrence_index(self, horizon_days=RECURRING_HORIZON_DAYS, recurring_list=None,
+                                 commit=True, today=None):
+        """Recompute precomputed occurrences from each item's next_date through the horizon.
+
+        With no ``recurring_list`` the whole index is rebuilt, which also
+        rolls the horizon forward; run it at startup and once a day.
+        """
+        today = parse_date(today or datetime.now())
+        horizon_end = today + timedelta(days=horizon_days)
+        
+        query = self.db.query(RecurringOccurrence)
+        if recurring_list is None:
+            recurring_list = self.get_all_recurring()
+        else:
+            query = query.filter(RecurringOccurrence.recurring_id.in_([r.id for r in recurring_list]))
+        query.delete(synchronize_session=False)
+        
+        rows = [{'recurring_id': recurring.id, 'occurrence_date': occurrence}
+                for recurring in recurring_list
+                for occurrence in self._pending_occurrences(recurring, horizon_end)]
+        if rows:
+            self.db.execute(RecurringOccurrence.__table__.insert(), rows)
+        if commit:
+            self.db.commit()
+        return len(rows)
+    
     def get_upcoming_recurring(self, days_ahead=30):
-        """Get recurring transactions due in the next N days"""
-        end_date = (datetime.now() + timedelta(days=days_ahead)).strftime("%Y-%m-%d")
-        recurring_list = self.get_all_recurring()
+        """Get every occurrence due in the next N days (overdue ones included)"""
+        end = datetime.now().date() + timedelta(days=days_ahead)
+        end_date = end.isoformat()
         
-        upcoming = []
-        for recurring in recurring_list:
-            if recurring.next_date <= end_date:
-                upcoming.append({
-                    'id': recurring.id,
-                    'name': recurring.name,
-                    'amount': recurring.amount,
-                    'type': recurring.type,
-                    'category': recurring.category,
-                    'next_date': recurring.next_date,
-                    'frequency': recurring.frequency
-                })
+        if days_ahead > RECURRING_HORIZON_DAYS:
+            # Beyond the indexed horizon: expand the rules in memory rather
+            # than rewriting the index on a read
+            rows = sorted(((occurrence, recurring) for recurring in self.get_all_recurring()
+                           for occurrence in self._pending_occurrences(recurring, end)),
+                          key=lambda row: (row[0], row[1].id))
+        else:
+            rows = self.db.query(RecurringOccurrence.occurrence_date, RecurringTransaction).join(
+                RecurringTransaction, RecurringTransaction.id == RecurringOccurrence.recurring_id
+            ).filter(
+                RecurringTransaction.is_active.is_(True),
+                RecurringOccurrence.occurrence_date <= end_date
+            ).order_by(RecurringOccurrence.occurrence_date, RecurringTransaction.id).all()
         
-        return sorted(upcoming, key=lambda x: x['next_date'])
\ No newline at end of file
+        return [{
+            'id': recurring.id,
+            'name': recurring.name,
+            'amount': recurring.amount,
+            'type': recurring.type,
+            'category': recurring.category,
+            'next_date': occurrence_date,
+            'frequency': recurring.frequency
+        } for occurrence_date, recurring in rows]
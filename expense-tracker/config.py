@@ -5,3 +5,72 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # SQLite database path
 DB_PATH = os.path.join(BASE_DIR, "data", "expenses.db")
+
+# SQLite performance profiles applied to every new connection.
+# cache_size is negative to mean KiB rather than pages.
+DB_PROFILES = {
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "mmap_size": 0,
+        "cache_size": -16000,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+    },
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64000,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "fast-import": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "mmap_size": 512 * 1024 * 1024,
+        "cache_size": -256000,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+    },
+}
+
+# Active profile, overridable with EXPENSE_TRACKER_DB_PROFILE
+DB_PROFILE = os.environ.get("EXPENSE_TRACKER_DB_PROFILE", "balanced")
+
+# How many days ahead recurring occurrences are precomputed
+RECURRING_HORIZON_DAYS = 90
+
+# Rows read, validated and committed per batch by the CSV importer
+IMPORT_CHUNK_SIZE = 5000
+
+# Processes parsing statement files in a batch ingest (None = one per CPU)
+INGEST_WORKERS = None
+
+# Rows fetched per keyset page when exporting
+EXPORT_BATCH_SIZE = 5000
+
+# Automatic backups: where they go, how often, and how many are kept
+BACKUP_DIR = os.path.join(BASE_DIR, "data", "backups")
+BACKUP_INTERVAL_HOURS = 24
+BACKUP_KEEP_DAILY = 7
+BACKUP_KEEP_MONTHLY = 12
+
+# Pages copied per step of the online backup; writers can run between steps
+BACKUP_PAGES_PER_STEP = 1024
+
+# Rendered charts kept in memory, and the optional on-disk tier (None to disable)
+RENDER_CACHE_ENTRIES = 32
+RENDER_CACHE_DIR = os.path.join(BASE_DIR, "data", "chart_cache")
+RENDER_CACHE_DISK_ENTRIES = 256
+
+# Timeline chart: most buckets read for one view (picks day/week/month/year)
+# and most points drawn per series after downsampling
+TIMELINE_MAX_BUCKETS = 2000
+TIMELINE_MAX_POINTS = 600
+
+# Headless statement packs: default output directory, PNG/SVG resolution
+# and worker processes (None = one per CPU)
+STATEMENT_DIR = os.path.join(BASE_DIR, "data", "statements")
+STATEMENT_DPI = 100
+STATEMENT_WORKERS = None
@@ -0,0 +1,254 @@
+"""
+Maintenance commands for the expense tracker database.
+
+Usage:
+    python manage.py migrate
+    python manage.py rebuild-aggregates
+    python manage.py reconcile-budgets [--check]
+    python manage.py close-budget-periods
+    python manage.py import-csv FILE [--chunk-size N] [--keep-duplicates]
+    python manage.py ingest FILE [FILE ...] [--workers N] [--keep-duplicates]
+    python manage.py export FILE [--format csv|json|ndjson|parquet|arrow] [--gzip]
+    python manage.py import-columnar FILE
+    python manage.py export-changes FILE [--feed NAME] [--format ndjson|csv] [--gzip]
+    python manage.py prune-changes
+    python manage.py backup [FILE]
+    python manage.py restore FILE [--quick] [--no-safety-backup]
+    python manage.py statements [--ledger DB ...] [--month YYYY-MM ... | --year YYYY] [--format pdf|png|svg]
+                                [--out DIR] [--workers N]
+"""
+
+import argparse
+from config import DB_PATH, IMPORT_CHUNK_SIZE, INGEST_WORKERS, STATEMENT_DIR, STATEMENT_WORKERS
+from services.database import engine
+from services.migrations import migrate
+from services.aggregates import rebuild_monthly_totals, rebuild_daily_totals
+from business.budgets import Budget, BudgetManager
+from business.recurring import RecurringTransaction
+from services.importer import CSVImporter
+from services.ingest import ingest_files
+from services.exporter import TransactionExporter
+from services.columnar import COLUMNAR_FORMATS, export_columnar, import_columnar
+from services.changelog import get_watermark, prune_changes
+from services.database import SessionLocal
+from services.backup import BackupService
+from services.restore import restore_database
+from services.statements import STATEMENT_FORMATS, render_statements
+
+def cmd_migrate(args):
+    """Create missing tables and apply pending migrations"""
+    version = migrate(engine)
+    print(f"Database is at schema version {version}")
+
+def cmd_rebuild_aggregates(args):
+    """Recompute monthly_totals and daily_totals from the transactions table"""
+    migrate(engine)
+    with engine.begin() as conn:
+        rows = rebuild_monthly_totals(conn)
+        days = rebuild_daily_totals(conn)
+    print(f"Rebuilt monthly totals ({rows} rows) and daily totals ({days} rows)")
+
+def cmd_reconcile_budgets(args):
+    """Verify running budget counters against the ledger and repair drift"""
+    migrate(engine)
+    mismatches = BudgetManager().reconcile_counters(repair=not args.check)
+    for budget_id, period_start, counter_spent, ledger_spent in mismatches:
+        print(f"Budget {budget_id} period {period_start}: counter {counter_spent:.2f}, ledger {ledger_spent:.2f}")
+    print(f"{len(mismatches)} mismatched counter(s)" + ("" if args.check or not mismatches else " repaired"))
+
+def cmd_close_budget_periods(args):
+    """Snapshot finished budget periods (backfills history on first run)"""
+    migrate(engine)
+    closed = BudgetManager().close_finished_periods()
+    print(f"Closed {closed} budget period(s)")
+
+def cmd_import_csv(args):
+    """Stream a CSV file into the ledger in committed chunks"""
+    migrate(engine)
+
+    def progress(stats):
+        print(f"\r{stats['fraction']:6.1%}  {stats['imported']:,} imported, {stats['rejected']:,} rejected",
+              end="", flush=True)
+
+    def on_reject(line_number, row, reason):
+        if args.verbose:
+            print(f"\nLine {line_number}: {reason}")
+
+    stats = CSVImporter(chunk_size=args.chunk_size, skip_duplicates=not args.keep_duplicates).import_file(args.file, progress=progress, on_reject=on_reject)
+    print(f"\nImported {stats['imported']} transaction(s), rejected {stats['rejected']}, "
+          f"{'kept' if args.keep_duplicates else 'skipped'} {stats['duplicates']} duplicate(s)")
+
+def cmd_ingest(args):
+    """Parse many statement files in parallel and import them"""
+    migrate(engine)
+
+    def progress(filename, stats):
+        print(f"{filename}: {stats['parser']}, {stats['imported']} imported, {stats['rejected']} rejected, "
+              f"{stats['duplicates']} duplicate(s)")
+
+    def on_reject(filename, line_number, reason):
+        if args.verbose:
+            print(f"{filename} line {line_number}: {reason}")
+
+    results = ingest_files(args.files, workers=args.workers, skip_duplicates=not args.keep_duplicates,
+                           progress=progress, on_reject=on_reject)
+    failed = [filename for filename, stats in results.items() if 'error' in stats]
+    for filename in failed:
+        print(f"{filename}: failed ({results[filename]['error']})")
+    imported = sum(stats.get('imported', 0) for stats in results.values())
+    print(f"Imported {imported} transaction(s) from {len(results) - len(failed)} file(s), {len(failed)} failed")
+
+def cmd_export(args):
+    """Stream every transaction to a CSV, JSON, NDJSON, Parquet or Arrow file"""
+    migrate(engine)
+    exporter = TransactionExporter()
+    compress = True if args.gzip else None
+    if args.format in COLUMNAR_FORMATS:
+        count = export_columnar(args.file, file_format=args.format)
+    elif args.format == "csv":
+        count = exporter.export_csv(args.file, compress=compress)
+    else:
+        count = exporter.export_json(args.file, ndjson=args.format == "ndjson", compress=compress)
+    print(f"Exported {count} transaction(s) to {args.file}")
+
+def cmd_import_columnar(args):
+    """Import a Parquet or Arrow IPC ledger file"""
+    migrate(engine)
+    stats = import_columnar(args.file, skip_duplicates=not args.keep_duplicates)
+    print(f"Imported {stats['imported']} transaction(s), rejected {stats['rejected']}, "
+          f"{'kept' if args.keep_duplicates else 'skipped'} {stats['duplicates']} duplicate(s)")
+
+def cmd_export_changes(args):
+    """Export transactions changed since a feed's watermark (all of them for a new feed), then advance it"""
+    migrate(engine)
+    exporter = TransactionExporter()
+    since = get_watermark(exporter.db, args.feed, default=None)
+    count = exporter.export_changes(args.file, feed=args.feed, file_format=args.format,
+                                    compress=True if args.gzip else None)
+    start = "in full" if since is None else f"after seq {since}"
+    print(f"Exported {count} change(s) {start} to {args.file} "
+          f"(feed '{args.feed}' now at {get_watermark(exporter.db, args.feed)})")
+
+def cmd_prune_changes(args):
+    """Delete change log rows that every export feed has already received"""
+    migrate(engine)
+    print(f"Pruned {prune_changes(SessionLocal())} change log row(s)")
+
+def cmd_backup(args):
+    """Take an online backup (into the backup directory with retention unless FILE is given)"""
+    service = BackupService()
+
+    def progress(remaining, total):
+        print(f"\r{1 - remaining / max(total, 1):6.1%} copied", end="", flush=True)
+
+    if args.file:
+        filename = service.backup_to(args.file, progress=progress)
+    else:
+        filename = service.create_backup(progress=progress)
+    print(f"\nBacked up to {filename}")
+
+def cmd_restore(args):
+    """Validate a backup and restore it over the live database"""
+    if not args.no_safety_backup:
+        print(f"Saved current data to {BackupService().create_backup()}")
+    version = restore_database(args.file, full_check=not args.quick)
+    print(f"Restored {args.file} (schema version {version}, migrated to {migrate(engine)})")
+
+def cmd_statements(args):
+    """Render monthly statement packs (summary tables and charts) without a display"""
+
+    def progress(ledger, month, result):
+        if 'error' in result:
+            print(f"{ledger} {month}: failed ({result['error']})")
+        else:
+            print(f"{ledger} {month}: {', '.join(result['files'])}")
+
+    results = render_statements(args.ledger or [DB_PATH], args.out, months=args.month, year=args.year,
+                                file_format=args.format, workers=args.workers, progress=progress)
+    failed = sum('error' in result for result in results.values())
+    print(f"Rendered {len(results) - failed} statement(s), {failed} failed")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Expense tracker maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("migrate", help=cmd_migrate.__doc__).set_defaults(func=cmd_migrate)
+    commands.add_parser("rebuild-aggregates", help=cmd_rebuild_aggregates.__doc__).set_defaults(
+        func=cmd_rebuild_aggregates)
+
+    reconcile = commands.add_parser("reconcile-budgets", help=cmd_reconcile_budgets.__doc__)
+    reconcile.add_argument("--check", action="store_true", help="report only, do not repair")
+    reconcile.set_defaults(func=cmd_reconcile_budgets)
+
+    commands.add_parser("close-budget-periods", help=cmd_close_budget_periods.__doc__).set_defaults(
+        func=cmd_close_budget_periods)
+
+    import_csv = commands.add_parser("import-csv", help=cmd_import_csv.__doc__)
+    import_csv.add_argument("file", help="CSV file with date, amount and type columns")
+    import_csv.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="rows per committed batch")
+    import_csv.add_argument("--verbose", action="store_true", help="print every rejected row")
+    import_csv.add_argument("--keep-duplicates", action="store_true",
+                            help="import rows already in the ledger instead of skipping them")
+    import_csv.set_defaults(func=cmd_import_csv)
+
+    ingest = commands.add_parser("ingest", help=cmd_ingest.__doc__)
+    ingest.add_argument("files", nargs="+", help="statement CSV files in any registered format")
+    ingest.add_argument("--workers", type=int, default=INGEST_WORKERS, help="parser processes (default: one per CPU)")
+    ingest.add_argument("--verbose", action="store_true", help="print every rejected row")
+    ingest.add_argument("--keep-duplicates", action="store_true",
+                        help="import rows already in the ledger instead of skipping them")
+    ingest.set_defaults(func=cmd_ingest)
+
+    export = commands.add_parser("export", help=cmd_export.__doc__)
+    export.add_argument("file", help="output file; a .gz name is compressed automatically")
+    export.add_argument("--format", choices=("csv", "json", "ndjson") + COLUMNAR_FORMATS, default="csv")
+    export.add_argument("--gzip", action="store_true", help="gzip the output whatever its name")
+    export.set_defaults(func=cmd_export)
+
+    import_columnar_parser = commands.add_parser("import-columnar", help=cmd_import_columnar.__doc__)
+    import_columnar_parser.add_argument("file", help=".parquet, or .arrow/.feather for Arrow IPC")
+    import_columnar_parser.add_argument("--keep-duplicates", action="store_true",
+                                        help="import rows already in the ledger instead of skipping them")
+    import_columnar_parser.set_defaults(func=cmd_import_columnar)
+
+    export_changes = commands.add_parser("export-changes", help=cmd_export_changes.__doc__)
+    export_changes.add_argument("file", help="output file; a .gz name is compressed automatically")
+    export_changes.add_argument("--feed", default="default", help="consumer name; each keeps its own watermark")
+    export_changes.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    export_changes.add_argument("--gzip", action="store_true", help="gzip the output whatever its name")
+    export_changes.set_defaults(func=cmd_export_changes)
+
+    commands.add_parser("prune-changes", help=cmd_prune_changes.__doc__).set_defaults(func=cmd_prune_changes)
+
+    backup = commands.add_parser("backup", help=cmd_backup.__doc__)
+    backup.add_argument("file", nargs="?", help="write here instead (gzipped if it ends in .gz)")
+    backup.set_defaults(func=cmd_backup)
+
+    restore = commands.add_parser("restore", help=cmd_restore.__doc__)
+    restore.add_argument("file", help="backup file (.db or .db.gz)")
+    restore.add_argument("--quick", action="store_true",
+                         help="quick_check instead of the full integrity_check (skips index verification)")
+    restore.add_argument("--no-safety-backup", action="store_true",
+                         help="do not back up the current data first")
+    restore.set_defaults(func=cmd_restore)
+
+    statements = commands.add_parser("statements", help=cmd_statements.__doc__)
+    statements.add_argument("--ledger", action="append", help="ledger database file; repeat for several (default: this app's)")
+    period = statements.add_mutually_exclusive_group()
+    period.add_argument("--month", action="append", help="YYYY-MM; repeat for several (default: every month with data)")
+    period.add_argument("--year", type=int, help="every month of this year that has data")
+    statements.add_argument("--format", choices=STATEMENT_FORMATS, default="pdf",
+                            help="one multi-page PDF, or a PNG/SVG file per page")
+    statements.add_argument("--out", default=STATEMENT_DIR, help="output directory, one subdirectory per ledger")
+    statements.add_argument("--workers", type=int, default=STATEMENT_WORKERS,
+                            help="rendering processes (default: one per CPU)")
+    statements.set_defaults(func=cmd_statements)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
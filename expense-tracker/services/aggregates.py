@@ -0,0 +1,216 @@
+"""
+Materialized monthly and daily totals.
+
+``monthly_totals`` holds one row per (month, type, category) with the sum
+and count of matching transactions. SQLite triggers on ``transactions``
+keep it in sync on every insert, update and delete, so summary views read
+a few hundred aggregate rows instead of the whole ledger.
+
+``daily_totals`` does the same per (day, type) for the timeline chart;
+weeks are rolled up from it and years from the monthly table, so any
+window of a ten-year ledger is at most a few thousand rows.
+"""
+
+from collections import defaultdict
+from datetime import date, timedelta
+from sqlalchemy import event, func, Column, Integer, String, Float
+from services.database import Base, Transaction
+
+class MonthlyTotal(Base):
+    __tablename__ = "monthly_totals"
+
+    month = Column(String, primary_key=True)  # YYYY-MM
+    type = Column(String, primary_key=True)  # income or expense
+    category = Column(String, primary_key=True)  # '' when uncategorised
+    total = Column(Float, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+_ADD_ROW = """
+    INSERT INTO monthly_totals (month, type, category, total, count)
+    SELECT strftime('%Y-%m', NEW.txn_date), NEW.type, COALESCE(NEW.category, ''), NEW.amount, 1
+    WHERE NEW.txn_date IS NOT NULL
+    ON CONFLICT (month, type, category)
+    DO UPDATE SET total = total + excluded.total, count = count + 1;
+"""
+
+_REMOVE_ROW = """
+    UPDATE monthly_totals SET total = total - OLD.amount, count = count - 1
+    WHERE OLD.txn_date IS NOT NULL
+      AND month = strftime('%Y-%m', OLD.txn_date)
+      AND type = OLD.type
+      AND category = COALESCE(OLD.category, '');
+    DELETE FROM monthly_totals
+    WHERE count <= 0
+      AND month = strftime('%Y-%m', OLD.txn_date)
+      AND type = OLD.type
+      AND category = COALESCE(OLD.category, '');
+"""
+
+TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_monthly_totals_insert
+    AFTER INSERT ON transactions
+    BEGIN {_ADD_ROW} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_monthly_totals_delete
+    AFTER DELETE ON transactions
+    BEGIN {_REMOVE_ROW} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_monthly_totals_update
+    AFTER UPDATE OF txn_date, amount, type, category ON transactions
+    BEGIN {_REMOVE_ROW} {_ADD_ROW} END
+    """,
+)
+
+class DailyTotal(Base):
+    __tablename__ = "daily_totals"
+
+    day = Column(String, primary_key=True)  # YYYY-MM-DD
+    type = Column(String, primary_key=True)  # income or expense
+    total = Column(Float, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+_ADD_DAY = """
+    INSERT INTO daily_totals (day, type, total, count)
+    SELECT date(NEW.txn_date), NEW.type, NEW.amount, 1
+    WHERE NEW.txn_date IS NOT NULL
+    ON CONFLICT (day, type)
+    DO UPDATE SET total = total + excluded.total, count = count + 1;
+"""
+
+_REMOVE_DAY = """
+    UPDATE daily_totals SET total = total - OLD.amount, count = count - 1
+    WHERE OLD.txn_date IS NOT NULL AND day = date(OLD.txn_date) AND type = OLD.type;
+    DELETE FROM daily_totals
+    WHERE count <= 0 AND day = date(OLD.txn_date) AND type = OLD.type;
+"""
+
+DAILY_TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_daily_totals_insert
+    AFTER INSERT ON transactions
+    BEGIN {_ADD_DAY} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_daily_totals_delete
+    AFTER DELETE ON transactions
+    BEGIN {_REMOVE_DAY} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_daily_totals_update
+    AFTER UPDATE OF txn_date, amount, type ON transactions
+    BEGIN {_REMOVE_DAY} {_ADD_DAY} END
+    """,
+)
+
+def install_triggers(conn):
+    """Create the monthly_totals triggers on a connection (idempotent)"""
+    for ddl in TRIGGERS:
+        conn.exec_driver_sql(ddl)
+
+def install_daily_triggers(conn):
+    """Create the daily_totals triggers on a connection (idempotent)"""
+    for ddl in DAILY_TRIGGERS:
+        conn.exec_driver_sql(ddl)
+
+@event.listens_for(Transaction.__table__, "after_create")
+def _create_triggers(target, connection, **kw):
+    install_triggers(connection)
+    install_daily_triggers(connection)
+
+def rebuild_monthly_totals(conn):
+    """Recompute monthly_totals from the ledger; returns the number of rows written"""
+    conn.exec_driver_sql("DELETE FROM monthly_totals")
+    result = conn.exec_driver_sql("""
+        INSERT INTO monthly_totals (month, type, category, total, count)
+        SELECT strftime('%Y-%m', txn_date), type, COALESCE(category, ''), SUM(amount), COUNT(*)
+        FROM transactions
+        WHERE txn_date IS NOT NULL
+        GROUP BY 1, 2, 3
+    """)
+    return result.rowcount
+
+def rebuild_daily_totals(conn):
+    """Recompute daily_totals from the ledger; returns the number of rows written"""
+    conn.exec_driver_sql("DELETE FROM daily_totals")
+    result = conn.exec_driver_sql("""
+        INSERT INTO daily_totals (day, type, total, count)
+        SELECT date(txn_date), type, SUM(amount), COUNT(*)
+        FROM transactions
+        WHERE txn_date IS NOT NULL
+        GROUP BY 1, 2
+    """)
+    return result.rowcount
+
+def get_monthly_totals(db, transaction_type=None):
+    """Return {month: {"income": total, "expense": total}} from the aggregate table"""
+    query = db.query(MonthlyTotal.month, MonthlyTotal.type, func.sum(MonthlyTotal.total))
+    if transaction_type:
+        query = query.filter(MonthlyTotal.type == transaction_type)
+    rows = query.group_by(MonthlyTotal.month, MonthlyTotal.type).all()
+
+    monthly = defaultdict(lambda: {"income": 0, "expense": 0})
+    for month, t_type, total in rows:
+        monthly[month][t_type] += total
+    return monthly
+
+def get_category_totals(db, transaction_type="expense", month=None):
+    """Return {category: total} for a transaction type, largest first, optionally for one 'YYYY-MM' month"""
+    total = func.sum(MonthlyTotal.total)
+    query = db.query(MonthlyTotal.category, total).filter(MonthlyTotal.type == transaction_type)
+    if month:
+        query = query.filter(MonthlyTotal.month == month)
+    rows = query.group_by(MonthlyTotal.category).order_by(total.desc()).all()
+
+    categories = defaultdict(float)
+    for category, amount in rows:
+        categories[category or "Other"] += amount
+    return categories
+
+# Bucket start for each timeline granularity: (source table key column, SQL expression)
+_PERIODS = {
+    "day": (DailyTotal.day, DailyTotal.day),
+    "week": (DailyTotal.day, func.date(DailyTotal.day, "weekday 0", "-6 days")),  # Monday
+    "month": (MonthlyTotal.month, MonthlyTotal.month + "-01"),
+    "year": (MonthlyTotal.month, func.substr(MonthlyTotal.month, 1, 4) + "-01-01"),
+}
+
+def _bucket_bounds(granularity, start, end):
+    # Widen the window to whole buckets so the edge buckets are not partial sums
+    if granularity == "day":
+        return start and start.isoformat(), end and end.isoformat()
+    if granularity == "week":
+        return (start and (start - timedelta(days=start.weekday())).isoformat(),
+                end and (end + timedelta(days=6 - end.weekday())).isoformat())
+    if granularity == "month":
+        return start and start.strftime("%Y-%m"), end and end.strftime("%Y-%m")
+    return start and f"{start.year}-01", end and f"{end.year}-12"
+
+def get_period_totals(db, granularity, start=None, end=None):
+    """Return {bucket start 'YYYY-MM-DD': {"income": total, "expense": total}} for day/week/month/year buckets.
+
+    Only buckets overlapping ``start``..``end`` (dates, inclusive) are read.
+    """
+    column, bucket = _PERIODS[granularity]
+    table = column.class_
+    query = db.query(bucket, table.type, func.sum(table.total))
+    first, last = _bucket_bounds(granularity, start, end)
+    if first:
+        query = query.filter(column >= first)
+    if last:
+        query = query.filter(column <= last)
+    rows = query.group_by(bucket, table.type).all()
+
+    totals = defaultdict(lambda: {"income": 0, "expense": 0})
+    for period, t_type, total in rows:
+        totals[period][t_type] += total
+    return totals
+
+def get_ledger_span(db):
+    """First and last day with transactions, as dates (None, None for an empty ledger)"""
+    first, last = db.query(func.min(DailyTotal.day), func.max(DailyTotal.day)).one()
+    if not first:
+        return None, None
+    return date.fromisoformat(first), date.fromisoformat(last)
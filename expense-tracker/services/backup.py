@@ -0,0 +1,153 @@
+"""
+Online, compressed, rotating backups.
+
+Backups use SQLite's online backup API, copying a batch of pages per
+step and sleeping between steps so writers are never locked out for
+long. The copy is consistent even while a write or WAL checkpoint is in
+flight. The result is gzipped into ``BACKUP_DIR`` and old backups are
+thinned out to the newest one per day for ``keep_daily`` days and per
+month for ``keep_monthly`` months.
+"""
+
+import gzip
+import os
+import queue
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from config import (DB_PATH, BACKUP_DIR, BACKUP_KEEP_DAILY, BACKUP_KEEP_MONTHLY,
+                    BACKUP_INTERVAL_HOURS, BACKUP_PAGES_PER_STEP)
+
+BACKUP_NAME = "expenses-{:%Y%m%d-%H%M%S}.db.gz"
+_BACKUP_PATTERN = re.compile(r"^expenses-(\d{8}-\d{6})\.db\.gz$")
+
+# Wait before trying again after a failed scheduled backup
+RETRY_SECONDS = 3600
+
+class BackupService:
+    def __init__(self, db_path=DB_PATH, backup_dir=BACKUP_DIR, keep_daily=BACKUP_KEEP_DAILY,
+                 keep_monthly=BACKUP_KEEP_MONTHLY, pages_per_step=BACKUP_PAGES_PER_STEP):
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.keep_daily = keep_daily
+        self.keep_monthly = keep_monthly
+        self.pages_per_step = pages_per_step
+
+    def backup_to(self, filename, compress=None, progress=None):
+        """Copy the live database to ``filename`` (gzipped for .gz); returns the file name.
+
+        ``progress(remaining, total)`` is called after every step with page counts.
+        """
+        if compress is None:
+            compress = filename.endswith(".gz")
+        directory = os.path.dirname(os.path.abspath(filename))
+        os.makedirs(directory, exist_ok=True)
+
+        fd, snapshot = tempfile.mkstemp(suffix=".db", dir=directory)
+        os.close(fd)
+        try:
+            source = sqlite3.connect(self.db_path, timeout=30)
+            target = sqlite3.connect(snapshot)
+            try:
+                source.backup(target, pages=self.pages_per_step, sleep=0.005,
+                              progress=(lambda status, remaining, total: progress(remaining, total))
+                              if progress else None)
+                # A WAL-mode copy would keep later writes in a side file; make it self-contained
+                target.execute("PRAGMA journal_mode = DELETE")
+            finally:
+                target.close()
+                source.close()
+
+            # Write under a temporary name so a half-written file never looks like a backup
+            partial = filename + ".part"
+            if compress:
+                with open(snapshot, "rb") as src, gzip.open(partial, "wb", compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+            else:
+                shutil.copyfile(snapshot, partial)
+            os.replace(partial, filename)
+        finally:
+            os.unlink(snapshot)
+        return filename
+
+    def create_backup(self, now=None, progress=None):
+        """Write a timestamped compressed backup into the backup directory and apply retention"""
+        now = now or datetime.now()
+        filename = self.backup_to(os.path.join(self.backup_dir, BACKUP_NAME.format(now)), True, progress)
+        self.prune()
+        return filename
+
+    def list_backups(self):
+        """Return [(path, taken_at)] for every backup in the directory, newest first"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        backups = []
+        for name in os.listdir(self.backup_dir):
+            match = _BACKUP_PATTERN.match(name)
+            if match:
+                backups.append((os.path.join(self.backup_dir, name),
+                                datetime.strptime(match.group(1), "%Y%m%d-%H%M%S")))
+        return sorted(backups, key=lambda backup: backup[1], reverse=True)
+
+    def prune(self):
+        """Delete backups outside the daily/monthly retention; returns the removed paths"""
+        days, months, removed = set(), set(), []
+        for path, taken_at in self.list_backups():
+            keep = False
+            if taken_at.date() not in days and len(days) < self.keep_daily:
+                days.add(taken_at.date())
+                keep = True
+            month = (taken_at.year, taken_at.month)
+            if month not in months and len(months) < self.keep_monthly:
+                months.add(month)
+                keep = True
+            if not keep:
+                os.unlink(path)
+                removed.append(path)
+        return removed
+
+class BackupScheduler:
+    """Takes a backup in a daemon thread whenever the newest one is older than the interval"""
+
+    def __init__(self, service=None, interval_hours=BACKUP_INTERVAL_HOURS, results=None):
+        self.service = service or BackupService()
+        self.interval = timedelta(hours=interval_hours)
+        self.results = results or queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the worker thread (a backup runs immediately if one is due)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="backup-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Ask the worker thread to exit and wait for it"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self, now=None):
+        """Back up if due; returns seconds until the next backup is due"""
+        now = now or datetime.now()
+        backups = self.service.list_backups()
+        if backups and now - backups[0][1] < self.interval:
+            return (backups[0][1] + self.interval - now).total_seconds()
+
+        try:
+            self.results.put(("backup", self.service.create_backup(now)))
+        except Exception as e:
+            print(f"Error creating backup: {e}")
+            return min(self.interval.total_seconds(), RETRY_SECONDS)
+        return self.interval.total_seconds()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._stop.wait(self.run_once())
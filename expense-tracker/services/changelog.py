@@ -0,0 +1,94 @@
+"""
+Transaction change log and export watermarks.
+
+Triggers on ``transactions`` append one ``transaction_changes`` row per
+insert, update and delete, numbered by a strictly increasing ``seq``
+(AUTOINCREMENT, so numbers are never reused even after pruning). An
+export feed remembers the last ``seq`` it delivered in
+``export_watermarks`` and next time only sends what changed after it.
+A feed with no watermark yet starts from a full export of the ledger
+instead of the log, so pruning never leaves a new feed short of rows.
+"""
+
+from datetime import datetime
+from sqlalchemy import event, func, text, Column, Integer, String, DateTime
+from services.database import Base, Transaction
+
+class TransactionChange(Base):
+    __tablename__ = "transaction_changes"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True)
+    transaction_id = Column(Integer, nullable=False, index=True)
+    op = Column(String, nullable=False)  # insert, update or delete
+    changed_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+class ExportWatermark(Base):
+    __tablename__ = "export_watermarks"
+
+    feed = Column(String, primary_key=True)  # name of the consumer, e.g. "household-report"
+    seq = Column(Integer, nullable=False, default=0)  # last change delivered to this feed
+    exported_at = Column(DateTime, nullable=True)
+
+def _log(op, row):
+    return f"INSERT INTO transaction_changes (transaction_id, op) VALUES ({row}.id, '{op}');"
+
+TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_transaction_changes_insert
+    AFTER INSERT ON transactions
+    BEGIN {_log('insert', 'NEW')} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_transaction_changes_update
+    AFTER UPDATE ON transactions
+    BEGIN {_log('update', 'NEW')} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_transaction_changes_delete
+    AFTER DELETE ON transactions
+    BEGIN {_log('delete', 'OLD')} END
+    """,
+)
+
+def install_triggers(conn):
+    """Create the change log triggers on a connection (idempotent)"""
+    for ddl in TRIGGERS:
+        conn.exec_driver_sql(ddl)
+
+@event.listens_for(Transaction.__table__, "after_create")
+def _create_triggers(target, connection, **kw):
+    install_triggers(connection)
+
+def data_version(db):
+    """Counter that moves on every ledger write: the change log's AUTOINCREMENT high-water mark.
+
+    Unlike max(seq) it never goes back when the log is pruned.
+    """
+    return db.execute(text("SELECT seq FROM sqlite_sequence WHERE name = 'transaction_changes'")).scalar() or 0
+
+def get_watermark(db, feed, default=0):
+    """Last change number delivered to a feed (``default`` if it never exported)"""
+    watermark = db.get(ExportWatermark, feed)
+    return watermark.seq if watermark else default
+
+def set_watermark(db, feed, seq):
+    """Record that a feed has received every change up to ``seq``"""
+    watermark = db.get(ExportWatermark, feed) or ExportWatermark(feed=feed)
+    watermark.seq = seq
+    watermark.exported_at = datetime.now()
+    db.merge(watermark)
+    db.commit()
+
+def prune_changes(db):
+    """Delete log rows every feed has already received; returns the number removed.
+
+    Feeds registered later do not need the pruned rows: their first
+    export is a full one (see TransactionExporter.export_changes).
+    """
+    lowest = db.query(func.min(ExportWatermark.seq)).scalar()
+    if not lowest:
+        return 0
+    removed = db.query(TransactionChange).filter(TransactionChange.seq <= lowest).delete()
+    db.commit()
+    return removed
@@ -0,0 +1,187 @@
+"""
+Columnar (Parquet and Arrow IPC) export and import.
+
+Files use a typed schema: date32 dates, float64 amounts, and
+dictionary-encoded type and category columns, so notebooks get proper
+dtypes and repeated strings are stored once. Both directions stream
+record batches. Imports normalize each batch with pyarrow.compute
+(date and amount casts, dictionary decoding, type checks) and feed the
+rows to the CSV importer's duplicate detection and executemany insert.
+Rows the vectorized checks cannot accept, such as text dates in other
+formats, go through normalize_row one by one, so they are accepted or
+rejected exactly as in a CSV import.
+
+pyarrow is optional; it is only imported when one of these functions
+is used.
+"""
+
+from services.database import SessionLocal
+from services.exporter import TransactionExporter
+from services.importer import CSVImporter, check_columns, normalize_row, TRANSACTION_TYPES
+from utils.helpers import parse_date, iso_content_hash
+from config import EXPORT_BATCH_SIZE, IMPORT_CHUNK_SIZE
+
+COLUMNAR_FORMATS = ("parquet", "arrow")
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet/Arrow support needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+def ledger_schema():
+    """Arrow schema of an exported ledger"""
+    pa = _pyarrow()
+    return pa.schema([
+        ("id", pa.int64()),
+        ("date", pa.date32()),
+        ("amount", pa.float64()),
+        ("type", pa.dictionary(pa.int8(), pa.string())),
+        ("category", pa.dictionary(pa.int32(), pa.string())),
+        ("notes", pa.string()),
+    ])
+
+def format_for(filename):
+    """Pick parquet or arrow from a file name (.parquet/.pq or .arrow/.feather/.ipc)"""
+    if filename.lower().endswith((".arrow", ".feather", ".ipc")):
+        return "arrow"
+    return "parquet"
+
+def _encode(pa, values, codes, index_type):
+    """Dictionary-encode against a code table that only grows, so codes stay stable across batches"""
+    indices = [None if value is None else codes.setdefault(value, len(codes)) for value in values]
+    return pa.DictionaryArray.from_arrays(pa.array(indices, index_type), pa.array(list(codes), pa.string()))
+
+def export_columnar(filename, db=None, file_format=None, batch_size=EXPORT_BATCH_SIZE, progress=None):
+    """Stream every transaction to a Parquet or Arrow IPC file; returns the row count"""
+    pa = _pyarrow()
+    file_format = file_format or format_for(filename)
+    schema = ledger_schema()
+    exporter = TransactionExporter(db or SessionLocal(), batch_size=batch_size)
+
+    if file_format == "parquet":
+        writer = pa.parquet.ParquetWriter(filename, schema, compression="zstd")
+    else:
+        # Later batches only append to each dictionary, which IPC files allow as deltas
+        writer = pa.ipc.new_file(filename, schema, options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+
+    type_codes, category_codes = {}, {}
+    count = 0
+    try:
+        for batch in exporter.iter_batches():
+            ids, dates, amounts, types, categories, notes = zip(*batch)
+            table = pa.table([
+                pa.array(ids, pa.int64()),
+                pa.array([parse_date(d) for d in dates], pa.date32()),
+                pa.array(amounts, pa.float64()),
+                _encode(pa, types, type_codes, pa.int8()),
+                _encode(pa, categories, category_codes, pa.int32()),
+                pa.array(notes, pa.string()),
+            ], schema=schema)
+            writer.write_table(table)
+            count += len(batch)
+            if progress:
+                progress(count)
+    finally:
+        writer.close()
+    return count
+
+def _iter_batches(filename, file_format, batch_size):
+    """Yield (record batch, fraction read) from a Parquet or Arrow IPC file"""
+    pa = _pyarrow()
+    if file_format == "parquet":
+        source = pa.parquet.ParquetFile(filename)
+        check_columns(source.schema_arrow.names)
+        total = source.metadata.num_rows or 1
+        read = 0
+        for batch in source.iter_batches(batch_size=batch_size):
+            read += batch.num_rows
+            yield batch, read / total
+    else:
+        with pa.memory_map(filename) as source:
+            reader = pa.ipc.open_file(source)
+            check_columns(reader.schema.names)
+            for index in range(reader.num_record_batches):
+                yield reader.get_batch(index), (index + 1) / reader.num_record_batches
+
+class _RawRow(dict):
+    """A row the vectorized checks did not accept; normalize_row decides its fate"""
+
+def _normalize_prepared(row):
+    return normalize_row(row) if isinstance(row, _RawRow) else row
+
+def _text(pa, column):
+    """A string array from a (possibly dictionary-encoded) column"""
+    if pa.types.is_dictionary(column.type):
+        column = column.dictionary_decode()
+    return column if pa.types.is_string(column.type) else column.cast(pa.string())
+
+def _prepare_batch(pa, batch):
+    """Normalize a record batch column-wise; returns (iso dates, amounts, types, categories, notes, valid)"""
+    pc = pa.compute
+    names = batch.schema.names
+
+    dates = batch.column("date")
+    if pa.types.is_dictionary(dates.type):
+        dates = dates.dictionary_decode()
+    if pa.types.is_date(dates.type) or pa.types.is_timestamp(dates.type):
+        dates = dates.cast(pa.date32())
+    elif pa.types.is_string(dates.type) or pa.types.is_large_string(dates.type):
+        dates = pc.strptime(dates, format="%Y-%m-%d", unit="s", error_is_null=True).cast(pa.date32())
+    else:
+        dates = pa.nulls(len(batch), pa.date32())
+
+    amounts = batch.column("amount")
+    if pa.types.is_integer(amounts.type) or pa.types.is_floating(amounts.type) or pa.types.is_decimal(amounts.type):
+        amounts = amounts.cast(pa.float64())
+        amounts_ok = pc.is_finite(amounts)
+    else:
+        # Text amounts ("1,200.00") are left to normalize_row
+        amounts_ok = pa.nulls(len(batch), pa.bool_())
+
+    types = pc.utf8_lower(pc.utf8_trim_whitespace(_text(pa, batch.column("type"))))
+    valid = pc.and_(pc.and_(pc.is_valid(dates), amounts_ok),
+                    pc.is_in(types, value_set=pa.array(TRANSACTION_TYPES)))
+
+    def optional(name):
+        return _text(pa, batch.column(name)).to_pylist() if name in names else [None] * len(batch)
+
+    return (dates.cast(pa.string()).to_pylist(), amounts.to_pylist(), types.to_pylist(),
+            optional("category"), optional("notes"), pc.fill_null(valid, False).to_pylist())
+
+def import_columnar(filename, db=None, file_format=None, chunk_size=IMPORT_CHUNK_SIZE, skip_duplicates=True,
+                    progress=None, on_reject=None, on_duplicate=None):
+    """Import a Parquet or Arrow IPC file; returns the same stats as CSVImporter.import_file"""
+    pa = _pyarrow()
+    file_format = file_format or format_for(filename)
+    importer = CSVImporter(db, chunk_size=chunk_size, skip_duplicates=skip_duplicates)
+    position = {'fraction': 0.0}
+
+    def records():
+        row_number = 0
+        for batch, fraction in _iter_batches(filename, file_format, chunk_size):
+            position['fraction'] = fraction
+            columns = _prepare_batch(pa, batch)
+            for index, (day, amount, transaction_type, category, notes, valid) in enumerate(zip(*columns)):
+                row_number += 1
+                if not valid:
+                    yield row_number, _RawRow(batch.slice(index, 1).to_pylist()[0])
+                    continue
+                category = (category or "").strip()
+                notes = (notes or "").strip()
+                yield row_number, {
+                    'date': day,
+                    'txn_date': day,
+                    'amount': amount,
+                    'type': transaction_type,
+                    'category': category,
+                    'notes': notes,
+                    'content_hash': iso_content_hash(day, amount, transaction_type, category, notes),
+                }
+
+    return importer.import_records(records(), progress, on_reject, on_duplicate,
+                                   fraction=lambda: position['fraction'], normalize=_normalize_prepared)
@@ -1,9 +1,39 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float
-from sqlalchemy.orm import sessionmaker, declarative_base
-from config import DB_PATH
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, Date, Index
+from sqlalchemy.orm import sessionmaker, declarative_base, validates
+from config import DB_PATH, DB_PROFILE, DB_PROFILES
+from utils.helpers import parse_date, content_hash
+
+# Pragmas are applied in this order; journal_mode first so the rest
+# apply to the WAL connection
+PROFILE_PRAGMAS = ("journal_mode", "synchronous", "mmap_size", "cache_size",
+                   "temp_store", "busy_timeout")
+
+def apply_sqlite_profile(dbapi_connection, profile=DB_PROFILE):
+    """Apply a named performance profile from config.DB_PROFILES to a raw connection"""
+    if profile not in DB_PROFILES:
+        raise ValueError(f"Unknown database profile: {profile}")
+
+    settings = DB_PROFILES[profile]
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in PROFILE_PRAGMAS:
+            if pragma in settings:
+                cursor.execute(f"PRAGMA {pragma} = {settings[pragma]}")
+    finally:
+        cursor.close()
+
+def make_engine(db_path=DB_PATH, profile=DB_PROFILE):
+    """Create a SQLite engine whose connections all use the given profile"""
+    new_engine = create_engine(f"sqlite:///{db_path}", echo=False)
+
+    @event.listens_for(new_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        apply_sqlite_profile(dbapi_connection, profile)
+
+    return new_engine
 
 # Database engine
-engine = create_engine(f"sqlite:///{DB_PATH}", echo=False)
+engine = make_engine()
 
 # Base class for models
 Base = declarative_base()
@@ -16,6 +46,14 @@ SessionLocal = sessionmaker(bind=engine)
 # -------------------
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index("ix_transactions_type_txn_date", "type", "txn_date"),
+        Index("ix_transactions_category_txn_date", "category", "txn_date"),
+        # Idempotency key for generated recurring occurrences
+        Index("uq_transactions_recurring_occurrence", "recurring_id", "txn_date", unique=True),
+        # Counted (not unique) - the same purchase can genuinely happen twice a day
+        Index("ix_transactions_content_hash", "content_hash"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(String, nullable=False)
@@ -23,3 +61,20 @@ class Transaction(Base):
     type = Column(String, nullable=False)  # income or expense
     category = Column(String, nullable=True)
     notes = Column(String, nullable=True)
+    txn_date = Column(Date, nullable=True)  # parsed copy of `date`, used for queries
+    recurring_id = Column(Integer, nullable=True)  # set when generated from a recurring transaction
+    content_hash = Column(String, nullable=True)  # utils.helpers.content_hash of the row, for import dedupe
+
+    @validates("date")
+    def _normalize_date(self, key, value):
+        """Store dates as ISO strings and keep txn_date in sync"""
+        parsed = parse_date(value)
+        self.txn_date = parsed
+        return parsed.isoformat() if parsed else value
+
+@event.listens_for(Transaction, "before_insert")
+@event.listens_for(Transaction, "before_update")
+def _set_content_hash(mapper, connection, target):
+    """Keep content_hash in sync for ORM writes (Core inserts set it explicitly)"""
+    target.content_hash = content_hash(target.date, target.amount, target.type,
+                                       target.category, target.notes)
@@ -0,0 +1,151 @@
+"""
+Streaming ledger export.
+
+Rows are read with keyset pagination on the primary key (``id > last``)
+and written as they arrive, so memory stays flat however large the
+ledger is. Output is CSV, a streamed JSON document, or NDJSON, gzipped
+when the file name ends in ``.gz`` or ``compress`` is set.
+
+``export_changes`` writes only what changed since a feed's watermark
+(see services.changelog): one record per touched transaction, either
+its current values ("upsert") or just its id ("delete"). A feed's first
+export is every live transaction as an upsert, since the log may have
+been pruned before the feed existed.
+"""
+
+import csv
+import gzip
+import json
+from datetime import datetime
+from sqlalchemy import select, func
+from services.database import SessionLocal, Transaction
+from services.changelog import TransactionChange, data_version, get_watermark, set_watermark
+from config import EXPORT_BATCH_SIZE
+
+EXPORT_COLUMNS = ("id", "date", "amount", "type", "category", "notes")
+CHANGE_COLUMNS = ("seq", "op") + EXPORT_COLUMNS
+
+def open_output(filename, compress=None):
+    """Open a text file for writing, gzipped if asked or if the name ends in .gz"""
+    if compress is None:
+        compress = filename.endswith(".gz")
+    if compress:
+        # Level 6 is several times faster than the default 9 for a few % more size
+        return gzip.open(filename, "wt", compresslevel=6, encoding="utf-8", newline="")
+    return open(filename, "w", encoding="utf-8", newline="")
+
+class TransactionExporter:
+    def __init__(self, db=None, batch_size=EXPORT_BATCH_SIZE):
+        self.db = db or SessionLocal()
+        self.batch_size = batch_size
+
+    def iter_batches(self):
+        """Yield lists of row tuples (EXPORT_COLUMNS order) by id, one keyset page at a time"""
+        table = Transaction.__table__
+        query = select(*(table.c[name] for name in EXPORT_COLUMNS)).order_by(table.c.id).limit(self.batch_size)
+        last_id = 0
+        while True:
+            batch = self.db.execute(query.where(table.c.id > last_id)).all()
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1][0]
+
+    def export_csv(self, filename, compress=None, progress=None):
+        """Write every transaction as CSV; returns the row count"""
+        count = 0
+        with open_output(filename, compress) as out:
+            writer = csv.writer(out)
+            writer.writerow(EXPORT_COLUMNS)
+            for batch in self.iter_batches():
+                # csv writes None as an empty field
+                writer.writerows(batch)
+                count += len(batch)
+                if progress:
+                    progress(count)
+        return count
+
+    def export_json(self, filename, ndjson=False, compress=None, progress=None):
+        """Write every transaction as one streamed JSON document, or one object per line (NDJSON)"""
+        count = 0
+        with open_output(filename, compress) as out:
+            if not ndjson:
+                out.write('{"export_date": %s, "transactions": [' % json.dumps(datetime.now().isoformat()))
+            for batch in self.iter_batches():
+                for row in batch:
+                    text = json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False)
+                    if ndjson:
+                        out.write(text + "\n")
+                    else:
+                        out.write(("\n  " if count == 0 else ",\n  ") + text)
+                    count += 1
+                if progress:
+                    progress(count)
+            if not ndjson:
+                out.write("\n]}\n")
+        return count
+
+    def iter_changes(self, after_seq, up_to_seq):
+        """Yield pages of change records for transactions touched in (after_seq, up_to_seq]"""
+        table = Transaction.__table__
+        latest = func.max(TransactionChange.seq)
+        query = select(TransactionChange.transaction_id, latest).where(
+            TransactionChange.seq > after_seq, TransactionChange.seq <= up_to_seq
+        ).group_by(TransactionChange.transaction_id).order_by(TransactionChange.transaction_id).limit(self.batch_size)
+
+        last_id = 0
+        while True:
+            touched = self.db.execute(query.where(TransactionChange.transaction_id > last_id)).all()
+            if not touched:
+                return
+            current = {row[0]: row for row in self.db.execute(
+                select(*(table.c[name] for name in EXPORT_COLUMNS)).where(
+                    table.c.id.in_([transaction_id for transaction_id, _ in touched]))).all()}
+
+            page = []
+            for transaction_id, seq in touched:
+                row = current.get(transaction_id)
+                if row:
+                    page.append((seq, "upsert") + tuple(row))
+                else:
+                    page.append((seq, "delete", transaction_id) + (None,) * (len(EXPORT_COLUMNS) - 1))
+            yield page
+            last_id = touched[-1][0]
+
+    def iter_snapshot(self, seq):
+        """Yield pages of upsert records for every live transaction, stamped with ``seq``"""
+        for batch in self.iter_batches():
+            yield [(seq, "upsert") + tuple(row) for row in batch]
+
+    def export_changes(self, filename, feed="default", file_format="ndjson", compress=None):
+        """Write the changes since the feed's watermark, then advance it; returns the record count.
+
+        A feed that never exported gets every live transaction instead
+        and starts its watermark at the current end of the log. The
+        watermark moves only after the file is written, so a failed
+        export is simply repeated in full next time.
+        """
+        after_seq = get_watermark(self.db, feed, default=None)
+        # Not max(seq): that drops back to 0 once every change is pruned
+        up_to_seq = data_version(self.db)
+        if after_seq is None:
+            pages = self.iter_snapshot(up_to_seq)
+        else:
+            pages = self.iter_changes(after_seq, up_to_seq)
+
+        count = 0
+        with open_output(filename, compress) as out:
+            writer = None
+            if file_format == "csv":
+                writer = csv.writer(out)
+                writer.writerow(CHANGE_COLUMNS)
+            for page in pages:
+                if writer:
+                    writer.writerows(page)
+                else:
+                    out.writelines(json.dumps(dict(zip(CHANGE_COLUMNS, record)), ensure_ascii=False) + "\n"
+                                   for record in page)
+                count += len(page)
+
+        set_watermark(self.db, feed, up_to_seq)
+        return count
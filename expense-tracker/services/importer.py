@@ -0,0 +1,185 @@
+"""
+Streaming CSV import.
+
+Rows are read in fixed-size chunks, validated and normalized, then
+written with one DB-API ``executemany`` insert and committed per chunk,
+so memory stays flat however long the file is and a failure part-way
+keeps every chunk already committed. Progress and rejected rows are
+reported through callbacks.
+
+Re-imported rows are found by content hash with one indexed lookup per
+chunk. Duplicates are counted rather than unique: if a statement holds
+the same line twice and the ledger already has it once, one copy is
+skipped and the other imported.
+
+The file layout is recognised from the header by the parser registry in
+services.parsers, so bank statements import as well as ledger exports.
+"""
+
+import csv
+import io
+import math
+import os
+from itertools import islice
+from sqlalchemy import func, select
+from services.database import SessionLocal, Transaction, apply_sqlite_profile
+from services.parsers import detect_parser, normalize_header, LedgerParser
+from utils.helpers import parse_date, content_hash
+from config import DB_PROFILE, IMPORT_CHUNK_SIZE
+
+REQUIRED_COLUMNS = ("date", "amount", "type")
+INSERT_COLUMNS = ("date", "txn_date", "amount", "type", "category", "notes", "content_hash")
+
+# Plain DB-API executemany: skips SQLAlchemy's per-row parameter processing,
+# which costs as much as SQLite's own insert work on large imports
+INSERT_SQL = "INSERT INTO transactions ({}) VALUES ({})".format(
+    ", ".join(INSERT_COLUMNS), ", ".join("?" for _ in INSERT_COLUMNS))
+TRANSACTION_TYPES = ("income", "expense")
+
+def normalize_row(row):
+    """Validate a CSV (or typed) row and return the values to insert; raises ValueError with the reason"""
+    day = parse_date(row.get("date"))
+    if not day:
+        raise ValueError(f"invalid date {row.get('date')!r}")
+
+    amount = row.get("amount")
+    if isinstance(amount, str):
+        amount = amount.replace(",", "").strip()
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid amount {row.get('amount')!r}")
+    if not math.isfinite(amount):
+        raise ValueError(f"invalid amount {row.get('amount')!r}")
+
+    transaction_type = (row.get("type") or "").strip().lower()
+    if transaction_type not in TRANSACTION_TYPES:
+        raise ValueError(f"invalid type {row.get('type')!r}")
+
+    category = (row.get("category") or "").strip()
+    notes = (row.get("notes") or "").strip()
+    return {
+        'date': day.isoformat(),
+        'txn_date': day,
+        'amount': amount,
+        'type': transaction_type,
+        'category': category,
+        'notes': notes,
+        'content_hash': content_hash(day, amount, transaction_type, category, notes)
+    }
+
+def check_columns(fieldnames):
+    """Raise ValueError unless every required column is present"""
+    missing = [c for c in REQUIRED_COLUMNS if c not in (fieldnames or [])]
+    if missing:
+        raise ValueError(f"File is missing required column(s): {', '.join(missing)}")
+
+class CSVImporter:
+    def __init__(self, db=None, chunk_size=IMPORT_CHUNK_SIZE, skip_duplicates=True):
+        self.db = db or SessionLocal()
+        self.chunk_size = chunk_size
+        self.skip_duplicates = skip_duplicates
+
+    def import_file(self, filename, progress=None, on_reject=None, on_duplicate=None):
+        """Import a CSV file (ledger or any registered statement format) chunk by chunk.
+
+        ``progress(stats)`` is called after every committed chunk with the
+        running counts and the fraction of the file read so far.
+        ``on_reject(line_number, row, reason)`` is called for each row that
+        fails validation, and ``on_duplicate(line_number, row)`` for each
+        row already in the ledger (skipped unless skip_duplicates is off).
+        Returns the final stats dict.
+        """
+        total_bytes = os.path.getsize(filename) or 1
+
+        with open(filename, "rb") as raw:
+            csvfile = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+            reader = csv.DictReader(csvfile)
+            parser = detect_parser(reader.fieldnames)
+            reader.fieldnames = [normalize_header(name) for name in reader.fieldnames]
+
+            normalize = normalize_row
+            if not isinstance(parser, LedgerParser):
+                normalize = lambda row: normalize_row(parser.to_ledger(row))
+
+            numbered = ((reader.line_num, row) for row in reader)
+            return self.import_records(numbered, progress, on_reject, on_duplicate,
+                                       fraction=lambda: raw.tell() / total_bytes, normalize=normalize)
+
+    def import_records(self, records, progress=None, on_reject=None, on_duplicate=None, fraction=None,
+                       normalize=normalize_row):
+        """Import ``(line_number, row)`` pairs from any reader; see import_file for the callbacks.
+
+        ``normalize(row)`` turns a row into insert values, raising ValueError to reject it.
+        """
+        stats = {'imported': 0, 'rejected': 0, 'duplicates': 0, 'chunks': 0, 'fraction': 0.0}
+
+        # One connection for the whole import so the fast-import
+        # pragmas never leak onto a pooled connection
+        with self.db.get_bind().connect() as conn:
+            dbapi_connection = conn.connection.dbapi_connection
+            apply_sqlite_profile(dbapi_connection, "fast-import")
+
+            # Rows up to this id existed before the import; only they
+            # count as earlier copies, not rows this file just added
+            with conn.begin():
+                self._last_existing_id = conn.execute(
+                    select(func.coalesce(func.max(Transaction.id), 0))).scalar()
+            self._skipped = {}
+            try:
+                while True:
+                    chunk = list(islice(records, self.chunk_size))
+                    if not chunk:
+                        break
+                    self._write_chunk(conn, chunk, stats, on_reject, on_duplicate, normalize)
+
+                    stats['chunks'] += 1
+                    if fraction:
+                        stats['fraction'] = min(fraction(), 1.0)
+                    if progress:
+                        progress(dict(stats))
+            finally:
+                apply_sqlite_profile(dbapi_connection, DB_PROFILE)
+
+        stats['fraction'] = 1.0
+        return stats
+
+    def existing_counts(self, conn, hashes):
+        """How many pre-import ledger rows carry each hash (one indexed query)"""
+        return dict(conn.execute(
+            select(Transaction.content_hash, func.count())
+            .where(Transaction.content_hash.in_(hashes), Transaction.id <= self._last_existing_id)
+            .group_by(Transaction.content_hash)
+        ).all())
+
+    def _write_chunk(self, conn, chunk, stats, on_reject, on_duplicate, normalize=normalize_row):
+        """Normalize one chunk and insert the valid rows in a single committed executemany"""
+        normalized = []
+        for line_number, row in chunk:
+            try:
+                normalized.append((line_number, row, normalize(row)))
+            except ValueError as e:
+                stats['rejected'] += 1
+                if on_reject:
+                    on_reject(line_number, row, str(e))
+
+        with conn.begin():
+            existing = self.existing_counts(conn, {values['content_hash'] for _, _, values in normalized})
+            rows = []
+            for line_number, row, values in normalized:
+                digest = values['content_hash']
+                # The first N copies in the file match the N already in the ledger
+                if self._skipped.get(digest, 0) < existing.get(digest, 0):
+                    self._skipped[digest] = self._skipped.get(digest, 0) + 1
+                    stats['duplicates'] += 1
+                    if on_duplicate:
+                        on_duplicate(line_number, row)
+                    if self.skip_duplicates:
+                        continue
+                rows.append(values)
+
+            if rows:
+                conn.exec_driver_sql(INSERT_SQL, [
+                    (v['date'], v['date'], v['amount'], v['type'], v['category'], v['notes'], v['content_hash'])
+                    for v in rows])
+        stats['imported'] += len(rows)
@@ -0,0 +1,129 @@
+"""
+Parallel ingestion of many statement files.
+
+Reading, format detection, validation and hashing, the CPU-bound part
+of an import, run in a process pool with one file per task. The main
+process imports each file as soon as its worker finishes, through the
+same chunked, duplicate-aware insert path as a single CSV import, so a
+month-end batch takes about as long as its slowest file plus the
+inserts. SQLite has a single writer, so the inserts stay in one process.
+
+Workers hand their rows back through a temporary spool file of pickled
+chunks rather than one pickled result, so neither process ever holds a
+whole statement in memory.
+
+Every file is deduplicated against what is already stored, including
+files ingested earlier in the batch, so overlapping statements do not
+double-count.
+"""
+
+import csv
+import importlib
+import io
+import os
+import pickle
+import tempfile
+from concurrent.futures import as_completed
+from services.importer import CSVImporter, normalize_row
+from services.parsers import detect_parser, normalize_header, registered_parsers
+from utils.helpers import process_pool
+from config import IMPORT_CHUNK_SIZE, INGEST_WORKERS
+
+def read_statement(filename, chunk_size=IMPORT_CHUNK_SIZE):
+    """Parse and validate a file into a spool; returns (parser name, spool path).
+
+    The spool holds pickled ``("rows", [(line, values)])`` and
+    ``("rejects", [(line, reason)])`` chunks of at most ``chunk_size``
+    entries; read it back with read_spool and delete it afterwards.
+    """
+    fd, spool = tempfile.mkstemp(suffix=".ingest")
+    try:
+        with os.fdopen(fd, "wb") as out, open(filename, "rb") as raw:
+            reader = csv.DictReader(io.TextIOWrapper(raw, encoding="utf-8-sig", newline=""))
+            parser = detect_parser(reader.fieldnames)
+            reader.fieldnames = [normalize_header(name) for name in reader.fieldnames]
+            chunks = {"rows": [], "rejects": []}
+            for row in reader:
+                try:
+                    kind, entry = "rows", (reader.line_num, normalize_row(parser.to_ledger(row)))
+                except ValueError as e:
+                    kind, entry = "rejects", (reader.line_num, str(e))
+                chunks[kind].append(entry)
+                if len(chunks[kind]) >= chunk_size:
+                    pickle.dump((kind, chunks[kind]), out, pickle.HIGHEST_PROTOCOL)
+                    chunks[kind] = []
+            for kind, chunk in chunks.items():
+                if chunk:
+                    pickle.dump((kind, chunk), out, pickle.HIGHEST_PROTOCOL)
+    except BaseException:
+        os.unlink(spool)
+        raise
+    return parser.name, spool
+
+def read_spool(spool, on_reject=None):
+    """Yield the rows of a read_statement spool, one chunk in memory at a time"""
+    with open(spool, "rb") as f:
+        while True:
+            try:
+                kind, chunk = pickle.load(f)
+            except EOFError:
+                return
+            if kind == "rows":
+                yield from chunk
+            elif on_reject:
+                for line_number, reason in chunk:
+                    on_reject(line_number, reason)
+
+def _load_plugins(modules):
+    # Spawned workers start clean: import every module that registers a parser
+    for module in modules:
+        importlib.import_module(module)
+
+def _already_normalized(values):
+    return values
+
+def ingest_files(filenames, db=None, workers=INGEST_WORKERS, chunk_size=IMPORT_CHUNK_SIZE, skip_duplicates=True,
+                 progress=None, on_reject=None):
+    """Parse files in parallel and import each as it finishes; returns {filename: stats}.
+
+    Stats are those of CSVImporter.import_records plus the ``parser``
+    that recognised the file. A file that cannot be read or recognised
+    gets ``{'error': message}`` instead and does not stop the others.
+    ``progress(filename, stats)`` is called after each file and
+    ``on_reject(filename, line_number, reason)`` for each invalid row.
+    """
+    if not filenames:
+        return {}
+    importer = CSVImporter(db, chunk_size=chunk_size, skip_duplicates=skip_duplicates)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(filenames)))
+    modules = sorted({cls.__module__ for cls in registered_parsers()} - {"__main__"})
+
+    results = {}
+    with process_pool(workers, initializer=_load_plugins, initargs=(modules,)) as pool:
+        futures = {pool.submit(read_statement, filename, chunk_size): filename for filename in filenames}
+        for future in as_completed(futures):
+            filename = futures[future]
+            rejected = {'count': 0}
+
+            def reject(line_number, reason):
+                rejected['count'] += 1
+                if on_reject:
+                    on_reject(filename, line_number, reason)
+
+            try:
+                parser_name, spool = future.result()
+                rows = read_spool(spool, reject)
+                try:
+                    stats = importer.import_records(rows, normalize=_already_normalized)
+                finally:
+                    rows.close()
+                    os.unlink(spool)
+            except Exception as e:
+                results[filename] = {'error': str(e)}
+                continue
+
+            stats.update(parser=parser_name, rejected=rejected['count'])
+            results[filename] = stats
+            if progress:
+                progress(filename, dict(stats))
+    return results
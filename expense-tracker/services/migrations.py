@@ -0,0 +1,202 @@
+"""
+Schema migrations for existing ledgers.
+
+New tables are created by ``Base.metadata.create_all``; anything that
+changes a table that already exists (new columns, indexes, data fixes)
+is a numbered step below. The number of applied steps is stored in
+SQLite's ``PRAGMA user_version`` so every step runs exactly once.
+"""
+
+from services.database import Base, engine
+from services import aggregates
+from services import changelog
+# Imported so create_all knows their tables
+from business import budgets
+from business import recurring
+from utils.helpers import parse_date, content_hash
+
+def _has_column(conn, table, column):
+    rows = conn.exec_driver_sql(f"PRAGMA table_info({table})").fetchall()
+    return any(row[1] == column for row in rows)
+
+def _normalize_transaction_dates(conn):
+    """Add transactions.txn_date and normalize every legacy date string once"""
+    if not _has_column(conn, "transactions", "txn_date"):
+        conn.exec_driver_sql("ALTER TABLE transactions ADD COLUMN txn_date DATE")
+
+    rows = conn.exec_driver_sql(
+        "SELECT id, date FROM transactions WHERE txn_date IS NULL"
+    ).fetchall()
+
+    updates = []
+    for row_id, raw_date in rows:
+        parsed = parse_date(raw_date)
+        if parsed:
+            updates.append((parsed.isoformat(), parsed.isoformat(), row_id))
+
+    if updates:
+        conn.exec_driver_sql(
+            "UPDATE transactions SET date = ?, txn_date = ? WHERE id = ?", updates
+        )
+
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_type_txn_date "
+        "ON transactions (type, txn_date)"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_category_txn_date "
+        "ON transactions (category, txn_date)"
+    )
+
+def _create_monthly_totals(conn):
+    """Install the monthly_totals triggers and fill the table from history"""
+    aggregates.install_triggers(conn)
+    aggregates.rebuild_monthly_totals(conn)
+
+def _create_budget_counters(conn):
+    """Install the running budget counter triggers and count existing history"""
+    budgets.install_counter_triggers(conn)
+    budgets.rebuild_budget_counters(conn)
+
+def _add_recurring_occurrence_key(conn):
+    """Tag generated transactions with their recurring id, unique per occurrence date"""
+    if not _has_column(conn, "transactions", "recurring_id"):
+        conn.exec_driver_sql("ALTER TABLE transactions ADD COLUMN recurring_id INTEGER")
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_transactions_recurring_occurrence "
+        "ON transactions (recurring_id, txn_date)"
+    )
+
+def _add_recurrence_rule_columns(conn):
+    """Add the RRULE-style columns; existing items are anchored at their next_date"""
+    columns = (
+        ("start_date", "VARCHAR"),
+        ("interval", "INTEGER DEFAULT 1"),
+        ("weekday", "INTEGER"),
+        ("week_of_month", "INTEGER"),
+        ("month_end", "BOOLEAN DEFAULT 0"),
+        ("end_date", "VARCHAR"),
+        ("max_occurrences", "INTEGER"),
+    )
+    for column, ddl in columns:
+        if not _has_column(conn, "recurring_transactions", column):
+            conn.exec_driver_sql(f"ALTER TABLE recurring_transactions ADD COLUMN {column} {ddl}")
+    conn.exec_driver_sql(
+        "UPDATE recurring_transactions SET start_date = next_date WHERE start_date IS NULL"
+    )
+
+# recurring_transactions as of step 6, frozen here so later model changes
+# cannot alter what this step creates on an old database
+_RECURRING_V6_DDL = """
+    CREATE TABLE recurring_transactions (
+        id INTEGER NOT NULL,
+        name VARCHAR NOT NULL,
+        amount FLOAT NOT NULL,
+        type VARCHAR NOT NULL,
+        category VARCHAR,
+        notes VARCHAR,
+        frequency VARCHAR NOT NULL,
+        next_date VARCHAR NOT NULL,
+        is_active BOOLEAN NOT NULL,
+        start_date VARCHAR,
+        interval INTEGER,
+        weekday INTEGER,
+        week_of_month INTEGER,
+        month_end BOOLEAN,
+        end_date VARCHAR,
+        max_occurrences INTEGER,
+        PRIMARY KEY (id)
+    )
+"""
+_RECURRING_V6_COLUMNS = ("id", "name", "amount", "type", "category", "notes", "frequency", "next_date",
+                         "start_date", "interval", "weekday", "week_of_month", "month_end", "end_date",
+                         "max_occurrences")
+
+def _convert_recurring_is_active(conn):
+    """Rebuild recurring_transactions with a Boolean is_active and an (is_active, next_date) index.
+
+    SQLite cannot change a column's type in place, so the table is
+    renamed, recreated and copied across.
+    """
+    columns = {row[1]: row[2] for row in
+               conn.exec_driver_sql("PRAGMA table_info(recurring_transactions)").fetchall()}
+    if columns.get("is_active", "").upper() != "BOOLEAN":
+        conn.exec_driver_sql("ALTER TABLE recurring_transactions RENAME TO recurring_transactions_old")
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_recurring_transactions_id")
+        conn.exec_driver_sql(_RECURRING_V6_DDL)
+        conn.exec_driver_sql("CREATE INDEX ix_recurring_transactions_id ON recurring_transactions (id)")
+
+        shared = [f'"{name}"' for name in _RECURRING_V6_COLUMNS if name in columns]
+        conn.exec_driver_sql(
+            f"INSERT INTO recurring_transactions ({', '.join(shared)}, is_active) "
+            f"SELECT {', '.join(shared)}, "
+            "CASE WHEN lower(is_active) IN ('true', '1') THEN 1 ELSE 0 END "
+            "FROM recurring_transactions_old"
+        )
+        conn.exec_driver_sql("DROP TABLE recurring_transactions_old")
+
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_recurring_transactions_active_next_date "
+        "ON recurring_transactions (is_active, next_date)"
+    )
+
+def _add_content_hash(conn):
+    """Add transactions.content_hash, its counted index, and hash every existing row"""
+    if not _has_column(conn, "transactions", "content_hash"):
+        conn.exec_driver_sql("ALTER TABLE transactions ADD COLUMN content_hash VARCHAR")
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_content_hash ON transactions (content_hash)"
+    )
+
+    # Hash in one UPDATE through a Python SQL function; content_hash is not
+    # a trigger column, so the aggregates are left alone
+    conn.connection.dbapi_connection.create_function("content_hash", 5, content_hash, deterministic=True)
+    conn.exec_driver_sql(
+        "UPDATE transactions SET content_hash = content_hash(date, amount, type, category, notes) "
+        "WHERE content_hash IS NULL"
+    )
+
+def _create_change_log(conn):
+    """Install the change log triggers.
+
+    The log starts empty: a feed's first export reads the ledger itself
+    rather than the log, so existing rows need no entries.
+    """
+    changelog.install_triggers(conn)
+
+def _create_daily_totals(conn):
+    """Install the daily_totals triggers and fill the table from history"""
+    aggregates.install_daily_triggers(conn)
+    aggregates.rebuild_daily_totals(conn)
+
+# Append only - never reorder or remove steps
+MIGRATIONS = [
+    _normalize_transaction_dates,
+    _create_monthly_totals,
+    _create_budget_counters,
+    _add_recurring_occurrence_key,
+    _add_recurrence_rule_columns,
+    _convert_recurring_is_active,
+    _add_content_hash,
+    _create_change_log,
+    _create_daily_totals,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_schema_version(conn):
+    """Return the number of migration steps applied to a connection's database"""
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+def migrate(bind=None):
+    """Create missing tables and apply pending migration steps"""
+    bind = bind or engine
+    Base.metadata.create_all(bind)
+
+    with bind.begin() as conn:
+        version = get_schema_version(conn)
+        for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+            step(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {number}")
+
+    return SCHEMA_VERSION
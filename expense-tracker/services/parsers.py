@@ -0,0 +1,149 @@
+"""
+Statement format plugins.
+
+Each file layout the importer understands is a StatementParser subclass
+added to the registry with ``@register_parser``. The parser for a file
+is picked from its header row: registered parsers are tried in order and
+the first whose required columns are all present wins. A parser only
+maps a raw row onto the ledger's date/amount/type/category/notes fields;
+validation, duplicate detection and inserting stay in services.importer.
+
+Column names are compared after normalize_header, so 'Withdrawal Amt.'
+and 'withdrawal amt' are the same column.
+"""
+
+import re
+
+LEDGER_FIELDS = ("date", "amount", "type", "category", "notes")
+
+# Column names banks use for the same thing, most specific first
+DATE_COLUMNS = ("date", "txn date", "transaction date", "tran date", "posting date", "value date", "value dt")
+NOTES_COLUMNS = ("narration", "description", "particulars", "details", "transaction details", "remarks")
+
+_PARSERS = []
+
+def normalize_header(name):
+    """Lower-case a column name and reduce punctuation to single spaces"""
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", str(name or "").lower()).split())
+
+def register_parser(cls):
+    """Class decorator adding a statement format to the registry"""
+    if cls not in _PARSERS:
+        _PARSERS.append(cls)
+    return cls
+
+def registered_parsers():
+    """Registered parser classes in detection order"""
+    return list(_PARSERS)
+
+def detect_parser(fieldnames):
+    """Return a parser bound to the first registered format matching the header; raises ValueError if none does"""
+    header = [normalize_header(name) for name in fieldnames or []]
+    for cls in _PARSERS:
+        parser = cls.detect(header)
+        if parser:
+            return parser
+    raise ValueError(f"Unrecognised file format (columns: {', '.join(header) or 'none'}). "
+                     "Ledger files need date, amount and type columns.")
+
+def parse_amount(value):
+    """Parse a statement amount ('1,250.00', '', None); blank is 0, anything else invalid raises ValueError"""
+    text = str(value or "").replace(",", "").strip()
+    if not text:
+        return 0.0
+    try:
+        return float(text)
+    except ValueError:
+        raise ValueError(f"invalid amount {value!r}")
+
+class StatementParser:
+    """A file layout: ``columns`` maps each field to the header names it may appear under"""
+
+    name = None
+    columns = {}   # required fields
+    optional = {}
+
+    def __init__(self, mapping):
+        self.mapping = mapping  # field -> normalized column name in this file
+
+    @classmethod
+    def detect(cls, header):
+        """Return a parser bound to ``header`` (normalized names), or None if the layout does not match"""
+        mapping = {}
+        for field, aliases in list(cls.columns.items()) + list(cls.optional.items()):
+            column = next((alias for alias in aliases if alias in header), None)
+            if column:
+                mapping[field] = column
+            elif field in cls.columns:
+                return None
+        return cls(mapping)
+
+    def get(self, row, field):
+        column = self.mapping.get(field)
+        return row.get(column) if column else None
+
+    def to_ledger(self, row):
+        """Map a raw row (keyed by normalized column name) to a dict of LEDGER_FIELDS"""
+        raise NotImplementedError
+
+@register_parser
+class LedgerParser(StatementParser):
+    """The app's own export layout: date, amount, type[, category, notes]"""
+
+    name = "ledger"
+    columns = {"date": ("date",), "amount": ("amount",), "type": ("type",)}
+    optional = {"category": ("category",), "notes": ("notes",)}
+
+    def to_ledger(self, row):
+        return {field: self.get(row, field) for field in LEDGER_FIELDS}
+
+@register_parser
+class DebitCreditParser(StatementParser):
+    """Bank account statements with separate withdrawal and deposit columns"""
+
+    name = "debit-credit"
+    columns = {
+        "date": DATE_COLUMNS,
+        "debit": ("debit", "withdrawal amt", "withdrawal amount", "withdrawal", "withdrawals", "debit amount", "dr"),
+        "credit": ("credit", "deposit amt", "deposit amount", "deposit", "deposits", "credit amount", "cr"),
+    }
+    optional = {"notes": NOTES_COLUMNS, "category": ("category",)}
+
+    def to_ledger(self, row):
+        debit = parse_amount(self.get(row, "debit"))
+        credit = parse_amount(self.get(row, "credit"))
+        if debit and credit:
+            raise ValueError("both a withdrawal and a deposit amount")
+        if not debit and not credit:
+            raise ValueError("no withdrawal or deposit amount")
+        return {
+            'date': self.get(row, "date"),
+            'amount': abs(debit or credit),
+            'type': "expense" if debit else "income",
+            'category': self.get(row, "category"),
+            'notes': self.get(row, "notes"),
+        }
+
+@register_parser
+class SignedAmountParser(StatementParser):
+    """Card and account exports with one signed amount column (negative = money out)"""
+
+    name = "signed-amount"
+    columns = {
+        "date": DATE_COLUMNS,
+        "amount": ("amount", "transaction amount", "amount inr"),
+        "notes": NOTES_COLUMNS + ("merchant",),
+    }
+    optional = {"category": ("category",)}
+
+    def to_ledger(self, row):
+        amount = parse_amount(self.get(row, "amount"))
+        if not amount:
+            raise ValueError("zero amount")
+        return {
+            'date': self.get(row, "date"),
+            'amount': abs(amount),
+            'type': "expense" if amount < 0 else "income",
+            'category': self.get(row, "category"),
+            'notes': self.get(row, "notes"),
+        }
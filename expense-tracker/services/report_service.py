@@ -0,0 +1,34 @@
+from sqlalchemy import func, case, and_
+from services.database import SessionLocal
+from services.aggregates import MonthlyTotal
+from datetime import datetime
+
+class ReportService:
+    def __init__(self, db=None):
+        self.db = db or SessionLocal()
+
+    def get_summary_stats(self, today=None):
+        """Get all-time and current-month totals in a single aggregate query"""
+        current_month = (today or datetime.now()).strftime("%Y-%m")
+        is_income = MonthlyTotal.type == "income"
+        is_expense = MonthlyTotal.type == "expense"
+        this_month = MonthlyTotal.month == current_month
+
+        def total_where(*conditions):
+            return func.coalesce(func.sum(case((and_(*conditions), MonthlyTotal.total), else_=0)), 0)
+
+        total_income, total_expense, month_income, month_expense = self.db.query(
+            total_where(is_income),
+            total_where(is_expense),
+            total_where(is_income, this_month),
+            total_where(is_expense, this_month),
+        ).one()
+
+        return {
+            'total_income': total_income,
+            'total_expense': total_expense,
+            'month_income': month_income,
+            'month_expense': month_expense,
+            'month_balance': month_income - month_expense,
+            'net_worth': total_income - total_expense
+        }
@@ -0,0 +1,113 @@
+"""
+Hot restore of a backup into the running application.
+
+The backup (plain or gzipped) is unpacked next to the live database and
+checked with ``PRAGMA quick_check`` (or the full ``integrity_check``,
+which also verifies every index and is an order of magnitude slower)
+and its schema version before anything is touched. It is then copied
+over the live database in a single step of SQLite's backup API, which
+other connections see as one
+atomic change, unlike a file copy under open WAL connections.
+
+Background workers that hold their own sessions (the recurring
+scheduler, the chart worker) register pause hooks: they are paused
+before the swap and resumed once the engine's pool is rebuilt and the
+restored schema migrated forward. Sessions on other threads are never
+touched from here; the caller refreshes its own. Finally the registered
+restore hooks (caches, open views) are run, so the app carries on with
+the restored data.
+"""
+
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+from services.database import engine
+from services.migrations import migrate, SCHEMA_VERSION
+from config import DB_PATH
+
+_RESTORE_HOOKS = []
+# (pause, resume) pairs of workers that must be idle across the swap
+_PAUSE_HOOKS = []
+
+def register_restore_hook(callback):
+    """Call ``callback()`` after every restore, e.g. to drop a cache built from the old data"""
+    _RESTORE_HOOKS.append(callback)
+    return callback
+
+def register_pause_hook(pause, resume):
+    """Call ``pause()`` before every swap and ``resume()`` after it, e.g. to stop a worker thread"""
+    _PAUSE_HOOKS.append((pause, resume))
+
+def unregister_pause_hook(pause, resume):
+    """Stop calling hooks added with register_pause_hook"""
+    if (pause, resume) in _PAUSE_HOOKS:
+        _PAUSE_HOOKS.remove((pause, resume))
+
+def _unpack(backup_path, directory):
+    """Copy a (possibly gzipped) backup to a temporary database file in ``directory``"""
+    fd, unpacked = tempfile.mkstemp(suffix=".db", dir=directory)
+    with os.fdopen(fd, "wb") as dst:
+        with open(backup_path, "rb") as probe:
+            gzipped = probe.read(2) == b"\x1f\x8b"
+        with (gzip.open if gzipped else open)(backup_path, "rb") as src:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    return unpacked
+
+def validate_backup(path, full_check=False):
+    """Raise ValueError unless ``path`` is an intact ledger this version can open; returns its schema version"""
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            check = "integrity_check" if full_check else "quick_check"
+            result = conn.execute(f"PRAGMA {check}").fetchone()[0]
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            has_ledger = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions'").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        raise ValueError(f"Not a valid database backup: {e}")
+
+    if result != "ok":
+        raise ValueError(f"Backup failed the integrity check: {result}")
+    if not has_ledger:
+        raise ValueError("Backup does not contain a transactions table")
+    if version > SCHEMA_VERSION:
+        raise ValueError(f"Backup is from a newer version (schema {version}, this app supports {SCHEMA_VERSION})")
+    return version
+
+def restore_database(backup_path, db_path=DB_PATH, bind=engine, full_check=False):
+    """Validate a backup and swap it in for the live database; returns the backup's schema version"""
+    unpacked = _unpack(backup_path, os.path.dirname(os.path.abspath(db_path)))
+    try:
+        version = validate_backup(unpacked, full_check)
+
+        # No worker may be half-way through a query across the swap
+        paused = []
+        try:
+            for pause, resume in list(_PAUSE_HOOKS):
+                pause()
+                paused.append(resume)
+            bind.dispose()
+
+            source = sqlite3.connect(unpacked)
+            target = sqlite3.connect(db_path, timeout=30)
+            try:
+                source.backup(target)  # one step: readers see the old or the new data, never a mix
+            finally:
+                target.close()
+                source.close()
+
+            bind.dispose()
+            migrate(bind)
+        finally:
+            for resume in reversed(paused):
+                resume()
+    finally:
+        os.unlink(unpacked)
+
+    for callback in _RESTORE_HOOKS:
+        callback()
+    return version
@@ -0,0 +1,114 @@
+"""
+Background scheduler for recurring transactions.
+
+The scheduler runs in a daemon thread, posts due recurring items, then
+sleeps until the earliest active ``next_date`` comes round. Results are
+put on a thread-safe queue that the Tk main loop drains with
+``root.after`` - widgets must never be touched from the worker thread.
+"""
+
+import queue
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from services.database import SessionLocal
+from business.recurring import RecurringTransaction, RecurringManager, register_change_hook, unregister_change_hook
+from services.restore import register_pause_hook, unregister_pause_hook
+from utils.helpers import parse_date
+
+# Re-check at least this often so edits made outside the app are noticed
+MAX_SLEEP_SECONDS = 3600
+
+class RecurringScheduler:
+    def __init__(self, session_factory=SessionLocal, results=None, max_sleep=MAX_SLEEP_SECONDS):
+        self.session_factory = session_factory
+        self.results = results or queue.Queue()
+        self.max_sleep = max_sleep
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the worker thread (the first check runs immediately)"""
+        if self._thread and self._thread.is_alive():
+            return
+        # Items added or edited while asleep may be due before the next wake-up
+        register_change_hook(self.wake)
+        # A restore swaps the database file; the thread sits it out
+        register_pause_hook(self.pause, self.resume)
+        self.resume()
+
+    def stop(self, timeout=5):
+        """Ask the worker thread to exit and wait for it"""
+        unregister_change_hook(self.wake)
+        unregister_pause_hook(self.pause, self.resume)
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            if not self._thread.is_alive():
+                self._thread = None
+
+    def pause(self, timeout=5):
+        """Stop the worker thread without unregistering its hooks; resume() starts it again.
+
+        Raises RuntimeError, and leaves the thread running, if its
+        current run does not finish within ``timeout`` seconds, so a
+        restore is abandoned rather than swapping the file under a writer.
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                self._stop.clear()
+                raise RuntimeError("The recurring scheduler is still busy; try again shortly")
+            self._thread = None
+
+    def resume(self):
+        """Start the worker thread again after pause()"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._wake.clear()
+        self._thread = threading.Thread(target=self._run, name="recurring-scheduler", daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        """Re-check now; called whenever a recurring item is added, edited or deleted"""
+        self._wake.set()
+
+    def run_once(self, now=None):
+        """Post due items and refresh the occurrence index; returns seconds until the next check"""
+        now = now or datetime.now()
+        db = self.session_factory()
+        try:
+            manager = RecurringManager(db)
+            processed = manager.process_due_recurring(today=now)
+            if processed > 0:
+                self.results.put(("recurring", processed))
+            manager.refresh_occurrence_index(today=now.date())
+            return self.seconds_until_next_due(db, now)
+        except Exception as e:
+            print(f"Error processing recurring transactions: {e}")
+            return self.max_sleep
+        finally:
+            db.close()
+
+    def seconds_until_next_due(self, db, now):
+        """Seconds from ``now`` until midnight of the earliest active next_date, capped at max_sleep"""
+        next_date = parse_date(db.query(func.min(RecurringTransaction.next_date)).filter(
+            RecurringTransaction.is_active.is_(True)).scalar())
+        if not next_date:
+            return self.max_sleep
+
+        due_at = datetime.combine(next_date, datetime.min.time())
+        # Anything due today was just posted; the next chance is tomorrow
+        due_at = max(due_at, datetime.combine(now.date() + timedelta(days=1), datetime.min.time()))
+        return min(max((due_at - now).total_seconds(), 0), self.max_sleep)
+
+    def _run(self):
+        while not self._stop.is_set():
+            delay = self.run_once()
+            self._wake.wait(delay)
+            self._wake.clear()
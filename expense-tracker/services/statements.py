@@ -0,0 +1,143 @@
+"""
+Headless monthly statement packs.
+
+A statement is a summary page of tables followed by the month's charts:
+the twelve-month trend up to it, its expense categories and its daily
+timeline. A pack is written as one multi-page PDF, or as one PNG or SVG
+file per page. Figures are drawn with the Agg, PDF and SVG backends
+only, so no display is needed.
+
+Each (ledger, month) statement is an independent task in a process
+pool, since drawing is CPU-bound and holds the GIL. Workers open their
+own connection to the ledger file; the parent migrates every ledger
+once first so the aggregate tables the charts read from exist.
+"""
+
+import calendar
+import os
+from concurrent.futures import as_completed
+from datetime import date
+from sqlalchemy.orm import sessionmaker
+from services.database import make_engine
+from services.migrations import migrate
+from services.aggregates import get_monthly_totals
+from utils.helpers import process_pool
+from config import STATEMENT_DIR, STATEMENT_DPI, STATEMENT_WORKERS
+
+STATEMENT_FORMATS = ("pdf", "png", "svg")
+
+def month_bounds(month):
+    """First and last day of a 'YYYY-MM' month"""
+    year, number = (int(part) for part in month.split("-"))
+    return date(year, number, 1), date(year, number, calendar.monthrange(year, number)[1])
+
+def statement_pages(month):
+    """(chart name, parameters) of every page of a month's statement, in order"""
+    first, last = month_bounds(month)
+    return [
+        ("statement_summary", {"month": month}),
+        ("monthly_summary", {"until": month}),
+        ("category_breakdown", {"month": month}),
+        ("timeline", {"start": first, "end": last}),
+    ]
+
+def render_statement(db_path, month, directory, file_format="pdf", dpi=STATEMENT_DPI):
+    """Write one month's statement from a ledger file; returns the paths written"""
+    # Imported here so the parent process does not need matplotlib to plan a batch
+    from matplotlib.backends.backend_pdf import PdfPages
+    from utils.charts import CHARTS
+
+    engine = make_engine(db_path)
+    db = sessionmaker(bind=engine)()
+    views = []
+    try:
+        for chart, params in statement_pages(month):
+            view = CHARTS[chart](**params)
+            views.append((chart, view))
+            view.update(db)
+
+        os.makedirs(directory, exist_ok=True)
+        if file_format == "pdf":
+            path = os.path.join(directory, f"statement-{month}.pdf")
+            with PdfPages(path, metadata={"Title": f"Statement {month}"}) as pdf:
+                for _, view in views:
+                    pdf.savefig(view.figure)
+            return [path]
+
+        pages = os.path.join(directory, f"statement-{month}")
+        os.makedirs(pages, exist_ok=True)
+        paths = []
+        for number, (chart, view) in enumerate(views, 1):
+            path = os.path.join(pages, f"{number:02d}-{chart}.{file_format}")
+            view.figure.savefig(path, format=file_format, dpi=dpi)
+            paths.append(path)
+        return paths
+    finally:
+        for _, view in views:
+            view.close()
+        db.close()
+        engine.dispose()
+
+def ledger_months(db_path):
+    """Migrate a ledger file and return the 'YYYY-MM' months that have transactions"""
+    engine = make_engine(db_path)
+    try:
+        migrate(engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            return sorted(get_monthly_totals(db))
+        finally:
+            db.close()
+    finally:
+        engine.dispose()
+
+def render_statements(ledgers, directory=STATEMENT_DIR, months=None, year=None, file_format="pdf",
+                      workers=STATEMENT_WORKERS, progress=None):
+    """Render a statement for every month of every ledger; returns {(ledger, month): result}.
+
+    ``months`` lists the months wanted; by default every month with
+    transactions, optionally only those of ``year``. Each ledger's
+    statements go to a subdirectory named after its file. A result is
+    ``{'files': [paths]}``, or ``{'error': message}`` for a statement
+    that failed without stopping the others. ``progress(ledger, month,
+    result)`` is called as each one finishes. ``workers=1`` renders in
+    this process.
+    """
+    if file_format not in STATEMENT_FORMATS:
+        raise ValueError(f"Unknown statement format: {file_format}")
+
+    tasks = []
+    for ledger in ledgers:
+        available = ledger_months(ledger)  # also migrates it before any worker reads it
+        wanted = months or [m for m in available if not year or m.startswith(f"{year}-")]
+        out = os.path.join(directory, os.path.splitext(os.path.basename(ledger))[0])
+        tasks += [(ledger, month, out) for month in wanted]
+    if not tasks:
+        return {}
+
+    results = {}
+
+    def finish(ledger, month, result):
+        results[(ledger, month)] = result
+        if progress:
+            progress(ledger, month, result)
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks)))
+    if workers == 1:
+        for ledger, month, out in tasks:
+            try:
+                finish(ledger, month, {'files': render_statement(ledger, month, out, file_format)})
+            except Exception as e:
+                finish(ledger, month, {'error': str(e)})
+        return results
+
+    with process_pool(workers) as pool:
+        futures = {pool.submit(render_statement, ledger, month, out, file_format): (ledger, month)
+                   for ledger, month, out in tasks}
+        for future in as_completed(futures):
+            ledger, month = futures[future]
+            try:
+                finish(ledger, month, {'files': future.result()})
+            except Exception as e:
+                finish(ledger, month, {'error': str(e)})
+    return results
@@ -1,14 +1,16 @@
 import unittest
 import os
 import tempfile
+import numpy as np
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 # Import our modules
 from services.database import Base, Transaction
-from business.budgets import Budget, BudgetManager
-from business.recurring import RecurringTransaction, RecurringManager
+from business.budgets import Budget, BudgetManager, BudgetCounter
+from business.recurring import RecurringTransaction, RecurringOccurrence, RecurringManager, RecurrenceRule
+from business.projection import CashFlowProjection
 
 class TestBudgetManager(unittest.TestCase):
     def setUp(self):
@@ -65,5 +67,341 @@ class TestBudgetManager(unittest.TestCase):
         self.assertEqual(status['percentage'], 70.0)
         self.assertFalse(status['is_over_budget'])
 
+    def test_all_budget_status_single_query(self):
+        """Test every budget's own period window is applied in one query"""
+        self.budget_manager.create_budget("Food", 1000, "weekly")
+        self.budget_manager.create_budget("Rent", 5000, "monthly")
+        self.budget_manager.create_budget("Travel", 20000, "yearly")
+
+        # Thursday 2024-02-15: week starts Mon 02-12, month 02-01, year 01-01
+        self.db.add_all([
+            Transaction(date="2024-02-12", amount=300, type="expense", category="Food"),
+            Transaction(date="2024-02-11", amount=999, type="expense", category="Food"),
+            Transaction(date="2024-02-01", amount=4500, type="expense", category="Rent"),
+            Transaction(date="2024-01-31", amount=4500, type="expense", category="Rent"),
+            Transaction(date="2024-01-02", amount=25000, type="expense", category="Travel"),
+            Transaction(date="2024-02-13", amount=100, type="income", category="Food"),
+        ])
+        self.db.commit()
+
+        statements = []
+        event.listen(self.engine, "before_cursor_execute",
+                     lambda *args: statements.append(args[2]))
+        status = {s['category']: s for s in
+                  self.budget_manager.get_all_budget_status(today=datetime(2024, 2, 15))}
+        self.assertEqual(len(statements), 1)
+
+        self.assertEqual(status["Food"]['spent_amount'], 300)
+        self.assertEqual(status["Rent"]['spent_amount'], 4500)
+        self.assertEqual(status["Travel"]['spent_amount'], 25000)
+        self.assertTrue(status["Travel"]['is_over_budget'])
+
+        alerts = self.budget_manager.get_budget_alerts(today=datetime(2024, 2, 15))
+        self.assertEqual({(a['category'], a['type']) for a in alerts},
+                         {("Travel", "over_budget"), ("Rent", "warning")})
+
+    def test_counters_follow_edits_and_roll_over(self):
+        """Test running counters track edits, deletes and period boundaries"""
+        self.budget_manager.create_budget("Food", 1000, "monthly")
+        t = Transaction(date="2024-02-10", amount=400, type="expense", category="Food")
+        self.db.add(t)
+        self.db.add(Transaction(date="2024-01-31", amount=50, type="expense", category="Food"))
+        self.db.commit()
+
+        feb = datetime(2024, 2, 20)
+        self.assertEqual(self.budget_manager.get_budget_status("Food", today=feb)['spent_amount'], 400)
+
+        t.amount = 900
+        self.db.commit()
+        self.assertEqual(self.budget_manager.get_category_alert("Food", today=feb)['type'], 'warning')
+
+        t.category = "Rent"
+        self.db.commit()
+        self.assertEqual(self.budget_manager.get_budget_status("Food", today=feb)['spent_amount'], 0)
+        self.assertIsNone(self.budget_manager.get_category_alert("Food", today=feb))
+
+        # A new month reads a fresh counter
+        status = self.budget_manager.get_budget_status("Food", today=datetime(2024, 1, 31))
+        self.assertEqual(status['spent_amount'], 50)
+        self.assertEqual(self.budget_manager.get_budget_status("Food", today=datetime(2024, 3, 1))['spent_amount'], 0)
+
+        self.db.delete(t)
+        self.db.commit()
+        self.assertEqual(self.budget_manager.reconcile_counters(), [])
+
+    def test_new_budget_counts_existing_history(self):
+        """Test creating or changing a budget recounts that category"""
+        self.db.add(Transaction(date="2024-02-12", amount=300, type="expense", category="Food"))
+        self.db.add(Transaction(date="2024-02-01", amount=200, type="expense", category="Food"))
+        self.db.commit()
+
+        self.budget_manager.create_budget("Food", 1000, "monthly")
+        feb = datetime(2024, 2, 15)
+        self.assertEqual(self.budget_manager.get_budget_status("Food", today=feb)['spent_amount'], 500)
+
+        self.budget_manager.create_budget("Food", 1000, "weekly")
+        self.assertEqual(self.budget_manager.get_budget_status("Food", today=feb)['spent_amount'], 300)
+
+    def test_reconcile_repairs_drift(self):
+        """Test reconcile reports and fixes counters that disagree with the ledger"""
+        self.budget_manager.create_budget("Food", 1000, "monthly")
+        self.db.add(Transaction(date="2024-02-12", amount=300, type="expense", category="Food"))
+        self.db.commit()
+
+        self.db.query(BudgetCounter).update({BudgetCounter.spent: 1})
+        self.db.commit()
+
+        mismatches = self.budget_manager.reconcile_counters()
+        self.assertEqual(len(mismatches), 1)
+        self.assertEqual(mismatches[0][2:], (1, 300))
+        self.assertEqual(self.budget_manager.reconcile_counters(), [])
+
+    def test_close_finished_periods_backfill_and_append(self):
+        """Test period snapshots backfill history once, then append new periods"""
+        self.db.add_all([
+            Transaction(date="2023-11-05", amount=600, type="expense", category="Food"),
+            Transaction(date="2024-01-10", amount=1200, type="expense", category="Food"),
+            Transaction(date="2024-01-11", amount=100, type="expense", category="Food"),
+            Transaction(date="2024-02-10", amount=50, type="expense", category="Food"),
+        ])
+        self.db.commit()
+        self.budget_manager.create_budget("Food", 1000, "monthly")
+
+        written = self.budget_manager.close_finished_periods(today=datetime(2024, 2, 15))
+        self.assertEqual(written, 3)  # Nov, Dec (no spend) and Jan
+        history = self.budget_manager.get_budget_history("Food")
+        self.assertEqual([p.period_start for p in history], ["2023-11-01", "2023-12-01", "2024-01-01"])
+        self.assertEqual([p.actual_spent for p in history], [600, 0, 1300])
+        self.assertEqual(history[2].variance, -300)
+        self.assertEqual(history[2].txn_count, 2)
+        self.assertEqual(history[2].period_end, "2024-01-31")
+
+        # Re-running in the same period adds nothing; next month adds February
+        self.assertEqual(self.budget_manager.close_finished_periods(today=datetime(2024, 2, 28)), 0)
+        self.assertEqual(self.budget_manager.close_finished_periods(today=datetime(2024, 3, 2)), 1)
+        self.assertEqual(self.budget_manager.get_budget_history("Food")[-1].actual_spent, 50)
+
+class TestRecurringManager(unittest.TestCase):
+    def setUp(self):
+        """Set up test database"""
+        self.test_db = tempfile.NamedTemporaryFile(delete=False)
+        self.test_db.close()
+        
+        self.engine = create_engine(f"sqlite:///{self.test_db.name}")
+        Base.metadata.create_all(self.engine)
+        
+        SessionLocal = sessionmaker(bind=self.engine)
+        self.db = SessionLocal()
+        
+        self.recurring_manager = RecurringManager()
+        self.recurring_manager.db = self.db
+    
+    def tearDown(self):
+        """Clean up test database"""
+        self.db.close()
+        os.unlink(self.test_db.name)
+
+    def test_occurrences_anchor_to_start_day(self):
+        """Test monthly dates clamp to short months without drifting"""
+        dates = RecurrenceRule("monthly", "2024-01-31").occurrences("2024-04-30").astype(str).tolist()
+        self.assertEqual(dates, ["2024-01-31", "2024-02-29", "2024-03-31", "2024-04-30"])
+        dates = RecurrenceRule("yearly", "2024-02-29").occurrences("2026-12-31").astype(str).tolist()
+        self.assertEqual(dates, ["2024-02-29", "2025-02-28", "2026-02-28"])
+        self.assertEqual(len(RecurrenceRule("weekly", "2024-01-01").occurrences("2024-01-29")), 5)
+
+    def test_catch_up_posts_every_missed_occurrence(self):
+        """Test a daily item three months behind is fully caught up in one run"""
+        self.recurring_manager.create_recurring("Coffee", 50, "expense", "Food", "", "daily", "2024-01-01")
+        self.recurring_manager.create_recurring("Rent", 9000, "expense", "Bills", "", "monthly", "2024-01-31")
+
+        processed = self.recurring_manager.process_due_recurring(today=datetime(2024, 3, 31))
+        self.assertEqual(processed, 91 + 3)
+
+        coffee, rent = self.db.query(RecurringTransaction).order_by(RecurringTransaction.id).all()
+        self.assertEqual(coffee.next_date, "2024-04-01")
+        self.assertEqual(rent.next_date, "2024-04-30")
+        self.assertEqual(self.db.query(Transaction).filter(Transaction.recurring_id == rent.id).count(), 3)
+
+        # Nothing new is due on the same day
+        self.assertEqual(self.recurring_manager.process_due_recurring(today=datetime(2024, 3, 31)), 0)
+
+    def test_replay_after_crash_never_double_posts(self):
+        """Test occurrences already posted are skipped if next_date was not saved"""
+        self.recurring_manager.create_recurring("Gym", 1500, "expense", "Health", "", "weekly", "2024-01-01")
+        self.recurring_manager.process_due_recurring(today=datetime(2024, 1, 20))
+
+        # Simulate a crash that lost the next_date update
+        self.db.query(RecurringTransaction).update({RecurringTransaction.next_date: "2024-01-01"})
+        self.db.commit()
+        self.assertEqual(self.recurring_manager.process_due_recurring(today=datetime(2024, 1, 20)), 0)
+
+        dates = [t.date for t in self.db.query(Transaction).order_by(Transaction.txn_date)]
+        self.assertEqual(dates, ["2024-01-01", "2024-01-08", "2024-01-15"])
+
+    def test_rule_interval_nth_weekday_and_month_end(self):
+        """Test interval, nth/last weekday and month-end rules"""
+        as_list = lambda dates: dates.astype(str).tolist()
+
+        # Every other week
+        rule = RecurrenceRule("weekly", "2024-01-01", interval=2)
+        self.assertEqual(as_list(rule.occurrences("2024-02-01")), ["2024-01-01", "2024-01-15", "2024-01-29"])
+
+        # Second Tuesday of each month
+        rule = RecurrenceRule("monthly", "2024-01-01", weekday=1, week_of_month=2)
+        self.assertEqual(as_list(rule.occurrences("2024-03-31")), ["2024-01-09", "2024-02-13", "2024-03-12"])
+
+        # Last Friday of each quarter
+        rule = RecurrenceRule("monthly", "2024-01-01", interval=3, weekday=4, week_of_month=-1)
+        self.assertEqual(as_list(rule.occurrences("2024-12-31")),
+                         ["2024-01-26", "2024-04-26", "2024-07-26", "2024-10-25"])
+
+        # Month end, stopped by an end date and by a count
+        rule = RecurrenceRule("monthly", "2024-01-15", month_end=True, until="2024-03-30")
+        self.assertEqual(as_list(rule.occurrences("2024-12-31")), ["2024-01-31", "2024-02-29"])
+        rule = RecurrenceRule("daily", "2024-01-01", count=3)
+        self.assertEqual(as_list(rule.occurrences("2024-12-31")), ["2024-01-01", "2024-01-02", "2024-01-03"])
+        self.assertIsNone(rule.next_after("2024-01-03"))
+
+    def test_finished_schedule_is_deactivated(self):
+        """Test a rule with a count stops posting and deactivates itself"""
+        self.recurring_manager.create_recurring("Loan", 100, "expense", "Bills", "", "monthly",
+                                                "2024-01-05", max_occurrences=2)
+        self.assertEqual(self.recurring_manager.process_due_recurring(today=datetime(2024, 6, 1)), 2)
+        self.assertEqual(self.recurring_manager.get_all_recurring(), [])
+
+    def test_upcoming_lists_every_occurrence_in_range(self):
+        """Test a weekly item shows once per occurrence, read from the occurrence index"""
+        start = datetime.now().date() + timedelta(days=1)
+        self.recurring_manager.create_recurring("Gym", 1500, "expense", "Health", "", "weekly", start.isoformat())
+        self.recurring_manager.create_recurring("Rent", 9000, "expense", "Bills", "", "yearly", start.isoformat())
+
+        upcoming = self.recurring_manager.get_upcoming_recurring(days_ahead=28)
+        self.assertEqual([u['name'] for u in upcoming], ["Gym", "Rent", "Gym", "Gym", "Gym"])
+        self.assertEqual(upcoming[-1]['next_date'], (start + timedelta(weeks=3)).isoformat())
+
+        self.recurring_manager.delete_recurring(upcoming[0]['id'])
+        self.assertEqual([u['name'] for u in self.recurring_manager.get_upcoming_recurring(28)], ["Rent"])
+
+    def test_upcoming_beyond_horizon_is_read_only(self):
+        """Test a range past the indexed horizon is expanded in memory without touching the index"""
+        start = datetime.now().date() + timedelta(days=1)
+        self.recurring_manager.create_recurring("Rent", 9000, "expense", "Bills", "", "monthly", start.isoformat())
+        indexed = self.db.query(RecurringOccurrence).count()
+
+        upcoming = self.recurring_manager.get_upcoming_recurring(days_ahead=365)
+        self.assertEqual(len(upcoming), 12)
+        self.assertEqual(upcoming[0]['next_date'], start.isoformat())
+        self.assertEqual(self.db.query(RecurringOccurrence).count(), indexed)
+        self.assertFalse(self.db.dirty or self.db.new)
+
+    def test_schedule_edit_recomputes_next_date(self):
+        """Test changing the rule moves next_date and the index to the new schedule"""
+        self.recurring_manager.create_recurring("Gym", 1500, "expense", "Health", "", "weekly", "2030-01-07")
+        gym = self.db.query(RecurringTransaction).one()
+
+        self.recurring_manager.update_recurring(gym.id, frequency="monthly", weekday=4, week_of_month=-1)
+        self.assertEqual(gym.next_date, "2030-01-25")  # last Friday of January
+
+        self.recurring_manager.update_recurring(gym.id, start_date="2031-03-01")
+        self.assertEqual(gym.next_date, "2031-03-28")
+        dates = [o.occurrence_date for o in self.db.query(RecurringOccurrence)]
+        self.assertTrue(all(d >= "2031-03-28" for d in dates))
+
+        # Renaming leaves the schedule alone
+        self.recurring_manager.update_recurring(gym.id, name="Climbing")
+        self.assertEqual(gym.next_date, "2031-03-28")
+
+    def test_due_filter_skips_inactive_and_future_items(self):
+        """Test only active items whose next date has arrived are returned as due"""
+        self.recurring_manager.create_recurring("Rent", 9000, "expense", "Bills", "", "monthly", "2024-01-01")
+        self.recurring_manager.create_recurring("Gym", 1500, "expense", "Health", "", "monthly", "2024-01-01")
+        self.recurring_manager.create_recurring("Trip", 20000, "expense", "Travel", "", "yearly", "2024-06-01")
+        gym = self.db.query(RecurringTransaction).filter_by(name="Gym").one()
+        gym.is_active = False
+        self.db.commit()
+
+        due = self.recurring_manager.get_due_recurring(datetime(2024, 2, 1).date())
+        self.assertEqual([r.name for r in due], ["Rent"])
+
+class TestCashFlowProjection(unittest.TestCase):
+    def setUp(self):
+        """Set up test database"""
+        self.test_db = tempfile.NamedTemporaryFile(delete=False)
+        self.test_db.close()
+        
+        self.engine = create_engine(f"sqlite:///{self.test_db.name}")
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        
+        self.recurring_manager = RecurringManager(self.db)
+        self.projection = CashFlowProjection(self.db)
+    
+    def tearDown(self):
+        """Clean up test database"""
+        self.db.close()
+        os.unlink(self.test_db.name)
+
+    def test_recurring_items_drive_balance(self):
+        """Test recurring income and expenses land on their occurrence days"""
+        self.recurring_manager.create_recurring("Salary", 50000, "income", "Salary", "", "monthly", "2024-02-01")
+        self.recurring_manager.create_recurring("Rent", 20000, "expense", "Bills", "", "monthly", "2024-02-05")
+
+        result = self.projection.project(horizon_days=60, today=datetime(2024, 1, 20), opening_balance=1000)
+        self.assertEqual(len(result['dates']), 60)
+        self.assertEqual(str(result['dates'][12]), "2024-02-01")
+        self.assertEqual(result['recurring'][12], 50000)
+        self.assertEqual(result['recurring'][16], -20000)
+        self.assertEqual(result['balance'][11], 1000)
+        self.assertEqual(result['balance'][-1], 1000 + 2 * 50000 - 2 * 20000)
+
+    def test_baseline_follows_category_trend(self):
+        """Test one-off history is projected per category along its trend"""
+        # Groceries grow by 300 every 30 days; recurring postings are ignored
+        start = datetime(2024, 1, 1).date()
+        for bucket in range(6):
+            day = start + timedelta(days=bucket * 30)
+            self.db.add(Transaction(date=day.isoformat(), amount=3000 + 300 * bucket,
+                                    type="expense", category="Groceries"))
+        self.db.add(Transaction(date="2024-03-01", amount=99999, type="expense",
+                                category="Bills", recurring_id=1))
+        self.db.commit()
+
+        today = start + timedelta(days=180)
+        result = self.projection.project(horizon_days=30, today=today, history_days=180, opening_balance=0)
+        groceries = result['by_category'][("expense", "Groceries")]
+        self.assertEqual(list(result['by_category']), [("expense", "Groceries")])
+        self.assertAlmostEqual(groceries.sum(), 4800, delta=20)
+        self.assertTrue(np.all(np.diff(groceries) > 0))
+        self.assertAlmostEqual(result['balance'][-1], -groceries.sum())
+
+    def test_young_category_is_fitted_from_its_first_month(self):
+        """Test a category that started late in the history window is not read as a steep rise"""
+        start = datetime(2024, 1, 1).date()
+        for bucket in (4, 5):
+            day = start + timedelta(days=bucket * 30)
+            self.db.add(Transaction(date=day.isoformat(), amount=1000, type="expense", category="Pets"))
+        self.db.commit()
+
+        today = start + timedelta(days=180)
+        result = self.projection.project(horizon_days=30, today=today, history_days=180, opening_balance=0)
+        self.assertAlmostEqual(result['by_category'][("expense", "Pets")].sum(), 1000, delta=1)
+
+    def test_long_horizon_trend_levels_off(self):
+        """Test a multi-year projection holds the fitted level instead of growing without bound"""
+        start = datetime(2024, 1, 1).date()
+        for bucket in range(6):
+            day = start + timedelta(days=bucket * 30)
+            self.db.add(Transaction(date=day.isoformat(), amount=3000 + 300 * bucket,
+                                    type="expense", category="Groceries"))
+        self.db.commit()
+
+        today = start + timedelta(days=180)
+        result = self.projection.project(horizon_days=3 * 365, today=today, history_days=180, opening_balance=0)
+        groceries = result['by_category'][("expense", "Groceries")]
+        # Six months of trend (to about 6300 a month), then flat
+        self.assertTrue(np.all(np.diff(groceries[:180]) > 0))
+        self.assertTrue(np.all(groceries[180:] == groceries[-1]))
+        self.assertAlmostEqual(groceries[-1] * 30, 3000 + 300 * 11.5, delta=1)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,1116 @@
+import unittest
+import time
+import threading
+import os
+import tempfile
+import csv
+import gzip
+import json
+import pickle
+import shutil
+import importlib.util
+import matplotlib.pyplot as plt
+from datetime import date, datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Import our modules
+from services.database import Base, Transaction, make_engine
+from services.migrations import migrate, get_schema_version, SCHEMA_VERSION
+from services.aggregates import (MonthlyTotal, DailyTotal, rebuild_monthly_totals, rebuild_daily_totals,
+                                 get_monthly_totals, get_category_totals, get_period_totals)
+from services.report_service import ReportService
+from business.budgets import Budget
+from business.recurring import RecurringTransaction, RecurringManager
+from services.scheduler import RecurringScheduler
+from services.importer import CSVImporter
+from services.ingest import ingest_files, read_statement, read_spool
+from services.parsers import detect_parser
+from services.exporter import TransactionExporter
+from services.columnar import export_columnar, import_columnar
+from services.changelog import TransactionChange, get_watermark, prune_changes
+from services.backup import BackupService, BackupScheduler
+from services.restore import restore_database, register_restore_hook, register_pause_hook, unregister_pause_hook
+from services.statements import render_statements
+from utils.helpers import content_hash
+from utils.charts import CHARTS, render_chart, TimelineView
+from utils.timeseries import lttb, pick_granularity
+import numpy as np
+from utils.render_cache import RenderCache
+
+LEGACY_SCHEMA = """
+CREATE TABLE transactions (
+    id INTEGER NOT NULL,
+    date VARCHAR NOT NULL,
+    amount FLOAT NOT NULL,
+    type VARCHAR NOT NULL,
+    category VARCHAR,
+    notes VARCHAR,
+    PRIMARY KEY (id)
+)
+"""
+
+LEGACY_RECURRING_SCHEMA = """
+CREATE TABLE recurring_transactions (
+    id INTEGER NOT NULL,
+    name VARCHAR NOT NULL,
+    amount FLOAT NOT NULL,
+    type VARCHAR NOT NULL,
+    category VARCHAR,
+    notes VARCHAR,
+    frequency VARCHAR NOT NULL,
+    next_date VARCHAR NOT NULL,
+    is_active VARCHAR,
+    PRIMARY KEY (id)
+)
+"""
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        """Set up a database using the original (pre-migration) schema"""
+        self.test_db = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.test_db.close()
+
+        self.engine = create_engine(f"sqlite:///{self.test_db.name}")
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql(LEGACY_SCHEMA)
+            conn.exec_driver_sql(LEGACY_RECURRING_SCHEMA)
+            conn.exec_driver_sql("CREATE INDEX ix_recurring_transactions_id ON recurring_transactions (id)")
+            conn.exec_driver_sql(
+                "INSERT INTO recurring_transactions (name, amount, type, frequency, next_date, is_active) VALUES "
+                "('Rent', 9000, 'expense', 'monthly', '2024-01-31', 'true'), "
+                "('Old gym', 1500, 'expense', 'weekly', '2023-05-01', 'false')"
+            )
+            conn.exec_driver_sql(
+                "INSERT INTO transactions (date, amount, type, category, notes) VALUES "
+                "('2 07 2008', 2000, 'income', '', ''), "
+                "('2025-12-17', 8000, 'expense', 'Shopping', ''), "
+                "('not a date', 10, 'expense', 'Food', '')"
+            )
+
+    def tearDown(self):
+        """Clean up test database"""
+        self.engine.dispose()
+        os.unlink(self.test_db.name)
+
+    def test_migrate_normalizes_legacy_dates(self):
+        """Test legacy date strings are normalized into txn_date once"""
+        migrate(self.engine)
+
+        db = sessionmaker(bind=self.engine)()
+        rows = {t.id: t for t in db.query(Transaction).all()}
+        self.assertEqual(rows[1].date, "2008-07-02")
+        self.assertEqual(rows[1].txn_date, date(2008, 7, 2))
+        self.assertEqual(rows[2].txn_date, date(2025, 12, 17))
+        # Unparseable values are kept as-is and left out of date queries
+        self.assertEqual(rows[3].date, "not a date")
+        self.assertIsNone(rows[3].txn_date)
+        # Existing rows are hashed from their normalized content
+        self.assertEqual(rows[2].content_hash, content_hash("17/12/2025", 8000, "expense", "shopping", ""))
+        # History is aggregated once; undated rows are left out
+        self.assertEqual(db.query(MonthlyTotal).count(), 2)
+        db.close()
+
+        with self.engine.connect() as conn:
+            self.assertEqual(get_schema_version(conn), SCHEMA_VERSION)
+            indexes = {row[1] for row in conn.exec_driver_sql("PRAGMA index_list(transactions)")}
+        self.assertIn("ix_transactions_type_txn_date", indexes)
+        self.assertIn("ix_transactions_category_txn_date", indexes)
+        self.assertIn("ix_transactions_content_hash", indexes)
+
+    def test_migrate_converts_recurring_is_active(self):
+        """Test the string is_active flag becomes an indexed Boolean"""
+        migrate(self.engine)
+
+        db = sessionmaker(bind=self.engine)()
+        rent, gym = db.query(RecurringTransaction).order_by(RecurringTransaction.id).all()
+        self.assertIs(rent.is_active, True)
+        self.assertIs(gym.is_active, False)
+        self.assertEqual(rent.start_date, "2024-01-31")
+        self.assertEqual(rent.interval, 1)
+        db.close()
+
+        with self.engine.connect() as conn:
+            plan = conn.exec_driver_sql(
+                "EXPLAIN QUERY PLAN SELECT * FROM recurring_transactions "
+                "WHERE is_active = 1 AND next_date <= '2024-02-01'"
+            ).fetchall()
+        self.assertIn("ix_recurring_transactions_active_next_date", str(plan))
+
+    def test_migrate_is_idempotent(self):
+        """Test running migrate twice leaves the data unchanged"""
+        migrate(self.engine)
+        migrate(self.engine)
+
+        with self.engine.connect() as conn:
+            count = conn.exec_driver_sql("SELECT COUNT(*) FROM transactions").scalar()
+        self.assertEqual(count, 3)
+
+    def test_new_transactions_get_txn_date(self):
+        """Test the ORM keeps txn_date in sync with date"""
+        migrate(self.engine)
+        db = sessionmaker(bind=self.engine)()
+
+        t = Transaction(date="5 01 2024", amount=10, type="expense", category="Food")
+        db.add(t)
+        db.commit()
+        self.assertEqual(t.date, "2024-01-05")
+        self.assertEqual(t.txn_date, date(2024, 1, 5))
+
+        t.date = "2024-02-10"
+        db.commit()
+        self.assertEqual(t.txn_date, date(2024, 2, 10))
+        db.close()
+
+class TestMonthlyTotals(unittest.TestCase):
+    def setUp(self):
+        """Set up test database"""
+        self.test_db = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.test_db.close()
+
+        self.engine = create_engine(f"sqlite:///{self.test_db.name}")
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        """Clean up test database"""
+        self.db.close()
+        self.engine.dispose()
+        os.unlink(self.test_db.name)
+
+    def totals(self):
+        return {(r.month, r.type, r.category): (r.total, r.count)
+                for r in self.db.query(MonthlyTotal).all()}
+
+    def test_triggers_follow_insert_update_delete(self):
+        """Test monthly_totals stays in sync with transaction writes"""
+        food = Transaction(date="2024-01-05", amount=100, type="expense", category="Food")
+        self.db.add_all([
+            food,
+            Transaction(date="2024-01-20", amount=50, type="expense", category="Food"),
+            Transaction(date="2024-02-01", amount=3000, type="income", category=None),
+        ])
+        self.db.commit()
+        self.assertEqual(self.totals(), {
+            ("2024-01", "expense", "Food"): (150, 2),
+            ("2024-02", "income", ""): (3000, 1),
+        })
+
+        food.date = "2024-02-05"
+        food.amount = 120
+        self.db.commit()
+        self.assertEqual(self.totals()[("2024-01", "expense", "Food")], (50, 1))
+        self.assertEqual(self.totals()[("2024-02", "expense", "Food")], (120, 1))
+
+        self.db.delete(food)
+        self.db.commit()
+        self.assertNotIn(("2024-02", "expense", "Food"), self.totals())
+
+        monthly = get_monthly_totals(self.db)
+        self.assertEqual(monthly["2024-01"], {"income": 0, "expense": 50})
+        self.assertEqual(get_category_totals(self.db, "income"), {"Other": 3000})
+
+    def test_rebuild_repairs_drift(self):
+        """Test rebuild recomputes the table from the ledger"""
+        self.db.add(Transaction(date="2024-03-01", amount=10, type="expense", category="Food"))
+        self.db.commit()
+        self.db.query(MonthlyTotal).delete()
+        self.db.commit()
+
+        with self.engine.begin() as conn:
+            rebuild_monthly_totals(conn)
+        self.assertEqual(self.totals(), {("2024-03", "expense", "Food"): (10, 1)})
+
+    def test_daily_totals_roll_up_to_periods(self):
+        """Test daily_totals follows writes and rolls up into whole weeks, months and years"""
+        rent = Transaction(date="2024-01-01", amount=800, type="expense", category="Rent")
+        self.db.add_all([
+            rent,
+            Transaction(date="2024-01-03", amount=40, type="expense", category="Food"),
+            Transaction(date="2024-01-09", amount=60, type="expense", category="Food"),
+            Transaction(date="2024-02-01", amount=3000, type="income", category="Salary"),
+        ])
+        self.db.commit()
+        rent.amount = 900
+        self.db.commit()
+
+        days = {(r.day, r.type): (r.total, r.count) for r in self.db.query(DailyTotal).all()}
+        self.assertEqual(days[("2024-01-01", "expense")], (900, 1))
+        self.assertEqual(len(days), 4)
+
+        # 2024-01-01 is a Monday; a window starting mid-week still gets the whole week
+        weeks = get_period_totals(self.db, "week", date(2024, 1, 3), date(2024, 1, 31))
+        self.assertEqual(weeks["2024-01-01"]["expense"], 940)
+        self.assertEqual(weeks["2024-01-08"]["expense"], 60)
+        self.assertEqual(weeks["2024-01-29"]["income"], 3000)  # the last week runs into February
+        self.assertEqual(get_period_totals(self.db, "month")["2024-02-01"]["income"], 3000)
+        self.assertEqual(dict(get_period_totals(self.db, "year", date(2024, 6, 1), date(2024, 6, 30))),
+                         {"2024-01-01": {"income": 3000, "expense": 1000}})
+
+        self.db.query(DailyTotal).delete()
+        self.db.commit()
+        with self.engine.begin() as conn:
+            rebuild_daily_totals(conn)
+        self.assertEqual({(r.day, r.type): (r.total, r.count) for r in self.db.query(DailyTotal).all()}, days)
+
+    def test_summary_stats(self):
+        """Test totals, current month figures and net worth"""
+        self.db.add_all([
+            Transaction(date="2024-01-05", amount=1000, type="income", category="Salary"),
+            Transaction(date="2024-02-05", amount=3000, type="income", category="Salary"),
+            Transaction(date="2024-02-10", amount=500, type="expense", category="Food"),
+            Transaction(date="2024-01-10", amount=200, type="expense", category="Food"),
+        ])
+        self.db.commit()
+
+        stats = ReportService(self.db).get_summary_stats(today=date(2024, 2, 15))
+        self.assertEqual(stats['total_income'], 4000)
+        self.assertEqual(stats['total_expense'], 700)
+        self.assertEqual(stats['month_income'], 3000)
+        self.assertEqual(stats['month_expense'], 500)
+        self.assertEqual(stats['month_balance'], 2500)
+        self.assertEqual(stats['net_worth'], 3300)
+
+    def test_summary_stats_empty_ledger(self):
+        """Test an empty ledger reports zeros rather than None"""
+        stats = ReportService(self.db).get_summary_stats()
+        self.assertEqual(stats['net_worth'], 0)
+
+class TestRecurringScheduler(unittest.TestCase):
+    def setUp(self):
+        """Set up test database"""
+        self.test_db = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.test_db.close()
+
+        self.engine = create_engine(f"sqlite:///{self.test_db.name}")
+        Base.metadata.create_all(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        self.scheduler = RecurringScheduler(session_factory=self.Session, max_sleep=60)
+
+    def tearDown(self):
+        """Clean up test database"""
+        self.scheduler.stop()
+        self.engine.dispose()
+        os.unlink(self.test_db.name)
+
+    def add_recurring(self, start_date):
+        db = self.Session()
+        RecurringManager(db).create_recurring("Rent", 9000, "expense", "Bills", "", "monthly", start_date)
+        db.close()
+
+    def test_run_once_posts_results_and_sleeps_until_next_due(self):
+        """Test due items are posted to the queue and the next wake-up is the next due date"""
+        self.add_recurring("2024-01-01")
+        self.add_recurring("2024-03-01")
+
+        delay = self.scheduler.run_once(now=datetime(2024, 2, 29, 18, 0))
+        self.assertEqual(self.scheduler.results.get_nowait(), ("recurring", 2))
+        self.assertEqual(delay, 60)
+
+        uncapped = RecurringScheduler(session_factory=self.Session, max_sleep=10 ** 9)
+        self.assertEqual(uncapped.run_once(now=datetime(2024, 2, 29, 18, 0)), 6 * 3600)
+        self.assertTrue(uncapped.results.empty())
+
+    def test_worker_thread_posts_in_background(self):
+        """Test the started thread processes due items without the caller blocking"""
+        self.add_recurring(date.today().isoformat())
+        self.scheduler.start()
+        self.assertEqual(self.scheduler.results.get(timeout=5), ("recurring", 1))
+
+        db = self.Session()
+        self.assertEqual(db.query(Transaction).count(), 1)
+        db.close()
+
+    def test_new_item_wakes_a_sleeping_scheduler(self):
+        """Test an item created while the thread sleeps is posted without waiting for max_sleep"""
+        self.scheduler.max_sleep = 3600
+        self.add_recurring((date.today() + timedelta(days=30)).isoformat())  # nothing due yet
+        self.scheduler.start()
+        time.sleep(0.5)  # let the first pass finish and go to sleep
+        self.add_recurring(date.today().isoformat())
+        self.assertEqual(self.scheduler.results.get(timeout=5), ("recurring", 1))
+
+    def test_pause_refuses_to_drop_a_busy_thread(self):
+        """Test a run that outlasts the pause timeout raises and keeps its thread"""
+        release = threading.Event()
+
+        def slow_session():
+            release.wait(5)
+            return self.Session()
+
+        self.scheduler.session_factory = slow_session
+        self.scheduler.start()
+        try:
+            with self.assertRaises(RuntimeError):
+                self.scheduler.pause(timeout=0.1)
+            self.assertTrue(self.scheduler._thread.is_alive())
+            self.assertFalse(self.scheduler._stop.is_set())
+        finally:
+            release.set()
+
+class TestCSVImporter(unittest.TestCase):
+    def setUp(self):
+        """Set up test database and CSV file"""
+        self.test_db = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.test_db.close()
+        self.csv_file = tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, newline="")
+
+        self.engine = create_engine(f"sqlite:///{self.test_db.name}")
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        """Clean up test database"""
+        self.db.close()
+        self.engine.dispose()
+        for path in (self.test_db.name, self.test_db.name + "-wal", self.test_db.name + "-shm", self.csv_file.name):
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def write_csv(self, text):
+        self.csv_file.write(text)
+        self.csv_file.close()
+
+    def test_chunks_are_committed_with_progress_and_rejects(self):
+        """Test rows are normalized, bad rows reported, and progress sent per chunk"""
+        lines = ["date,amount,type,category,notes"]
+        lines += [f"2024-01-{day:02d},100,expense,Food," for day in range(1, 11)]
+        lines += ["15/02/2024,\"1,250.50\",Income, Salary ,Feb", "not a date,5,expense,,", "2024-03-01,abc,expense,,",
+                  "2024-03-02,5,transfer,,"]
+        self.write_csv("\n".join(lines) + "\n")
+
+        progress, rejected = [], []
+        stats = CSVImporter(self.db, chunk_size=4).import_file(
+            self.csv_file.name, progress=progress.append,
+            on_reject=lambda line, row, reason: rejected.append((line, reason)))
+
+        self.assertEqual((stats['imported'], stats['rejected'], stats['chunks']), (11, 3, 4))
+        self.assertEqual([p['imported'] for p in progress], [4, 8, 11, 11])
+        self.assertEqual(progress[-1]['fraction'], 1.0)
+        self.assertEqual([line for line, reason in rejected], [13, 14, 15])
+        self.assertIn("invalid date", rejected[0][1])
+
+        salary = self.db.query(Transaction).filter_by(type="income").one()
+        self.assertEqual((salary.date, salary.txn_date, salary.amount, salary.category),
+                         ("2024-02-15", date(2024, 2, 15), 1250.5, "Salary"))
+        # Triggers keep the aggregates current for Core inserts too
+        self.assertEqual(self.db.query(MonthlyTotal).filter_by(month="2024-01").one().total, 1000)
+
+    def test_reimport_skips_counted_duplicates(self):
+        """Test overlapping statements only add rows beyond the copies already stored"""
+        self.db.add(Transaction(date="2024-01-02", amount=50, type="expense", category="Food", notes="Coffee"))
+        self.db.commit()
+
+        self.write_csv("date,amount,type,category,notes\n"
+                       "02/01/2024,50.00,Expense,food,  coffee\n"
+                       "2024-01-02,50,expense,Food,Coffee\n"
+                       "2024-01-03,20,expense,Food,Tea\n")
+        duplicates = []
+        stats = CSVImporter(self.db, chunk_size=2).import_file(
+            self.csv_file.name, on_duplicate=lambda line, row: duplicates.append(line))
+        self.assertEqual((stats['imported'], stats['duplicates']), (2, 1))
+        self.assertEqual(duplicates, [2])
+
+        # Importing the same file again adds nothing
+        stats = CSVImporter(self.db).import_file(self.csv_file.name)
+        self.assertEqual((stats['imported'], stats['duplicates']), (0, 3))
+        self.assertEqual(self.db.query(Transaction).count(), 3)
+
+    def test_missing_required_column_is_rejected(self):
+        """Test a file without the required columns imports nothing"""
+        self.write_csv("date,amount\n2024-01-01,5\n")
+        with self.assertRaises(ValueError):
+            CSVImporter(self.db).import_file(self.csv_file.name)
+        self.assertEqual(self.db.query(Transaction).count(), 0)
+
+class TestStatementIngest(unittest.TestCase):
+    def setUp(self):
+        """Set up test database and a directory of statement files"""
+        self.test_db = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.test_db.close()
+        self.statements = tempfile.mkdtemp()
+
+        self.engine = create_engine(f"sqlite:///{self.test_db.name}")
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        """Clean up test database"""
+        self.db.close()
+        self.engine.dispose()
+        shutil.rmtree(self.statements)
+        for path in (self.test_db.name, self.test_db.name + "-wal", self.test_db.name + "-shm"):
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def write_statement(self, name, text):
+        path = os.path.join(self.statements, name)
+        with open(path, "w", newline="") as f:
+            f.write(text)
+        return path
+
+    def test_bank_layouts_are_detected_from_the_header(self):
+        """Test each registered layout is picked from its columns and mapped onto ledger rows"""
+        self.assertEqual(detect_parser(["Date", "Amount", "Type"]).name, "ledger")
+        self.assertEqual(detect_parser(["Date", "Narration", "Chq./Ref.No.", "Value Dt", "Withdrawal Amt.",
+                                        "Deposit Amt.", "Closing Balance"]).name, "debit-credit")
+        self.assertEqual(detect_parser(["Transaction Date", "Description", "Amount"]).name, "signed-amount")
+        with self.assertRaises(ValueError):
+            detect_parser(["date", "amount"])
+
+        path = self.write_statement("hdfc.csv",
+                                    "Date,Narration,Withdrawal Amt.,Deposit Amt.,Closing Balance\n"
+                                    "01/03/2024,UPI-GROCER,\"1,200.00\",,8800\n"
+                                    "02/03/2024,SALARY MAR,,50000,58800\n"
+                                    "03/03/2024,BAD ROW,,,58800\n")
+        rejected = []
+        stats = CSVImporter(self.db).import_file(path, on_reject=lambda line, row, reason: rejected.append(line))
+        self.assertEqual((stats['imported'], stats['rejected'], rejected), (2, 1, [4]))
+        grocer = self.db.query(Transaction).filter_by(notes="UPI-GROCER").one()
+        self.assertEqual((grocer.txn_date, grocer.amount, grocer.type), (date(2024, 3, 1), 1200, "expense"))
+
+    def test_batch_ingest_imports_every_file_once(self):
+        """Test files are parsed in worker processes, deduplicated across the batch, and failures isolated"""
+        files = [
+            self.write_statement("ledger.csv", "date,amount,type,category,notes\n2024-03-01,40,expense,Food,Lunch\n"),
+            self.write_statement("bank.csv", "Txn Date,Description,Debit,Credit\n"
+                                             "05/03/2024,Rent,15000,\n06/03/2024,Refund,,250\n"),
+            # Overlaps bank.csv by one line
+            self.write_statement("bank-overlap.csv", "Txn Date,Description,Debit,Credit\n"
+                                                     "06/03/2024,Refund,,250\n07/03/2024,Fuel,2000,\n"),
+            self.write_statement("card.csv", "Date,Merchant,Amount\n2024-03-08,Cinema,-600\n2024-03-09,x,oops\n"),
+            self.write_statement("unknown.csv", "when,how much\n2024-03-10,5\n"),
+        ]
+        seen = []
+        results = ingest_files(files, self.db, workers=2, progress=lambda name, stats: seen.append(name))
+
+        self.assertIn("Unrecognised", results[files[4]]['error'])
+        self.assertEqual(sorted(seen), sorted(files[:4]))
+        self.assertEqual(results[files[1]]['parser'], "debit-credit")
+        self.assertEqual(results[files[3]]['parser'], "signed-amount")
+        self.assertEqual(results[files[3]]['rejected'], 1)
+        self.assertEqual(sum(results[f]['imported'] for f in files[:4]), 5)
+        self.assertEqual(results[files[1]]['duplicates'] + results[files[2]]['duplicates'], 1)
+        self.assertEqual(self.db.query(Transaction).count(), 5)
+
+    def test_statement_rows_come_back_in_bounded_chunks(self):
+        """Test a parsed file is spooled in chunks of at most chunk_size rows"""
+        path = self.write_statement("card.csv", "Date,Merchant,Amount\n" + "".join(
+            f"2024-03-0{day},Shop {day},-{day}00\n" for day in range(1, 6)) + "2024-03-09,x,oops\n")
+        parser_name, spool = read_statement(path, chunk_size=2)
+        try:
+            with open(spool, "rb") as f:
+                chunks = []
+                while True:
+                    try:
+                        chunks.append(pickle.load(f))
+                    except EOFError:
+                        break
+            self.assertEqual([(kind, len(chunk)) for kind, chunk in chunks],
+                             [("rows", 2), ("rows", 2), ("rows", 1), ("rejects", 1)])
+
+            rejected = []
+            rows = list(read_spool(spool, lambda line, reason: rejected.append(line)))
+        finally:
+            os.unlink(spool)
+        self.assertEqual(parser_name, "signed-amount")
+        self.assertEqual([line for line, _ in rows], [2, 3, 4, 5, 6])
+        self.assertEqual(rejected, [7])
+
+class TestTransactionExporter(unittest.TestCase):
+    def setUp(self):
+        """Set up test database with a few transactions"""
+        self.test_db = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.test_db.close()
+        self.out_dir = tempfile.mkdtemp()
+
+        self.engine = create_engine(f"sqlite:///{self.test_db.name}")
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        self.db.add_all([
+            Transaction(date=f"2024-01-{day:02d}", amount=day * 10, type="expense", category="Food",
+                        notes="Chai ☕" if day == 1 else None)
+            for day in range(1, 8)
+        ])
+        self.db.commit()
+        self.exporter = TransactionExporter(self.db, batch_size=3)
+
+    def tearDown(self):
+        """Clean up test database and output files"""
+        self.db.close()
+        self.engine.dispose()
+        os.unlink(self.test_db.name)
+        shutil.rmtree(self.out_dir)
+
+    def test_csv_export_pages_through_every_row(self):
+        """Test keyset pages cover the table once, in id order, with gzip by extension"""
+        progress = []
+        path = os.path.join(self.out_dir, "ledger.csv.gz")
+        self.assertEqual(self.exporter.export_csv(path, progress=progress.append), 7)
+        self.assertEqual(progress, [3, 6, 7])
+
+        with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([r['id'] for r in rows], [str(i) for i in range(1, 8)])
+        self.assertEqual((rows[0]['notes'], rows[1]['notes']), ("Chai ☕", ""))
+
+    def test_json_and_ndjson_exports(self):
+        """Test the streamed JSON document and NDJSON both parse back to every row"""
+        path = os.path.join(self.out_dir, "ledger.json")
+        self.exporter.export_json(path)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.assertIn('export_date', data)
+        self.assertEqual([t['amount'] for t in data['transactions']], [10.0 * d for d in range(1, 8)])
+
+        path = os.path.join(self.out_dir, "ledger.ndjson")
+        self.assertEqual(self.exporter.export_json(path, ndjson=True), 7)
+        with open(path, encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual(lines[0], {'id': 1, 'date': "2024-01-01", 'amount': 10.0, 'type': "expense",
+                                    'category': "Food", 'notes': "Chai ☕"})
+
+        # An empty ledger is still a valid document
+        self.db.query(Transaction).delete()
+        self.db.commit()
+        self.exporter.export_json(os.path.join(self.out_dir, "empty.json"))
+        with open(os.path.join(self.out_dir, "empty.json"), encoding="utf-8") as f:
+            self.assertEqual(json.load(f)['transactions'], [])
+
+class TestChangeExport(unittest.TestCase):
+    def setUp(self):
+        """Set up test database"""
+        self.test_db = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.test_db.close()
+        self.out_dir = tempfile.mkdtemp()
+
+        self.engine = create_engine(f"sqlite:///{self.test_db.name}")
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        self.exporter = TransactionExporter(self.db, batch_size=2)
+
+    def tearDown(self):
+        """Clean up test database and output files"""
+        self.db.close()
+        self.engine.dispose()
+        os.unlink(self.test_db.name)
+        shutil.rmtree(self.out_dir)
+
+    def export(self, feed="nightly"):
+        path = os.path.join(self.out_dir, "changes.ndjson")
+        self.exporter.export_changes(path, feed=feed)
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_only_changes_after_the_watermark_are_exported(self):
+        """Test each export carries just the rows touched since the previous one"""
+        rows = [Transaction(date=f"2024-01-0{day}", amount=day * 100, type="expense", category="Food")
+                for day in range(1, 6)]
+        self.db.add_all(rows)
+        self.db.commit()
+        self.assertEqual([r['id'] for r in self.export()], [1, 2, 3, 4, 5])
+        self.assertEqual(self.export(), [])
+
+        rows[1].amount = 999
+        self.db.delete(rows[3])
+        self.db.add(Transaction(date="2024-01-09", amount=5, type="income"))
+        self.db.commit()
+        rows[1].notes = "edited twice"
+        self.db.commit()
+
+        changes = self.export()
+        self.assertEqual([(c['id'], c['op']) for c in changes], [(2, "upsert"), (4, "delete"), (6, "upsert")])
+        self.assertEqual((changes[0]['amount'], changes[0]['notes']), (999, "edited twice"))
+        self.assertIsNone(changes[1]['amount'])
+        # Sequence numbers only grow, and the feed remembers the last one
+        self.assertEqual(get_watermark(self.db, "nightly"), max(c['seq'] for c in changes))
+
+        # A second feed starts from a full export of the live rows
+        self.assertEqual([(c['id'], c['op']) for c in self.export(feed="audit")],
+                         [(1, "upsert"), (2, "upsert"), (3, "upsert"), (5, "upsert"), (6, "upsert")])
+
+    def test_prune_keeps_changes_a_feed_has_not_seen(self):
+        """Test pruning stops at the slowest feed's watermark"""
+        self.db.add(Transaction(date="2024-01-01", amount=1, type="expense"))
+        self.db.commit()
+        self.export(feed="a")
+        self.db.add(Transaction(date="2024-01-02", amount=2, type="expense"))
+        self.db.commit()
+        self.export(feed="b")
+
+        self.assertEqual(prune_changes(self.db), 1)
+        self.assertEqual(self.db.query(TransactionChange).count(), 1)
+        self.assertEqual([c['id'] for c in self.export(feed="a")], [2])
+
+    def test_new_feed_after_prune_gets_every_live_row(self):
+        """Test a feed registered after pruning starts from a full export"""
+        rows = [Transaction(date=f"2024-01-0{day}", amount=day, type="expense") for day in range(1, 6)]
+        self.db.add_all(rows)
+        self.db.commit()
+        self.export(feed="a")
+        self.db.delete(rows[0])
+        rows[2].amount = 30
+        self.db.commit()
+        self.export(feed="a")
+        self.assertEqual(prune_changes(self.db), 7)
+
+        changes = self.export(feed="fresh")
+        self.assertEqual([(c['id'], c['amount']) for c in changes], [(2, 2), (3, 30), (4, 4), (5, 5)])
+        self.assertEqual(get_watermark(self.db, "fresh"), get_watermark(self.db, "a"))
+        self.assertEqual(self.export(feed="fresh"), [])
+
+class TestBackupService(unittest.TestCase):
+    def setUp(self):
+        """Set up a WAL database with some rows and an empty backup directory"""
+        self.work_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.work_dir, "live.db")
+        self.engine = make_engine(self.db_path, profile="balanced")
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        self.db.add_all([Transaction(date="2024-01-01", amount=i, type="expense") for i in range(50)])
+        self.db.commit()
+
+        self.service = BackupService(self.db_path, os.path.join(self.work_dir, "backups"),
+                                     keep_daily=3, keep_monthly=2, pages_per_step=1)
+
+    def tearDown(self):
+        """Clean up database and backups"""
+        self.db.close()
+        self.engine.dispose()
+        shutil.rmtree(self.work_dir)
+
+    def restore_count(self, path):
+        restored = os.path.join(self.work_dir, "restored.db")
+        with gzip.open(path, "rb") as src, open(restored, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        engine = create_engine(f"sqlite:///{restored}")
+        with engine.connect() as conn:
+            count = conn.exec_driver_sql("SELECT COUNT(*) FROM transactions").scalar()
+        engine.dispose()
+        return count
+
+    def test_online_backup_is_consistent_and_compressed(self):
+        """Test the backup captures committed rows (including ones still in the WAL)"""
+        steps = []
+        path = self.service.create_backup(now=datetime(2024, 3, 1, 2, 0),
+                                          progress=lambda remaining, total: steps.append(remaining))
+        self.assertTrue(path.endswith("expenses-20240301-020000.db.gz"))
+        self.assertGreater(len(steps), 1)  # copied in several steps
+        self.assertEqual(self.restore_count(path), 50)
+        self.assertEqual(os.listdir(self.service.backup_dir), [os.path.basename(path)])
+
+    def test_retention_keeps_daily_and_monthly(self):
+        """Test old backups thin out to the newest per day, then per month"""
+        os.makedirs(self.service.backup_dir)
+        stamps = [datetime(2024, 1, 10), datetime(2024, 1, 20), datetime(2024, 2, 5), datetime(2024, 2, 6, 1),
+                  datetime(2024, 2, 6, 9), datetime(2024, 2, 7)]
+        for stamp in stamps:
+            open(os.path.join(self.service.backup_dir, f"expenses-{stamp:%Y%m%d-%H%M%S}.db.gz"), "w").close()
+
+        self.service.prune()
+        kept = [taken_at for _, taken_at in self.service.list_backups()]
+        # 3 newest days (Feb 7, Feb 6 09:00, Feb 5) cover 1 month; the 2nd month is Jan 20
+        self.assertEqual(kept, [datetime(2024, 2, 7), datetime(2024, 2, 6, 9), datetime(2024, 2, 5),
+                                datetime(2024, 1, 20)])
+
+    def test_scheduler_backs_up_only_when_due(self):
+        """Test the scheduler waits out the interval after the newest backup"""
+        scheduler = BackupScheduler(self.service, interval_hours=24)
+        self.assertEqual(scheduler.run_once(now=datetime(2024, 3, 1, 2, 0)), 24 * 3600)
+        self.assertEqual(scheduler.results.get_nowait()[0], "backup")
+
+        self.assertEqual(scheduler.run_once(now=datetime(2024, 3, 1, 20, 0)), 6 * 3600)
+        self.assertTrue(scheduler.results.empty())
+
+class TestHotRestore(unittest.TestCase):
+    def setUp(self):
+        """Set up a live database, an open session on it, and a backup"""
+        self.work_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.work_dir, "live.db")
+        self.engine = make_engine(self.db_path, profile="balanced")
+        migrate(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        self.db.add_all([Transaction(date="2024-01-01", amount=i, type="expense") for i in range(3)])
+        self.db.commit()
+
+        self.backup = BackupService(self.db_path).backup_to(os.path.join(self.work_dir, "backup.db.gz"))
+        self.db.add(Transaction(date="2024-01-02", amount=99, type="income"))
+        self.db.commit()
+
+    def tearDown(self):
+        """Clean up database and backups"""
+        self.db.close()
+        self.engine.dispose()
+        shutil.rmtree(self.work_dir)
+
+    def test_restore_swaps_data_under_open_sessions(self):
+        """Test sessions opened before the restore read the restored data afterwards"""
+        self.assertEqual(self.db.query(Transaction).count(), 4)
+        calls = []
+        hook = register_restore_hook(lambda: calls.append(True))
+        try:
+            self.assertEqual(restore_database(self.backup, self.db_path, self.engine), SCHEMA_VERSION)
+        finally:
+            from services import restore
+            restore._RESTORE_HOOKS.remove(hook)
+
+        self.assertEqual(self.db.query(Transaction).count(), 3)
+        self.assertEqual(calls, [True])
+        # Aggregates come from the restored file, not the replaced one
+        self.assertEqual(ReportService(self.db).get_summary_stats()['total_income'], 0)
+
+    def test_background_workers_sit_out_the_swap(self):
+        """Test a running scheduler is paused across the restore and running again after it"""
+        scheduler = RecurringScheduler(sessionmaker(bind=self.engine), max_sleep=60)
+        scheduler.start()
+        seen = []
+        pause, resume = (lambda: seen.append(scheduler._thread)), (lambda: None)
+        register_pause_hook(pause, resume)
+        try:
+            restore_database(self.backup, self.db_path, self.engine)
+            self.assertEqual(seen, [None])
+            self.assertTrue(scheduler._thread.is_alive())
+
+            # A stopped scheduler is left alone
+            scheduler.stop()
+            restore_database(self.backup, self.db_path, self.engine)
+            self.assertIsNone(scheduler._thread)
+        finally:
+            unregister_pause_hook(pause, resume)
+            scheduler.stop()
+
+    def test_invalid_backups_leave_live_data_alone(self):
+        """Test corrupt files and newer schemas are rejected before anything changes"""
+        corrupt = os.path.join(self.work_dir, "corrupt.db")
+        with open(corrupt, "wb") as f:
+            f.write(b"SQLite format 3\x00" + b"\x00" * 200)
+        with self.assertRaises(ValueError):
+            restore_database(corrupt, self.db_path, self.engine)
+
+        newer = os.path.join(self.work_dir, "newer.db")
+        BackupService(self.db_path).backup_to(newer)
+        newer_engine = create_engine(f"sqlite:///{newer}")
+        with newer_engine.begin() as conn:
+            conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+        newer_engine.dispose()
+        with self.assertRaisesRegex(ValueError, "newer version"):
+            restore_database(newer, self.db_path, self.engine)
+
+        self.assertEqual(self.db.query(Transaction).count(), 4)
+
+@unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+class TestColumnarFormats(unittest.TestCase):
+    def setUp(self):
+        """Set up source and target databases"""
+        self.out_dir = tempfile.mkdtemp()
+        self.engines, self.sessions = [], []
+        for name in ("source.db", "target.db"):
+            engine = create_engine(f"sqlite:///{os.path.join(self.out_dir, name)}")
+            Base.metadata.create_all(engine)
+            self.engines.append(engine)
+            self.sessions.append(sessionmaker(bind=engine)())
+        self.source, self.target = self.sessions
+
+        self.source.add_all([
+            Transaction(date="2024-01-05", amount=120.5, type="expense", category="Food", notes="Lunch"),
+            Transaction(date="2024-01-06", amount=50000, type="income", category="Salary", notes=None),
+            Transaction(date="2024-01-07", amount=80, type="expense", category=None, notes="Bus"),
+        ])
+        self.source.commit()
+
+    def tearDown(self):
+        """Clean up databases and output files"""
+        for session, engine in zip(self.sessions, self.engines):
+            session.close()
+            engine.dispose()
+        shutil.rmtree(self.out_dir)
+
+    def test_round_trip_with_typed_columns(self):
+        """Test Parquet and Arrow files are typed and import back without duplicates"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        for name in ("ledger.parquet", "ledger.arrow"):
+            path = os.path.join(self.out_dir, name)
+            self.assertEqual(export_columnar(path, self.source, batch_size=2), 3)
+
+            stats = import_columnar(path, self.target)
+            expected = (3, 0) if name.endswith(".parquet") else (0, 3)
+            self.assertEqual((stats['imported'], stats['duplicates']), expected)
+
+        schema = pq.read_schema(os.path.join(self.out_dir, "ledger.parquet"))
+        self.assertEqual(schema.field("date").type, pa.date32())
+        self.assertTrue(pa.types.is_dictionary(schema.field("category").type))
+
+        rows = [(t.date, t.txn_date, t.amount, t.type, t.category, t.notes)
+                for t in self.target.query(Transaction).order_by(Transaction.id)]
+        self.assertEqual(rows, [
+            ("2024-01-05", date(2024, 1, 5), 120.5, "expense", "Food", "Lunch"),
+            ("2024-01-06", date(2024, 1, 6), 50000, "income", "Salary", ""),
+            ("2024-01-07", date(2024, 1, 7), 80, "expense", "", "Bus"),
+        ])
+
+    def test_untyped_rows_are_normalized_like_csv(self):
+        """Test rows the vectorized checks cannot take fall back to normalize_row, with CSV's hashes"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = os.path.join(self.out_dir, "bank.parquet")
+        pq.write_table(pa.table({
+            "date": ["2024-01-05", "06/01/2024", "someday", "2024-01-08"],
+            "amount": pa.array([10.0, 20.0, 30.0, None]),
+            "type": pa.array(["Expense ", "income", "expense", "expense"]).dictionary_encode(),
+            "category": pa.array(["  Eating   Out ", None, "Food", "Food"]).dictionary_encode(),
+        }), path)
+        rejected = []
+        stats = import_columnar(path, self.target, on_reject=lambda line, row, reason: rejected.append(line))
+        self.assertEqual((stats['imported'], stats['rejected'], rejected), (2, 2, [3, 4]))
+
+        rows = [(t.date, t.amount, t.type, t.category, t.notes, t.content_hash)
+                for t in self.target.query(Transaction).order_by(Transaction.id)]
+        self.assertEqual(rows, [
+            ("2024-01-05", 10.0, "expense", "Eating   Out", "",
+             content_hash("2024-01-05", 10.0, "expense", "Eating   Out", "")),
+            ("2024-01-06", 20.0, "income", "", "", content_hash("2024-01-06", 20.0, "income", "", "")),
+        ])
+
+class TestChartRendering(unittest.TestCase):
+    def setUp(self):
+        """Set up test database with a few months of transactions"""
+        self.test_db = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.test_db.close()
+        self.engine = create_engine(f"sqlite:///{self.test_db.name}")
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        for month in range(1, 4):
+            self.db.add(Transaction(date=f"2024-0{month}-10", amount=1000 * month, type="income", category="Salary"))
+            self.db.add(Transaction(date=f"2024-0{month}-12", amount=300, type="expense", category="Food"))
+        self.db.commit()
+
+    def tearDown(self):
+        """Clean up test database"""
+        self.db.close()
+        self.engine.dispose()
+        os.unlink(self.test_db.name)
+
+    def test_every_chart_renders_headless_at_the_requested_size(self):
+        """Test chart figures are built from a session and drawn to PNG without a display"""
+        for name in CHARTS:
+            png = render_chart(self.db, name, size=(640, 400))
+            self.assertEqual(png[:8], b"\x89PNG\r\n\x1a\n", name)
+            width, height = int.from_bytes(png[16:20], "big"), int.from_bytes(png[20:24], "big")
+            self.assertEqual((width, height), (640, 400), name)
+
+    def test_views_update_their_artists_in_place(self):
+        """Test a refresh moves new data into the same figure, lines and wedges"""
+        trend, pie = CHARTS["monthly_summary"](), CHARTS["category_breakdown"]()
+        try:
+            trend.update(self.db)
+            pie.update(self.db)
+            figure, lines, wedges = trend.figure, list(trend.lines), list(pie.wedges)
+
+            self.db.add(Transaction(date="2024-03-20", amount=600, type="expense", category="Food"))
+            self.db.commit()
+            self.assertIs(trend.update(self.db), figure)
+            pie.update(self.db)
+
+            self.assertEqual(trend.lines, lines)
+            self.assertEqual(list(lines[1].get_ydata()), [300, 300, 900])
+            self.assertEqual(pie.wedges, wedges)
+            self.assertEqual(plt.get_fignums(), [])
+        finally:
+            trend.close()
+            pie.close()
+
+class TestTimeline(unittest.TestCase):
+    def setUp(self):
+        """Set up test database with three years of daily expenses"""
+        self.test_db = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.test_db.close()
+        self.engine = create_engine(f"sqlite:///{self.test_db.name}")
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        days = np.arange(np.datetime64("2021-01-01"), np.datetime64("2024-01-01"))
+        self.db.add_all(Transaction(date=str(day), amount=10 + i % 7, type="expense", category="Food")
+                        for i, day in enumerate(days))
+        self.db.commit()
+
+    def tearDown(self):
+        """Clean up test database"""
+        self.db.close()
+        self.engine.dispose()
+        os.unlink(self.test_db.name)
+
+    def test_lttb_keeps_ends_and_extremes(self):
+        """Test LTTB returns the requested number of points including the first, last and a spike"""
+        x = np.arange(10000)
+        y = np.sin(x / 500)
+        y[4321] = 50
+        keep = lttb(x, y, 200)
+        self.assertEqual(len(keep), 200)
+        self.assertEqual((keep[0], keep[-1]), (0, 9999))
+        self.assertIn(4321, keep)
+        self.assertTrue(np.all(np.diff(keep) > 0))
+        self.assertEqual(list(lttb(x[:50], y[:50], 200)), list(range(50)))
+
+    def test_granularity_follows_the_window(self):
+        """Test the bucket size grows with the visible range"""
+        self.assertEqual(pick_granularity(date(2024, 1, 1), date(2024, 3, 1)), "day")
+        self.assertEqual(pick_granularity(date(2015, 1, 1), date(2024, 12, 31)), "week")
+        self.assertEqual(pick_granularity(date(2015, 1, 1), date(2024, 12, 31), max_buckets=200), "month")
+        self.assertEqual(pick_granularity(date(1900, 1, 1), date(2099, 12, 31), max_buckets=200), "year")
+
+    def test_zooming_rebuckets_the_view(self):
+        """Test a narrower window is read at a finer granularity and downsampled to the point budget"""
+        view = TimelineView(max_points=100)
+        try:
+            granularity, series = view.load(self.db)
+            self.assertEqual(granularity, "day")
+            self.assertLessEqual(len(series[1][0]), 200)
+            view.update(self.db)
+
+            view.window = (date(2023, 3, 1), date(2023, 3, 31))
+            view.update(self.db)
+            x, y = view.lines[1].get_data()
+            # 31 visible days plus 15 either side for panning, all at full detail
+            self.assertEqual(len(x), 61)
+            self.assertEqual(view.ax.get_ylim()[0], 0)
+            self.assertIn("day", view.ax.get_title())
+
+            with_budget = TimelineView(start=date(2021, 1, 1), end=date(2023, 12, 31), max_points=100)
+            granularity, _ = with_budget.load(self.db)
+            with_budget.close()
+            self.assertEqual(granularity, "day")
+        finally:
+            view.close()
+
+class TestRenderCache(unittest.TestCase):
+    def setUp(self):
+        """Set up test database and cache directory"""
+        self.test_db = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.test_db.close()
+        self.cache_dir = tempfile.mkdtemp()
+        self.engine = create_engine(f"sqlite:///{self.test_db.name}")
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        self.add("2024-01-10", 300)
+
+    def tearDown(self):
+        """Clean up test database"""
+        self.db.close()
+        self.engine.dispose()
+        shutil.rmtree(self.cache_dir)
+        os.unlink(self.test_db.name)
+
+    def add(self, day, amount):
+        self.db.add(Transaction(date=day, amount=amount, type="expense", category="Food"))
+        self.db.commit()
+
+    def test_renders_are_reused_until_the_ledger_changes(self):
+        """Test a chart is drawn once per data version and size, with LRU eviction"""
+        cache = RenderCache(max_entries=2, directory=None)
+        first = cache.render(self.db, "dashboard_trend", (300, 150))
+        self.assertIs(cache.render(self.db, "dashboard_trend", (300, 150)), first)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # A write moves the data version, so the next view is drawn afresh
+        self.add("2024-02-10", 500)
+        self.assertIsNot(cache.render(self.db, "dashboard_trend", (300, 150)), first)
+        self.assertEqual(cache.misses, 2)
+
+        cache.render(self.db, "dashboard_categories", (300, 150))
+        cache.render(self.db, "dashboard_trend", (400, 200))
+        self.assertEqual(len(cache._entries), 2)
+
+    def test_disk_tier_survives_a_new_cache_and_is_cleared(self):
+        """Test renderings written to disk are found by a fresh cache and removed by clear()"""
+        RenderCache(directory=self.cache_dir).render(self.db, "expense_trend", (320, 200))
+        cache = RenderCache(directory=self.cache_dir)
+        cache.render(self.db, "expense_trend", (320, 200))
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+        cache.clear()
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+class TestStatementRendering(unittest.TestCase):
+    def setUp(self):
+        """Set up two household ledgers with a few months each"""
+        self.directory = tempfile.mkdtemp()
+        self.ledgers = []
+        for name, months in (("smith", (1, 2, 3)), ("jones", (2,))):
+            path = os.path.join(self.directory, f"{name}.db")
+            engine = make_engine(path)
+            migrate(engine)
+            db = sessionmaker(bind=engine)()
+            for month in months:
+                db.add(Transaction(date=f"2024-0{month}-01", amount=2000, type="income", category="Salary"))
+                db.add(Transaction(date=f"2024-0{month}-15", amount=150 * month, type="expense", category="Food"))
+            db.add(Transaction(date="2023-12-24", amount=80, type="expense", category="Gifts"))
+            db.commit()
+            db.close()
+            engine.dispose()
+            self.ledgers.append(path)
+        self.out = os.path.join(self.directory, "statements")
+
+    def tearDown(self):
+        """Clean up ledgers and output"""
+        shutil.rmtree(self.directory)
+
+    def test_pdf_pack_per_month_and_ledger(self):
+        """Test every month of the year gets a multi-page PDF under its ledger's directory"""
+        font = plt.rcParams['font.family']
+        results = render_statements(self.ledgers, self.out, year=2024, workers=1)
+        # Rendering uses its own style and figures, not pyplot's
+        self.assertEqual(plt.rcParams['font.family'], font)
+        self.assertEqual(plt.get_fignums(), [])
+        self.assertEqual(sorted(results), sorted([(self.ledgers[0], "2024-01"), (self.ledgers[0], "2024-02"),
+                                                  (self.ledgers[0], "2024-03"), (self.ledgers[1], "2024-02")]))
+        path, = results[(self.ledgers[0], "2024-03")]['files']
+        self.assertEqual(path, os.path.join(self.out, "smith", "statement-2024-03.pdf"))
+        with open(path, "rb") as f:
+            pdf = f.read()
+        self.assertTrue(pdf.startswith(b"%PDF"))
+        self.assertEqual(pdf.count(b"/Type /Page\n") + pdf.count(b"/Type /Page "), 4)
+
+    def test_image_pages_in_worker_processes(self):
+        """Test PNG pages render in a process pool without a display"""
+        results = render_statements(self.ledgers, self.out, months=["2024-02"], file_format="png", workers=2)
+        self.assertEqual(len(results), 2)
+        files = results[(self.ledgers[1], "2024-02")]['files']
+        self.assertEqual([os.path.basename(f) for f in files],
+                         ["01-statement_summary.png", "02-monthly_summary.png",
+                          "03-category_breakdown.png", "04-timeline.png"])
+        for path in files:
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(8), b"\x89PNG\r\n\x1a\n")
+
+class TestDatabaseProfile(unittest.TestCase):
+    def setUp(self):
+        self.test_db = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        self.test_db.close()
+
+    def tearDown(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db.name + suffix):
+                os.unlink(self.test_db.name + suffix)
+
+    def test_profile_applied_to_every_connection(self):
+        """Test the configured pragmas are set when a connection opens"""
+        engine = make_engine(self.test_db.name, profile="balanced")
+        with engine.connect() as conn:
+            self.assertEqual(conn.exec_driver_sql("PRAGMA journal_mode").scalar(), "wal")
+            self.assertEqual(conn.exec_driver_sql("PRAGMA synchronous").scalar(), 1)  # NORMAL
+            self.assertEqual(conn.exec_driver_sql("PRAGMA temp_store").scalar(), 2)  # MEMORY
+            self.assertEqual(conn.exec_driver_sql("PRAGMA busy_timeout").scalar(), 5000)
+        engine.dispose()
+
+    def test_unknown_profile_rejected(self):
+        """Test an unknown profile name fails loudly"""
+        engine = make_engine(self.test_db.name, profile="turbo")
+        with self.assertRaisesRegex(ValueError, "Unknown database profile: turbo"):
+            with engine.connect():
+                pass
+        engine.dispose()
+
+if __name__ == '__main__':
+    unittest.main()
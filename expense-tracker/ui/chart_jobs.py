@@ -0,0 +1,112 @@
+"""
+Background chart jobs.
+
+The query, the aggregation and the Agg drawing of a chart all run in a
+worker thread with its own session, so the Tk loop never waits on them.
+Only the finished PNG crosses back, through a queue drained with
+``after()``, and becomes a PhotoImage on the Tk thread. Submitting a
+job cancels the previous one: a job still queued never starts, and the
+result of one already running is thrown away. Renderings go through the
+shared render cache, so a chart of unchanged data is never drawn twice.
+While a restore swaps the database file, jobs wait for it to finish.
+"""
+
+import base64
+import queue
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from services.database import SessionLocal
+from services.restore import register_pause_hook, unregister_pause_hook
+from utils.render_cache import chart_cache
+
+class ChartJobs:
+    """Runs one chart job at a time for a Tk root; the newest job wins"""
+
+    POLL_MS = 50
+
+    def __init__(self, root, session_factory=SessionLocal, cache=chart_cache):
+        self.root = root
+        self.session_factory = session_factory
+        self.cache = cache
+        self.results = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chart-job")
+        self._future = None
+        self._cancelled = threading.Event()
+        self._current = None  # (job number, on_done, on_error) of the job still wanted
+        self._job = 0
+        self._polling = False
+        # Held by a restore for the length of the swap, and by every job
+        self._idle = threading.Lock()
+        register_pause_hook(self.pause, self.resume)
+
+    def submit(self, chart, on_done, on_error=None, size=None, **params):
+        """Build a CHARTS entry in the background; ``on_done(image)`` gets a PhotoImage on the Tk thread"""
+        self.cancel()
+        self._job += 1
+        self._cancelled = threading.Event()
+        self._current = (self._job, on_done, on_error)
+        self._future = self._executor.submit(self._run, self._job, self._cancelled, chart, size, params)
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._poll)
+        return self._job
+
+    def cancel(self):
+        """Forget the current job: it does not start if still queued and its result is discarded"""
+        if self._future:
+            self._future.cancel()
+        self._cancelled.set()
+        self._current = None
+
+    def close(self):
+        """Cancel everything and let the worker thread finish"""
+        unregister_pause_hook(self.pause, self.resume)
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def pause(self):
+        """Wait for the running job, if any, and hold new ones until resume()"""
+        self._idle.acquire()
+
+    def resume(self):
+        """Let jobs held by pause() run"""
+        self._idle.release()
+
+    def _run(self, job, cancelled, chart, size, params):
+        with self._idle:
+            if cancelled.is_set():
+                return
+            db = self.session_factory()
+            try:
+                png = self.cache.render(db, chart, size, **params)
+                if not cancelled.is_set():
+                    self.results.put((job, png, None))
+            except Exception as e:
+                self.results.put((job, None, e))
+            finally:
+                db.close()
+
+    def _poll(self):
+        """Hand finished results to their callbacks (runs on the Tk thread)"""
+        try:
+            while True:
+                job, png, error = self.results.get_nowait()
+                if not self._current or self._current[0] != job:
+                    continue  # superseded or cancelled
+                _, on_done, on_error = self._current
+                self._current = None
+                if error:
+                    if on_error:
+                        on_error(error)
+                    else:
+                        print(f"Error building chart: {error}")
+                else:
+                    on_done(tk.PhotoImage(master=self.root, data=base64.b64encode(png), format="png"))
+        except queue.Empty:
+            pass
+
+        if self._current:
+            self.root.after(self.POLL_MS, self._poll)
+        else:
+            self._polling = False
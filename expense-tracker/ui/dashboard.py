@@ -1,11 +1,13 @@
+import base64
 import tkinter as tk
 from tkinter import ttk
 from ui.styles import ModernStyle, create_card_frame, create_icon_button
 from services.database import Transaction
-from datetime import datetime, timedelta
-from collections import defaultdict
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from services.report_service import ReportService
+from utils.render_cache import chart_cache
+
+# Pixel size of the two dashboard charts
+DASHBOARD_CHART_SIZE = (600, 300)
 
 class Dashboard:
     def __init__(self, parent, db):
@@ -32,21 +34,15 @@ class Dashboard:
         cards_frame.pack(fill="x", pady=(0, 20))
         
         # Calculate statistics
-        transactions = self.db.query(Transaction).all()
-        current_month = datetime.now().strftime("%Y-%m")
-        
-        total_income = sum(t.amount for t in transactions if t.type == "income")
-        total_expense = sum(t.amount for t in transactions if t.type == "expense")
-        month_expense = sum(t.amount for t in transactions 
-                           if t.type == "expense" and t.date.startswith(current_month))
+        stats = ReportService(self.db).get_summary_stats()
         
         # Create summary cards
         cards_data = [
-            ("💰 Total Income", f"₹{total_income:,.0f}", ModernStyle.SUCCESS),
-            ("💸 Total Expense", f"₹{total_expense:,.0f}", ModernStyle.DANGER),
-            ("📅 This Month", f"₹{month_expense:,.0f}", ModernStyle.PRIMARY),
-            ("💳 Net Worth", f"₹{total_income - total_expense:,.0f}", 
-             ModernStyle.SUCCESS if total_income >= total_expense else ModernStyle.DANGER)
+            ("💰 Total Income", f"₹{stats['total_income']:,.0f}", ModernStyle.SUCCESS),
+            ("💸 Total Expense", f"₹{stats['total_expense']:,.0f}", ModernStyle.DANGER),
+            ("📅 This Month", f"₹{stats['month_expense']:,.0f}", ModernStyle.PRIMARY),
+            ("💳 Net Worth", f"₹{stats['net_worth']:,.0f}", 
+             ModernStyle.SUCCESS if stats['net_worth'] >= 0 else ModernStyle.DANGER)
         ]
         
         for i, (title, value, color) in enumerate(cards_data):
@@ -80,68 +76,19 @@ class Dashboard:
         self.create_category_chart(right_chart)
         
     def create_monthly_chart(self, parent):
-        transactions = self.db.query(Transaction).all()
-        monthly = defaultdict(lambda: {"income": 0, "expense": 0})
-        
-        for t in transactions:
-            try:
-                # Handle different date formats
-                if len(t.date.split('-')) == 3:
-                    month = datetime.strptime(t.date, "%Y-%m-%d").strftime("%Y-%m")
-                else:
-                    # Handle other formats like '2 07 2008'
-                    parts = t.date.split()
-                    if len(parts) == 3:
-                        day, month_num, year = parts
-                        month = f"{year}-{month_num.zfill(2)}"
-                    else:
-                        continue  # Skip invalid dates
-                monthly[month][t.type] += t.amount
-            except (ValueError, AttributeError):
-                continue  # Skip invalid dates
-            
-        # Get last 6 months
-        months = sorted(monthly.keys())[-6:]
-        income = [monthly[m]["income"] for m in months]
-        expense = [monthly[m]["expense"] for m in months]
-        
-        fig, ax = plt.subplots(figsize=(6, 3))
-        ax.plot(months, income, label="Income", marker='o', color=ModernStyle.SUCCESS, linewidth=2)
-        ax.plot(months, expense, label="Expense", marker='o', color=ModernStyle.DANGER, linewidth=2)
-        ax.set_title("Last 6 Months Trend", fontsize=12, fontweight='bold')
-        ax.legend()
-        ax.grid(True, alpha=0.3)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        canvas = FigureCanvasTkAgg(fig, master=parent)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill="both", expand=True)
+        self.show_cached_chart(parent, "dashboard_trend")
         
     def create_category_chart(self, parent):
-        transactions = self.db.query(Transaction).filter(Transaction.type == "expense").all()
-        categories = defaultdict(float)
-        
-        for t in transactions:
-            categories[t.category or "Other"] += t.amount
-            
-        if categories:
-            labels = list(categories.keys())[:5]  # Top 5 categories
-            sizes = [categories[label] for label in labels]
-            
-            fig, ax = plt.subplots(figsize=(6, 3))
-            colors = [ModernStyle.PRIMARY, ModernStyle.SECONDARY, ModernStyle.SUCCESS, 
-                     ModernStyle.DANGER, ModernStyle.GRAY]
-            ax.pie(sizes, labels=labels, autopct='%1.1f%%', colors=colors[:len(labels)])
-            ax.set_title("Top Expense Categories", fontsize=12, fontweight='bold')
-            plt.tight_layout()
-            
-            canvas = FigureCanvasTkAgg(fig, master=parent)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill="both", expand=True)
-        else:
-            ttk.Label(parent, text="No expense data available", 
-                     font=("Segoe UI", 10)).pack(expand=True)
+        self.show_cached_chart(parent, "dashboard_categories")
+        
+    def show_cached_chart(self, parent, chart):
+        """Show a dashboard chart from the render cache; it is only drawn again after the ledger changes"""
+        png = chart_cache.render(self.db, chart, DASHBOARD_CHART_SIZE)
+        image = tk.PhotoImage(master=parent, data=base64.b64encode(png), format="png")
+        label = tk.Label(parent, image=image, bg=ModernStyle.WHITE, borderwidth=0)
+        # Tk drops an image nothing in Python refers to
+        label.image = image
+        label.pack(fill="both", expand=True)
             
     def create_recent_transactions(self):
         recent_frame = create_card_frame(self.parent)
@@ -1,18 +1,28 @@
+import queue
+import threading
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, filedialog, messagebox
 from ui.transaction_form import TransactionForm
 from ui.transaction_list import TransactionList
 from ui.dashboard import Dashboard
 from ui.styles import ModernStyle, create_card_frame, create_icon_button
 from ui.background import set_background_image
-from utils.charts import plot_monthly_summary, plot_category_breakdown, plot_expense_trend
+from ui.chart_jobs import ChartJobs
+from utils.charts import close_views, plot_timeline, ui_session
 from utils.import_export import ImportExport
 from ui.budget_manager import BudgetManagerWindow
 from services.database import SessionLocal, Transaction
+from services.report_service import ReportService
+from services.backup import BackupService
 from datetime import datetime, timedelta
 
 class MainWindow:
-    def __init__(self):
+    # How often the Tk loop drains the scheduler's result queue
+    SCHEDULER_POLL_MS = 500
+    # Quiet period after a chart window is resized before it is redrawn
+    CHART_RESIZE_MS = 300
+
+    def __init__(self, scheduler=None):
         self.root = tk.Tk()
         self.root.title("💰 Personal Expense Tracker")
         self.root.geometry("1200x800")
@@ -22,12 +32,19 @@ class MainWindow:
         ModernStyle.configure_styles()
         
         self.db = SessionLocal()
+        self.scheduler = scheduler
+        # Charts are built off the Tk thread, one at a time
+        self.chart_jobs = ChartJobs(self.root)
+        self.chart_window = None
         
         # Set simple background color instead of image
         self.root.configure(bg="#E6F3FF")
         
         self.setup_ui()
         
+        if self.scheduler:
+            self.root.after(self.SCHEDULER_POLL_MS, self.poll_scheduler)
+        
     def setup_ui(self):
         # Main container
         main_container = ttk.Frame(self.root)
@@ -61,9 +78,15 @@ class MainWindow:
         ttk.Label(title_frame, text="💰 Personal Expense Tracker", 
                  style="Title.TLabel").pack(side="left")
         
+        # Last background event (recurring postings and the like)
+        self.status_var = tk.StringVar()
+        ttk.Label(title_frame, textvariable=self.status_var, font=("Segoe UI", 9),
+                 foreground=ModernStyle.DARK).pack(side="left", padx=(20, 0))
+        
         # Quick stats
         stats_frame = ttk.Frame(title_frame)
         stats_frame.pack(side="right")
+        self.stats_frame = stats_frame
         
         self.update_header_stats(stats_frame)
         
@@ -73,19 +96,13 @@ class MainWindow:
             widget.destroy()
             
         # Calculate current month stats
-        current_month = datetime.now().strftime("%Y-%m")
-        transactions = self.db.query(Transaction).all()
-        
-        month_income = sum(t.amount for t in transactions 
-                          if t.type == "income" and t.date.startswith(current_month))
-        month_expense = sum(t.amount for t in transactions 
-                           if t.type == "expense" and t.date.startswith(current_month))
-        balance = month_income - month_expense
+        summary = ReportService(self.db).get_summary_stats()
+        balance = summary['month_balance']
         
         # Stats display
         stats = [
-            ("This Month Income", f"₹{month_income:,.0f}", ModernStyle.SUCCESS),
-            ("This Month Expense", f"₹{month_expense:,.0f}", ModernStyle.DANGER),
+            ("This Month Income", f"₹{summary['month_income']:,.0f}", ModernStyle.SUCCESS),
+            ("This Month Expense", f"₹{summary['month_expense']:,.0f}", ModernStyle.DANGER),
             ("Balance", f"₹{balance:,.0f}", ModernStyle.SUCCESS if balance >= 0 else ModernStyle.DANGER)
         ]
         
@@ -151,19 +168,29 @@ class MainWindow:
         btn_frame.pack()
         
         monthly_btn = ttk.Button(btn_frame, text="📈 Monthly Summary", 
-                                command=lambda: self.open_chart(plot_monthly_summary),
+                                command=lambda: self.open_chart("monthly_summary"),
                                 style="Primary.TButton")
         monthly_btn.pack(side="left", padx=(0, 10))
         
         category_btn = ttk.Button(btn_frame, text="🥧 Category Breakdown", 
-                                 command=lambda: self.open_chart(plot_category_breakdown),
+                                 command=lambda: self.open_chart("category_breakdown"),
                                  style="Primary.TButton")
         category_btn.pack(side="left", padx=(0, 10))
         
         trend_btn = ttk.Button(btn_frame, text="📉 Expense Trend", 
-                              command=lambda: self.open_chart(plot_expense_trend),
+                              command=lambda: self.open_chart("expense_trend"),
                               style="Primary.TButton")
-        trend_btn.pack(side="left")
+        trend_btn.pack(side="left", padx=(0, 10))
+        
+        projection_btn = ttk.Button(btn_frame, text="🔮 Cash Flow Projection", 
+                                   command=lambda: self.open_chart("cash_flow_projection"),
+                                   style="Primary.TButton")
+        projection_btn.pack(side="left", padx=(0, 10))
+        
+        timeline_btn = ttk.Button(btn_frame, text="🕒 Timeline", 
+                                 command=self.open_timeline,
+                                 style="Primary.TButton")
+        timeline_btn.pack(side="left")
         
         # Import/Export section
         import_export_frame = create_card_frame(reports_frame)
@@ -183,9 +210,21 @@ class MainWindow:
                                    command=self.import_csv, style="Primary.TButton")
         import_csv_btn.pack(side="left", padx=(0, 10))
         
+        export_parquet_btn = ttk.Button(ie_btn_frame, text="🗃 Export Parquet", 
+                                       command=self.export_parquet, style="Success.TButton")
+        export_parquet_btn.pack(side="left", padx=(0, 10))
+        
+        import_parquet_btn = ttk.Button(ie_btn_frame, text="🗃 Import Parquet", 
+                                       command=self.import_parquet, style="Primary.TButton")
+        import_parquet_btn.pack(side="left", padx=(0, 10))
+        
         backup_btn = ttk.Button(ie_btn_frame, text="💾 Backup DB", 
                                command=self.backup_database, style="Primary.TButton")
-        backup_btn.pack(side="left")
+        backup_btn.pack(side="left", padx=(0, 10))
+        
+        restore_btn = ttk.Button(ie_btn_frame, text="♻ Restore DB", 
+                                command=self.restore_database, style="Primary.TButton")
+        restore_btn.pack(side="left")
         
 
 
@@ -199,12 +238,59 @@ class MainWindow:
     def open_transaction_list(self):
         TransactionList(self.root)
 
-    def open_chart(self, chart_func):
+    def open_chart(self, chart):
+        """Show a chart built in the background; picking another chart replaces one still building"""
+        win = self.chart_window
+        if win is None or not win.winfo_exists():
+            win = tk.Toplevel(self.root)
+            win.title("📊 Financial Report")
+            win.geometry("1000x700")
+            win.configure(bg=ModernStyle.WHITE)
+            win.image_label = tk.Label(win, bg=ModernStyle.WHITE, borderwidth=0, highlightthickness=0)
+            win.image_label.pack(fill="both", expand=True)
+            win.resize_job = None
+            win.bind("<Configure>", lambda e: self.on_chart_resize(win) if e.widget is win else None)
+            win.bind("<Destroy>", lambda e: self.chart_jobs.cancel() if e.widget is win else None)
+            self.chart_window = win
+        
+        win.chart = chart
+        win.image = None
+        win.image_label.configure(image="", text="⏳ Building chart...")
+        win.update_idletasks()
+        win.chart_size = (max(win.winfo_width(), 400), max(win.winfo_height(), 300))
+        
+        def show(image):
+            if win.winfo_exists():
+                # Tk drops an image nothing in Python refers to
+                win.image = image
+                win.image_label.configure(image=image, text="")
+        
+        def failed(error):
+            if win.winfo_exists():
+                win.image_label.configure(text=f"Could not build chart: {error}")
+        
+        self.chart_jobs.submit(chart, show, failed, size=win.chart_size)
+        win.lift()
+    
+    def open_timeline(self):
+        """Open the interactive timeline; zooming re-reads it at day, week, month or year detail"""
         win = tk.Toplevel(self.root)
-        win.title("📊 Financial Report")
+        win.title("🕒 Income & Expense Timeline")
         win.geometry("1000x700")
         win.configure(bg=ModernStyle.WHITE)
-        chart_func(parent=win)
+        try:
+            plot_timeline(win)
+        except Exception as e:
+            win.destroy()
+            messagebox.showerror("Error", f"Could not build timeline: {e}")
+    
+    def on_chart_resize(self, win):
+        """Redraw the chart at the new size once resizing has paused"""
+        if (win.winfo_width(), win.winfo_height()) == win.chart_size:
+            return
+        if win.resize_job:
+            win.after_cancel(win.resize_job)
+        win.resize_job = win.after(self.CHART_RESIZE_MS, lambda: self.open_chart(win.chart))
     
     def export_csv(self):
         """Export transactions to CSV"""
@@ -213,19 +299,173 @@ class MainWindow:
     
     def import_csv(self):
         """Import transactions from CSV"""
+        filenames = ImportExport.ask_csv_files()
+        if filenames:
+            self.run_import(lambda ie, progress: ie.import_csv_files(filenames, progress))
+    
+    def export_parquet(self):
+        """Export transactions to Parquet"""
         ie = ImportExport()
-        if ie.import_from_csv():
-            # Refresh dashboard after import
-            self.show_dashboard()
+        ie.export_to_parquet()
+    
+    def import_parquet(self):
+        """Import transactions from Parquet or Arrow"""
+        filename = ImportExport.ask_parquet_file()
+        if filename:
+            self.run_import(lambda ie, progress: ie.import_parquet_file(filename, progress))
+    
+    def run_import(self, work):
+        """Run ``work(import_export, progress)`` in a worker thread behind a modal progress window.
+
+        The worker gets its own ImportExport and session; progress and the
+        result come back through a queue drained with ``after()``.
+        """
+        updates = queue.Queue()
+        
+        progress_win = tk.Toplevel(self.root)
+        progress_win.title("Importing...")
+        progress_win.transient(self.root)
+        progress_win.protocol("WM_DELETE_WINDOW", lambda: None)  # runs to the end
+        bar = ttk.Progressbar(progress_win, length=300, maximum=1.0)
+        bar.pack(padx=20, pady=(20, 5))
+        label = ttk.Label(progress_win, text="Reading file...")
+        label.pack(padx=20, pady=(0, 20))
+        # No other commands while an import is half-way through
+        progress_win.grab_set()
+        
+        def worker():
+            ie = ImportExport()
+            try:
+                updates.put(("done", work(ie, lambda stats: updates.put(("progress", stats)))))
+            except Exception as e:
+                updates.put(("error", str(e)))
+            finally:
+                ie.db.close()
+        
+        def check():
+            try:
+                while True:
+                    kind, detail = updates.get_nowait()
+                    if kind == "progress":
+                        bar['value'] = detail['fraction']
+                        label['text'] = f"{detail['imported']:,} imported, {detail['rejected']:,} skipped"
+                        continue
+                    progress_win.grab_release()
+                    progress_win.destroy()
+                    if kind == "error":
+                        messagebox.showerror("Error", f"Import failed: {detail}")
+                    else:
+                        messagebox.showinfo("Success", detail)
+                        # Refresh dashboard after import
+                        self.db.expire_all()
+                        self.show_dashboard()
+                    return
+            except queue.Empty:
+                pass
+            self.root.after(100, check)
+        
+        threading.Thread(target=worker, name="import", daemon=True).start()
+        self.root.after(100, check)
     
     def backup_database(self):
-        """Backup database"""
-        ie = ImportExport()
-        ie.backup_database()
+        """Back up the database in a worker thread so the window stays responsive"""
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".db.gz",
+            filetypes=[("Compressed backups", "*.db.gz"), ("Database files", "*.db"), ("All files", "*.*")],
+            title="Backup Database",
+            initialfile=f"expense_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db.gz"
+        )
+        if not filename:
+            return
+        
+        done = queue.Queue()
+        
+        def work():
+            try:
+                done.put((True, BackupService().backup_to(filename)))
+            except Exception as e:
+                done.put((False, str(e)))
+        
+        def check():
+            try:
+                ok, detail = done.get_nowait()
+            except queue.Empty:
+                self.root.after(200, check)
+                return
+            if ok:
+                messagebox.showinfo("Success", f"Database backed up to {detail}")
+            else:
+                messagebox.showerror("Error", f"Backup failed: {detail}")
+        
+        threading.Thread(target=work, name="manual-backup", daemon=True).start()
+        self.root.after(200, check)
+    
+    def restore_database(self):
+        """Restore a backup in a worker thread and carry on with the restored data"""
+        backup_filename = ImportExport.ask_restore_file()
+        if not backup_filename:
+            return
+        
+        busy = tk.Toplevel(self.root)
+        busy.title("Restoring...")
+        busy.transient(self.root)
+        busy.protocol("WM_DELETE_WINDOW", lambda: None)  # runs to the end
+        ttk.Label(busy, text="Saving current data and restoring the backup...").pack(padx=20, pady=20)
+        # Nothing on the Tk thread may query the database during the swap
+        busy.grab_set()
+        self.db.close()
+        ui_session().close()
+        
+        done = queue.Queue()
+        
+        def work():
+            try:
+                done.put((True, ImportExport.restore_backup(backup_filename)))
+            except Exception as e:
+                done.put((False, str(e)))
+        
+        def check():
+            try:
+                ok, detail = done.get_nowait()
+            except queue.Empty:
+                self.root.after(200, check)
+                return
+            busy.grab_release()
+            busy.destroy()
+            if ok:
+                # The scheduler and chart worker were paused by the restore; rebuild views from the new data
+                self.update_header_stats(self.stats_frame)
+                self.show_dashboard()
+                messagebox.showinfo("Success", f"Database restored successfully.\n\nPrevious data saved to {detail}")
+            else:
+                messagebox.showerror("Error", f"Restore failed: {detail}")
+        
+        threading.Thread(target=work, name="restore", daemon=True).start()
+        self.root.after(200, check)
     
     def open_budget_manager(self):
         """Open budget manager window"""
         BudgetManagerWindow(self.root)
 
+    def poll_scheduler(self):
+        """Apply results posted by the background scheduler (runs on the Tk thread)"""
+        posted = 0
+        try:
+            while True:
+                kind, count = self.scheduler.results.get_nowait()
+                if kind == "recurring":
+                    posted += count
+        except queue.Empty:
+            pass
+        
+        if posted:
+            self.db.expire_all()
+            self.update_header_stats(self.stats_frame)
+            self.status_var.set(f"🔁 Posted {posted} recurring transaction(s) at {datetime.now():%H:%M}")
+        
+        self.root.after(self.SCHEDULER_POLL_MS, self.poll_scheduler)
+
     def run(self):
         self.root.mainloop()
+        self.chart_jobs.close()
+        close_views()
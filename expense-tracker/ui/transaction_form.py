@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from services.database import SessionLocal, Transaction
+from business.budgets import BudgetManager
 from ui.styles import ModernStyle, create_card_frame, create_icon_button
 from ui.background import set_background_image
 from datetime import datetime
@@ -124,7 +125,8 @@ class TransactionForm(tk.Toplevel):
         t = self.db.query(Transaction).filter(Transaction.id == self.transaction_id).first()
         if t:
             # Set date
-            self.date_entry.set_date(datetime.strptime(t.date, "%Y-%m-%d").date())
+            if t.txn_date:
+                self.date_entry.set_date(t.txn_date)
             
             # Set amount
             self.amount_entry.insert(0, str(t.amount))
@@ -174,6 +176,11 @@ class TransactionForm(tk.Toplevel):
                 self.db.commit()
                 messagebox.showinfo("✅ Success", "Transaction added successfully!")
 
+            if t_type == "expense":
+                alert = BudgetManager(self.db).get_category_alert(category)
+                if alert:
+                    messagebox.showwarning("Budget Alert", alert['message'])
+
             self.destroy()
             
         except ValueError:
@@ -4,6 +4,7 @@ from services.database import SessionLocal, Transaction
 from ui.transaction_form import TransactionForm
 from ui.styles import ModernStyle, create_card_frame, create_icon_button
 from ui.background import set_background_image
+from utils.helpers import parse_date
 from datetime import datetime
 
 class TransactionList(tk.Toplevel):
@@ -178,10 +179,12 @@ class TransactionList(tk.Toplevel):
                 query = query.filter(Transaction.type == filters["type"])
             if filters.get("category") and filters["category"] != "All":
                 query = query.filter(Transaction.category == filters["category"])
-            if filters.get("start_date"):
-                query = query.filter(Transaction.date >= filters["start_date"])
-            if filters.get("end_date"):
-                query = query.filter(Transaction.date <= filters["end_date"])
+            start_date = parse_date(filters.get("start_date"))
+            end_date = parse_date(filters.get("end_date"))
+            if start_date:
+                query = query.filter(Transaction.txn_date >= start_date)
+            if end_date:
+                query = query.filter(Transaction.txn_date <= end_date)
 
         for t in query.all():
             # Format amount with currency symbol and color coding
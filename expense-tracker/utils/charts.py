@@ -1,170 +1,638 @@
+import calendar
+import io
+import math
+import threading
+from contextlib import contextmanager
+from datetime import date
+import numpy as np
+import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from services.database import SessionLocal, Transaction
-from datetime import datetime, timedelta
-from collections import defaultdict
+import matplotlib.style
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from services.database import SessionLocal
+from services.aggregates import get_monthly_totals, get_category_totals, get_period_totals, get_ledger_span
+from business.projection import CashFlowProjection
 from ui.styles import ModernStyle
+from utils.timeseries import lttb, pick_granularity
+from config import TIMELINE_MAX_POINTS
 
-db = SessionLocal()
+# Applied around building and drawing chart figures only, so importing
+# this module leaves pyplot's global style alone. Segoe UI is tried first
+# and the seaborn fallbacks cover machines without it.
+CHART_STYLE = ['seaborn-v0_8-whitegrid', {
+    'font.family': 'sans-serif',
+    'font.sans-serif': ['Segoe UI'] + matplotlib.style.library['seaborn-v0_8-whitegrid']['font.sans-serif'],
+    'font.size': 10,
+    'axes.titlesize': 12,
+    'axes.titleweight': 'bold',
+}]
 
-# Configure matplotlib for better appearance
-plt.style.use('seaborn-v0_8-whitegrid')
-plt.rcParams['font.family'] = 'Segoe UI'
-plt.rcParams['font.size'] = 10
-plt.rcParams['axes.titlesize'] = 12
-plt.rcParams['axes.titleweight'] = 'bold'
+# rcParams are global, so threads take turns inside the style
+_style_lock = threading.RLock()
 
-def embed_chart_in_window(parent, fig, canvas_holder=None):
-    """Embed chart into Tkinter window, supports refresh"""
-    if canvas_holder:
+@contextmanager
+def chart_style():
+    """Temporarily apply CHART_STYLE (reentrant, one thread at a time)"""
+    with _style_lock, matplotlib.style.context(CHART_STYLE):
+        yield
+
+class ChartFigure(Figure):
+    """A Figure that is always drawn under the chart style, on screen or to a file"""
+
+    def draw(self, renderer):
+        with chart_style():
+            super().draw(renderer)
+
+_ui_db = None
+
+def ui_session():
+    """The session embedded charts read from, opened on first use"""
+    global _ui_db
+    if _ui_db is None:
+        _ui_db = SessionLocal()
+    return _ui_db
+
+PIE_COLORS = [ModernStyle.PRIMARY, ModernStyle.SECONDARY, ModernStyle.SUCCESS,
+              ModernStyle.DANGER, ModernStyle.GRAY, '#FF6B6B', '#4ECDC4', '#45B7D1']
+
+def currency_axis(ax):
+    """Format the y-axis as rupees"""
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'₹{x:,.0f}'))
+
+def month_name(month):
+    """'2024-03' -> 'March 2024'"""
+    year, number = month.split("-")
+    return f"{calendar.month_name[int(number)]} {year}"
+
+def update_fill(ax, fill, x, y1, y2=0, **kwargs):
+    """Move a fill_between area to new data, in place where matplotlib supports it (3.10+)"""
+    if fill is not None and hasattr(fill, "set_data"):
+        fill.set_data(x, y1, y2, where=kwargs.get("where"))
+        return fill
+    if fill is not None:
+        fill.remove()
+    return ax.fill_between(x, y1, y2, **kwargs)
+
+class ChartView:
+    """A chart drawn on one long-lived figure.
+
+    The first update() creates the artists; later ones load fresh data
+    and only move it into the existing lines, fills and wedges, which
+    costs a fraction of building a new figure. close() releases the
+    figure, so a session holds a fixed number of figures however often
+    charts are refreshed.
+    """
+
+    figsize = (12, 6)
+
+    def __init__(self, figure=ChartFigure):
+        with chart_style():
+            self.figure = figure(figsize=self.figsize)
+            self.figure.patch.set_facecolor('white')
+            self.ax = self.figure.add_subplot()
+        # A figure must not be drawn from two threads at once
+        self.lock = threading.Lock()
+        self.built = False
+
+    def load(self, db):
+        """Query and aggregate the data to plot"""
+        raise NotImplementedError
+
+    def build(self, data):
+        """Create the artists for the first draw"""
+        raise NotImplementedError
+
+    def refresh(self, data):
+        """Move new data into the existing artists (default: redraw the axes)"""
+        self.ax.clear()
+        self.build(data)
+
+    def artists(self):
+        """The artists that carry data, redrawn on their own when blitting"""
+        return []
+
+    def update(self, db):
+        """Load current data and draw it; returns the figure"""
+        data = self.load(db)
+        with chart_style():
+            if self.built:
+                self.refresh(data)
+            else:
+                self.build(data)
+                self.built = True
+            self.figure.tight_layout()
+        return self.figure
+
+    def close(self):
+        self.figure.clear()
+        plt.close(self.figure)
+
+class MonthlyTrendView(ChartView):
+    """Monthly totals per type as lines over the last ``months`` months"""
+
+    months = 12
+    transaction_type = None  # limit the months to those with this type
+    series = (("income", "💰 Income", ModernStyle.SUCCESS), ("expense", "💸 Expense", ModernStyle.DANGER))
+    line_style = {'marker': 'o', 'linewidth': 3, 'markersize': 8}
+    fill = False
+    title = "📈 Monthly Income vs Expense Trend"
+    ylabel = "Amount (₹)"
+
+    def __init__(self, figure=ChartFigure, until=None):
+        self.until = until  # last month shown, 'YYYY-MM' (default: the latest)
+        super().__init__(figure)
+
+    def load(self, db):
+        monthly = get_monthly_totals(db, self.transaction_type)
+        months = sorted(m for m in monthly.keys() if not self.until or m <= self.until)[-self.months:]
+        return months, [[monthly[m][kind] for m in months] for kind, _, _ in self.series]
+
+    def build(self, data):
+        months, values = data
+        x = range(len(months))
+        self.lines = [self.ax.plot(x, series_values, label=label, color=color, **self.line_style)[0]
+                      for series_values, (_, label, color) in zip(values, self.series)]
+        self.area = None
+        if self.fill:
+            self.area = self.ax.fill_between(x, values[0], alpha=0.3, color=self.series[0][2])
+        # Months are plotted at integer positions with text ticks, so
+        # new months never pile up on a categorical axis
+        self.ax.set_xticks(list(x), months)
+        self.style()
+
+    def style(self):
+        ax = self.ax
+        ax.set_title(self.title, fontsize=16, fontweight='bold', pad=20)
+        ax.set_xlabel("Month", fontsize=12, fontweight='bold')
+        ax.set_ylabel(self.ylabel, fontsize=12, fontweight='bold')
+        currency_axis(ax)
+        if len(self.series) > 1:
+            ax.legend(fontsize=11, frameon=True, fancybox=True, shadow=True)
+        ax.grid(True, alpha=0.3)
+        # Rotate x-axis labels for better readability
+        ax.tick_params(axis='x', labelrotation=45)
+
+    def refresh(self, data):
+        months, values = data
+        x = range(len(months))
+        for line, series_values in zip(self.lines, values):
+            line.set_data(x, series_values)
+        if self.fill:
+            self.area = update_fill(self.ax, self.area, x, values[0], alpha=0.3, color=self.series[0][2])
+        self.ax.set_xticks(list(x), months)
+        self.ax.relim()
+        if self.fill:
+            self.ax.update_datalim([(0, 0)])  # relim skips the fill, which reaches down to zero
+        self.ax.autoscale_view()
+
+    def artists(self):
+        return self.lines + ([self.area] if self.area is not None else [])
+
+class ExpenseTrendView(MonthlyTrendView):
+    """Expenses over the last 12 months with the area underneath filled"""
+
+    transaction_type = "expense"
+    series = (("expense", "Expense", ModernStyle.DANGER),)
+    line_style = {'marker': 'o', 'linewidth': 3, 'markersize': 8, 'markerfacecolor': 'white',
+                  'markeredgecolor': ModernStyle.DANGER, 'markeredgewidth': 2}
+    fill = True
+    title = "📉 Expense Trend (Last 12 Months)"
+    ylabel = "Expense Amount (₹)"
+
+class DashboardTrendView(MonthlyTrendView):
+    """Small income vs expense chart of the last 6 months for the dashboard"""
+
+    figsize = (6, 3)
+    months = 6
+    series = (("income", "Income", ModernStyle.SUCCESS), ("expense", "Expense", ModernStyle.DANGER))
+    line_style = {'marker': 'o', 'linewidth': 2}
+
+    def style(self):
+        self.ax.set_title("Last 6 Months Trend", fontsize=12, fontweight='bold')
+        self.ax.legend()
+        self.ax.grid(True, alpha=0.3)
+        self.ax.tick_params(axis='x', labelrotation=45)
+
+class CategoryPieView(ChartView):
+    """Expenses by category as a pie; wedges are re-angled in place while the categories stay the same"""
+
+    figsize = (10, 8)
+    top = None
+    autopct = '%1.1f%%'
+    pie_style = {'startangle': 90, 'textprops': {'fontsize': 10}}
+    empty_fontsize = 14
+
+    def __init__(self, figure=ChartFigure, month=None):
+        self.month = month  # 'YYYY-MM', or None for all time
+        super().__init__(figure)
+
+    def load(self, db):
+        categories = get_category_totals(db, "expense", self.month)
+        labels = list(categories.keys())[:self.top]
+        return labels, [categories[label] for label in labels]
+
+    def build(self, data):
+        labels, sizes = data
+        self.labels = labels
+        self.wedges, self.texts, self.autotexts = [], [], []
+        if not labels:
+            self.ax.axis('off')
+            self.ax.text(0.5, 0.5, 'No expense data available',
+                        horizontalalignment='center', verticalalignment='center',
+                        transform=self.ax.transAxes, fontsize=self.empty_fontsize)
+            return
+        self.wedges, self.texts, self.autotexts = self.ax.pie(
+            sizes, labels=labels, autopct=self.autopct, colors=PIE_COLORS[:len(labels)], **self.pie_style)
+        self.style()
+
+    def style(self):
+        # Enhance the appearance
+        for autotext in self.autotexts:
+            autotext.set_color('white')
+            autotext.set_fontweight('bold')
+        title = "🥧 Expense Breakdown by Category"
+        if self.month:
+            title += f" ({month_name(self.month)})"
+        self.ax.set_title(title, fontsize=16, fontweight='bold', pad=20)
+
+    def refresh(self, data):
+        labels, sizes = data
+        if not labels or labels != self.labels:
+            super().refresh(data)
+            return
+
+        # Same categories: turn the existing wedges and move their labels,
+        # using pie()'s own geometry (radius 1, labels at 1.1, values at 0.6)
+        total = sum(sizes) or 1
+        theta1 = self.pie_style.get('startangle', 0)
+        for wedge, text, autotext, size in zip(self.wedges, self.texts, self.autotexts, sizes):
+            theta2 = theta1 + 360 * size / total
+            wedge.set_theta1(theta1)
+            wedge.set_theta2(theta2)
+            middle = math.radians((theta1 + theta2) / 2)
+            x, y = math.cos(middle), math.sin(middle)
+            text.set_position((1.1 * x, 1.1 * y))
+            text.set_horizontalalignment('left' if x > 0 else 'right')
+            autotext.set_position((0.6 * x, 0.6 * y))
+            autotext.set_text(self.autopct % (100 * size / total))
+            theta1 = theta2
+
+    def artists(self):
+        return self.wedges + self.texts + self.autotexts
+
+class DashboardCategoriesView(CategoryPieView):
+    """Small pie of the top 5 expense categories for the dashboard"""
+
+    figsize = (6, 3)
+    top = 5
+    pie_style = {}
+    empty_fontsize = 10
+
+    def style(self):
+        self.ax.set_title("Top Expense Categories", fontsize=12, fontweight='bold')
+
+class CashFlowProjectionView(ChartView):
+    """Projected daily balance over the next ``horizon_days`` days"""
+
+    def __init__(self, figure=ChartFigure, horizon_days=365):
+        self.horizon_days = horizon_days
+        super().__init__(figure)
+
+    def load(self, db):
+        projection = CashFlowProjection(db).project(horizon_days=self.horizon_days)
+        return projection['dates'].astype(object), projection['balance']
+
+    def build(self, data):
+        dates, balance = data
+        ax = self.ax
+        self.line, = ax.plot(dates, balance, color=ModernStyle.PRIMARY, linewidth=2)
+        self.area = ax.fill_between(dates, balance, 0, where=balance < 0, alpha=0.3, color=ModernStyle.DANGER)
+        ax.axhline(0, color=ModernStyle.GRAY, linewidth=1)
+
+        ax.set_title("🔮 Projected Balance (Next 12 Months)", fontsize=16, fontweight='bold', pad=20)
+        ax.set_xlabel("Date", fontsize=12, fontweight='bold')
+        ax.set_ylabel("Balance (₹)", fontsize=12, fontweight='bold')
+        currency_axis(ax)
+        ax.grid(True, alpha=0.3)
+        ax.tick_params(axis='x', labelrotation=45)
+
+    def refresh(self, data):
+        dates, balance = data
+        self.line.set_data(dates, balance)
+        self.area = update_fill(self.ax, self.area, dates, balance, 0, where=balance < 0,
+                                alpha=0.3, color=ModernStyle.DANGER)
+        self.ax.relim()
+        self.ax.autoscale_view()
+
+    def artists(self):
+        return [self.line, self.area]
+
+class TimelineView(ChartView):
+    """Income and expense over any date window, bucketed by day, week, month or year to fit it.
+
+    ``window`` is the (start, end) range on screen, or None to follow the
+    whole ledger. An update reads only the aggregate buckets of the window
+    and half a window either side, so a short pan still has data, and
+    thins each series to ``max_points`` per window with LTTB.
+    """
+
+    series = (("income", "Income", ModernStyle.SUCCESS), ("expense", "Expense", ModernStyle.DANGER))
+    bucket_steps = {"day": ("D", 1), "week": ("D", 7), "month": ("M", 1), "year": ("Y", 1)}
+
+    def __init__(self, figure=ChartFigure, start=None, end=None, max_points=TIMELINE_MAX_POINTS):
+        self.window = (start, end) if start and end else None
+        self.max_points = max_points
+        super().__init__(figure)
+
+    def load(self, db):
+        start, end = self.window or get_ledger_span(db)
+        granularity = pick_granularity(start, end) if start else "month"
+        margin = (end - start) / 2 if start else None
+        totals = get_period_totals(db, granularity, start - margin, end + margin) if start else {}
+        if not totals:
+            return granularity, [(np.array([], dtype="datetime64[D]"), np.array([])) for _ in self.series]
+        # Every bucket in the range, so days without transactions read as zero
+        # rather than a line drawn straight across them
+        unit, step = self.bucket_steps[granularity]
+        first, last = np.datetime64(min(totals), unit), np.datetime64(max(totals), unit)
+        x = np.arange(first, last + step, step).astype("datetime64[D]")
+        series = []
+        for kind, _, _ in self.series:
+            y = np.array([totals.get(str(bucket), {}).get(kind, 0) for bucket in x], dtype=float)
+            keep = lttb(x.astype("int64"), y, self.max_points * 2)
+            series.append((x[keep], y[keep]))
+        return granularity, series
+
+    def build(self, data):
+        granularity, series = data
+        ax = self.ax
+        self.lines = [ax.plot(x, y, label=label, color=color, linewidth=1.5)[0]
+                      for (x, y), (_, label, color) in zip(series, self.series)]
+        locator = mdates.AutoDateLocator()
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+        ax.set_ylabel("Amount (₹)", fontsize=12, fontweight='bold')
+        currency_axis(ax)
+        ax.legend(fontsize=11, frameon=True, fancybox=True, shadow=True)
+        ax.grid(True, alpha=0.3)
+        self.set_title(granularity)
+        if self.window:
+            ax.set_xlim(*self.window)
+            self.scale_y(series)
+
+    def set_title(self, granularity):
+        self.ax.set_title(f"🕒 Income vs Expense per {granularity}", fontsize=16, fontweight='bold', pad=20)
+
+    def scale_y(self, series):
+        """Fit the y-axis to the points inside the window"""
+        start, end = np.datetime64(self.window[0], "D"), np.datetime64(self.window[1], "D")
+        visible = [y[(x >= start) & (x <= end)] for x, y in series]
+        top = max((values.max() for values in visible if len(values)), default=0)
+        self.ax.set_ylim(0, top * 1.05 or 1)
+
+    def refresh(self, data):
+        granularity, series = data
+        for line, (x, y) in zip(self.lines, series):
+            line.set_data(x, y)
+        self.set_title(granularity)
+        if self.window:
+            self.scale_y(series)
+        else:
+            self.ax.relim()
+            self.ax.autoscale_view()
+
+    def follow_axes(self):
+        """Take the window from the current x-axis limits (after a zoom or pan)"""
+        low, high = mdates.date2num(date(1900, 1, 1)), mdates.date2num(date(2199, 12, 31))
+        x0, x1 = (min(max(x, low), high) for x in self.ax.get_xlim())
+        self.window = (mdates.num2date(x0).date(), mdates.num2date(x1).date())
+
+    def artists(self):
+        return self.lines
+
+class StatementSummaryView(ChartView):
+    """One month's totals against the month before, and its expenses by category, as tables"""
+
+    figsize = (8.27, 11.69)  # A4 portrait, the first page of a statement
+    max_categories = 15
+
+    def __init__(self, figure=ChartFigure, month=None):
+        self.month = month  # 'YYYY-MM' (default: the latest month with transactions)
+        super().__init__(figure)
+
+    def load(self, db):
+        monthly = get_monthly_totals(db)
+        month = self.month or max(monthly, default=date.today().strftime("%Y-%m"))
+        previous = max((m for m in monthly if m < month), default=None)
+        categories = get_category_totals(db, "expense", month)
+        return month, monthly.get(month, {"income": 0, "expense": 0}), previous and monthly[previous], categories
+
+    def build(self, data):
+        month, current, previous, categories = data
+        ax = self.ax
+        ax.axis('off')
+        ax.set_title(f"Statement for {month_name(month)}", fontsize=16, fontweight='bold', pad=20)
+
+        rows = []
+        for label, value in (("Income", lambda t: t["income"]), ("Expenses", lambda t: t["expense"]),
+                             ("Net", lambda t: t["income"] - t["expense"])):
+            before = value(previous) if previous else None
+            change = "" if before is None else f"{value(current) - before:+,.2f}"
+            rows.append([label, f"₹{value(current):,.2f}", "" if before is None else f"₹{before:,.2f}", change])
+        totals = ax.table(cellText=rows, colLabels=["", "This month", "Previous month", "Change"],
+                          bbox=[0, 0.82, 1, 0.16], cellLoc='right')
+
+        spent = sum(categories.values()) or 1
+        items = list(categories.items())
+        if len(items) > self.max_categories:
+            rest = sum(amount for _, amount in items[self.max_categories - 1:])
+            items = items[:self.max_categories - 1] + [("All other", rest)]
+        category_rows = [[name, f"₹{amount:,.2f}", f"{100 * amount / spent:.1f}%"] for name, amount in items]
+        if category_rows:
+            height = 0.04 * (len(category_rows) + 1)
+            by_category = ax.table(cellText=category_rows, colLabels=["Category", "Spent", "Share"],
+                                   bbox=[0, 0.74 - height, 1, height], cellLoc='right')
+        else:
+            by_category = None
+            ax.text(0.5, 0.7, "No expenses this month", ha='center', transform=ax.transAxes, fontsize=12)
+
+        for table in filter(None, (totals, by_category)):
+            table.auto_set_font_size(False)
+            table.set_fontsize(10)
+            for (row, _), cell in table.get_celld().items():
+                if row == 0:
+                    cell.set_text_props(fontweight='bold', color='white')
+                    cell.set_facecolor(ModernStyle.PRIMARY)
+
+# Charts by name, for background jobs, the render cache and plot_chart
+CHARTS = {
+    "monthly_summary": MonthlyTrendView,
+    "category_breakdown": CategoryPieView,
+    "expense_trend": ExpenseTrendView,
+    "cash_flow_projection": CashFlowProjectionView,
+    "dashboard_trend": DashboardTrendView,
+    "dashboard_categories": DashboardCategoriesView,
+    "timeline": TimelineView,
+    "statement_summary": StatementSummaryView,
+}
+
+# Charts drawn from the transactions table alone, so the ledger's data
+# version says when they change (the projection also depends on the
+# recurring items and today's date)
+LEDGER_CHARTS = {"monthly_summary", "category_breakdown", "expense_trend",
+                 "dashboard_trend", "dashboard_categories", "timeline", "statement_summary"}
+
+def render_png(fig, size=None, dpi=100):
+    """Draw a figure with the Agg backend and return PNG bytes, resized to ``size`` pixels if given.
+
+    Needs no display and touches no pyplot state, so it is safe off the Tk thread.
+    """
+    if size and tuple(round(v * dpi) for v in fig.get_size_inches()) != tuple(size):
+        fig.set_size_inches(size[0] / dpi, size[1] / dpi)
+        fig.tight_layout()
+    FigureCanvasAgg(fig)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=dpi)
+    return buffer.getvalue()
+
+# One long-lived view per chart and parameters for off-screen rendering
+_views = {}
+_views_lock = threading.Lock()
+
+def render_chart(db, chart, size=None, **params):
+    """Update the shared view of a chart from ``db`` and return it as PNG bytes"""
+    key = (chart, tuple(sorted(params.items())))
+    with _views_lock:
+        view = _views.get(key)
+        if view is None:
+            view = _views[key] = CHARTS[chart](**params)
+    with view.lock:
+        view.update(db)
+        return render_png(view.figure, size)
+
+def close_views():
+    """Close the figures of every shared view (at shutdown)"""
+    with _views_lock:
+        views = list(_views.values())
+        _views.clear()
+    for view in views:
+        with view.lock:
+            view.close()
+
+def _on_draw(canvas):
+    # After a full draw, remember the picture without the data artists
+    # and put them back on top, so later updates can be blitted
+    view = canvas.view
+    canvas.background = canvas.copy_from_bbox(view.figure.bbox)
+    for artist in view.artists():
+        view.figure.draw_artist(artist)
+
+def refresh_canvas(canvas):
+    """Reload an embedded chart in place: blit the data artists if the axes did not move, else redraw"""
+    view = canvas.view
+    ax = view.ax
+    before = (ax.get_position().bounds, ax.get_xlim(), ax.get_ylim(), [t.get_text() for t in ax.get_xticklabels()])
+    view.update(ui_session())
+    for artist in view.artists():
+        artist.set_animated(True)
+    after = (ax.get_position().bounds, ax.get_xlim(), ax.get_ylim(), [t.get_text() for t in ax.get_xticklabels()])
+
+    if before == after and getattr(canvas, "background", None) is not None:
+        canvas.restore_region(canvas.background)
+        for artist in view.artists():
+            view.figure.draw_artist(artist)
+        canvas.blit(view.figure.bbox)
+    else:
+        canvas.draw_idle()
+    return canvas
+
+def embed_chart_in_window(parent, view, canvas_holder=None):
+    """Embed a chart view into a Tkinter window; passing the returned canvas back refreshes it in place"""
+    if canvas_holder is not None and getattr(canvas_holder, "view", None) is view:
+        return refresh_canvas(canvas_holder)
+    if canvas_holder is not None:
         canvas_holder.get_tk_widget().destroy()
-    canvas = FigureCanvasTkAgg(fig, master=parent)
+
+    canvas = FigureCanvasTkAgg(view.figure, master=parent)
+    canvas.view = view
+    for artist in view.artists():
+        artist.set_animated(True)
+    canvas.mpl_connect("draw_event", lambda event: _on_draw(canvas))
     canvas.draw()
-    canvas.get_tk_widget().pack(fill="both", expand=True)
+    widget = canvas.get_tk_widget()
+    widget.pack(fill="both", expand=True)
+    # The figure goes with its widget
+    widget.bind("<Destroy>", lambda e: view.close() if e.widget is widget else None)
     return canvas
 
+def plot_chart(chart, parent=None, canvas_holder=None, **params):
+    """Embed a chart in a Tk parent (refreshing ``canvas_holder`` in place), or return its Figure to save.
+
+    Without a parent nothing needs a display: the figure is not managed
+    by pyplot and can be written with ``savefig``.
+    """
+    if canvas_holder is not None and getattr(canvas_holder, "view", None):
+        return refresh_canvas(canvas_holder)
+    view = CHARTS[chart](**params)
+    view.update(ui_session())
+    if parent is None:
+        return view.figure
+    return embed_chart_in_window(parent, view)
+
 # Example: Monthly Summary
 def plot_monthly_summary(parent=None, canvas_holder=None):
-    transactions = db.query(Transaction).all()
-    monthly = defaultdict(lambda: {"income": 0, "expense": 0})
-    for t in transactions:
-        try:
-            # Handle different date formats
-            if len(t.date.split('-')) == 3:
-                month = datetime.strptime(t.date, "%Y-%m-%d").strftime("%Y-%m")
-            else:
-                # Handle other formats like '2 07 2008'
-                parts = t.date.split()
-                if len(parts) == 3:
-                    day, month_num, year = parts
-                    month = f"{year}-{month_num.zfill(2)}"
-                else:
-                    continue  # Skip invalid dates
-            monthly[month][t.type] += t.amount
-        except (ValueError, AttributeError):
-            continue  # Skip invalid dates
-
-    months = sorted(monthly.keys())[-12:]  # Last 12 months
-    income = [monthly[m]["income"] for m in months]
-    expense = [monthly[m]["expense"] for m in months]
-
-    fig, ax = plt.subplots(figsize=(12, 6))
-    fig.patch.set_facecolor('white')
-    
-    # Plot with modern colors
-    ax.plot(months, income, label="💰 Income", marker='o', 
-           color=ModernStyle.SUCCESS, linewidth=3, markersize=8)
-    ax.plot(months, expense, label="💸 Expense", marker='o', 
-           color=ModernStyle.DANGER, linewidth=3, markersize=8)
-    
-    ax.set_title("📈 Monthly Income vs Expense Trend", fontsize=16, fontweight='bold', pad=20)
-    ax.set_xlabel("Month", fontsize=12, fontweight='bold')
-    ax.set_ylabel("Amount (₹)", fontsize=12, fontweight='bold')
-    
-    # Format y-axis to show currency
-    ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'₹{x:,.0f}'))
-    
-    ax.legend(fontsize=11, frameon=True, fancybox=True, shadow=True)
-    ax.grid(True, alpha=0.3)
-    
-    # Rotate x-axis labels for better readability
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-
-    if parent:
-        return embed_chart_in_window(parent, fig, canvas_holder)
-    else:
-        plt.show()
+    return plot_chart("monthly_summary", parent, canvas_holder)
 
 def plot_category_breakdown(parent=None, canvas_holder=None):
     """Create a pie chart showing expense breakdown by category"""
-    transactions = db.query(Transaction).filter(Transaction.type == "expense").all()
-    categories = defaultdict(float)
-    
-    for t in transactions:
-        categories[t.category or "Other"] += t.amount
-        
-    if not categories:
-        fig, ax = plt.subplots(figsize=(8, 6))
-        ax.text(0.5, 0.5, 'No expense data available', 
-               horizontalalignment='center', verticalalignment='center',
-               transform=ax.transAxes, fontsize=14)
-        ax.set_title("🥧 Expense Categories")
-    else:
-        labels = list(categories.keys())
-        sizes = list(categories.values())
-        
-        fig, ax = plt.subplots(figsize=(10, 8))
-        fig.patch.set_facecolor('white')
-        
-        colors = [ModernStyle.PRIMARY, ModernStyle.SECONDARY, ModernStyle.SUCCESS, 
-                 ModernStyle.DANGER, ModernStyle.GRAY, '#FF6B6B', '#4ECDC4', '#45B7D1']
-        
-        wedges, texts, autotexts = ax.pie(sizes, labels=labels, autopct='%1.1f%%', 
-                                         colors=colors[:len(labels)], startangle=90,
-                                         textprops={'fontsize': 10})
-        
-        # Enhance the appearance
-        for autotext in autotexts:
-            autotext.set_color('white')
-            autotext.set_fontweight('bold')
-            
-        ax.set_title("🥧 Expense Breakdown by Category", fontsize=16, fontweight='bold', pad=20)
-        
-    plt.tight_layout()
-    
-    if parent:
-        return embed_chart_in_window(parent, fig, canvas_holder)
-    else:
-        plt.show()
+    return plot_chart("category_breakdown", parent, canvas_holder)
 
 def plot_expense_trend(parent=None, canvas_holder=None):
     """Create a line chart showing expense trend over last 12 months"""
-    transactions = db.query(Transaction).filter(Transaction.type == "expense").all()
-    monthly_expenses = defaultdict(float)
-    
-    for t in transactions:
-        try:
-            # Handle different date formats
-            if len(t.date.split('-')) == 3:
-                month = datetime.strptime(t.date, "%Y-%m-%d").strftime("%Y-%m")
-            else:
-                # Handle other formats like '2 07 2008'
-                parts = t.date.split()
-                if len(parts) == 3:
-                    day, month_num, year = parts
-                    month = f"{year}-{month_num.zfill(2)}"
-                else:
-                    continue  # Skip invalid dates
-            monthly_expenses[month] += t.amount
-        except (ValueError, AttributeError):
-            continue  # Skip invalid dates
-        
-    months = sorted(monthly_expenses.keys())[-12:]  # Last 12 months
-    expenses = [monthly_expenses[m] for m in months]
-    
-    fig, ax = plt.subplots(figsize=(12, 6))
-    fig.patch.set_facecolor('white')
-    
-    ax.plot(months, expenses, marker='o', color=ModernStyle.DANGER, 
-           linewidth=3, markersize=8, markerfacecolor='white', 
-           markeredgecolor=ModernStyle.DANGER, markeredgewidth=2)
-    
-    # Fill area under the curve
-    ax.fill_between(months, expenses, alpha=0.3, color=ModernStyle.DANGER)
-    
-    ax.set_title("📉 Expense Trend (Last 12 Months)", fontsize=16, fontweight='bold', pad=20)
-    ax.set_xlabel("Month", fontsize=12, fontweight='bold')
-    ax.set_ylabel("Expense Amount (₹)", fontsize=12, fontweight='bold')
-    
-    # Format y-axis
-    ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'₹{x:,.0f}'))
-    
-    ax.grid(True, alpha=0.3)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    
-    if parent:
-        return embed_chart_in_window(parent, fig, canvas_holder)
-    else:
-        plt.show()
+    return plot_chart("expense_trend", parent, canvas_holder)
+
+def plot_cash_flow_projection(parent=None, canvas_holder=None, horizon_days=365):
+    """Create a line chart of the projected daily balance over the next year"""
+    return plot_chart("cash_flow_projection", parent, canvas_holder, horizon_days=horizon_days)
+
+def plot_timeline(parent, start=None, end=None, reload_ms=150):
+    """Embed a zoomable timeline: scroll to zoom around the cursor, or pan and zoom with the toolbar.
+
+    Each new range is re-read at the granularity that fits it once the
+    axes have been still for ``reload_ms``.
+    """
+    view = TimelineView(start=start, end=end)
+    view.update(ui_session())
+    canvas = embed_chart_in_window(parent, view)
+    widget = canvas.get_tk_widget()
+    toolbar = NavigationToolbar2Tk(canvas, parent, pack_toolbar=False)
+    toolbar.update()
+    toolbar.pack(side="bottom", fill="x", before=widget)
+
+    pending = []
+
+    def reload():
+        pending.clear()
+        if widget.winfo_exists():
+            view.follow_axes()
+            refresh_canvas(canvas)
+
+    def on_xlim_changed(ax):
+        if pending:
+            widget.after_cancel(pending.pop())
+        pending.append(widget.after(reload_ms, reload))
+
+    def on_scroll(event):
+        if event.inaxes is not view.ax:
+            return
+        factor = 1 / 1.25 if event.button == "up" else 1.25
+        x0, x1 = view.ax.get_xlim()
+        view.ax.set_xlim(event.xdata - (event.xdata - x0) * factor, event.xdata + (x1 - event.xdata) * factor)
+        canvas.draw_idle()
+
+    view.ax.callbacks.connect("xlim_changed", on_xlim_changed)
+    canvas.mpl_connect("scroll_event", on_scroll)
+    return canvas
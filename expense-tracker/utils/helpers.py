@@ -0,0 +1,65 @@
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+# Formats seen in the ledger, tried in order. The space separated
+# day/month/year form comes from older CSV imports ('2 07 2008').
+DATE_FORMATS = ("%Y-%m-%d", "%d %m %Y", "%d-%m-%Y", "%d/%m/%Y", "%Y/%m/%d")
+
+def parse_date(value):
+    """Parse a stored or user supplied date into a date object (None if invalid)"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+
+    text = " ".join(str(value).split())
+    if not text:
+        return None
+
+    # Fast path for the stored ISO form, which is most of what is parsed
+    if len(text) == 10 and text[4] == "-" and text[7] == "-":
+        try:
+            return date.fromisoformat(text)
+        except ValueError:
+            pass
+
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def content_hash(date_value, amount, transaction_type, category, notes):
+    """Hash of a transaction's normalized content, used to spot re-imported rows.
+
+    Dates are compared as parsed days, amounts to the paisa, and text
+    case- and whitespace-insensitively, so the same bank line exported
+    twice in slightly different formats hashes the same.
+    """
+    parsed = parse_date(date_value)
+    return iso_content_hash(parsed.isoformat() if parsed else str(date_value or "").strip(),
+                            amount, transaction_type, category, notes)
+
+def iso_content_hash(day, amount, transaction_type, category, notes):
+    """content_hash of a row whose date is already an ISO string, for bulk paths that skip parse_date"""
+    parts = (
+        day,
+        f"{float(amount or 0):.2f}",
+        str(transaction_type or "").strip().lower(),
+        " ".join(str(category or "").split()).lower(),
+        " ".join(str(notes or "").split()).lower(),
+    )
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+def process_pool(workers, **kwargs):
+    """A ProcessPoolExecutor whose workers are spawned, never forked.
+
+    The app has SQLite connections and threads open, which a forked
+    worker would inherit in whatever state they were in.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"), **kwargs)
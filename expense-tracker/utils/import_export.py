@@ -1,192 +1,259 @@
-import csv
-import json
 import os
 from datetime import datetime
-from services.database import SessionLocal, Transaction
+from services.database import SessionLocal
+from services.importer import CSVImporter
+from services.ingest import ingest_files
+from services.exporter import TransactionExporter
+from services.columnar import export_columnar, import_columnar
+from services.backup import BackupService
+from services.restore import restore_database
 from tkinter import filedialog, messagebox
-import shutil
 
 class ImportExport:
     def __init__(self):
         self.db = SessionLocal()
     
     def export_to_csv(self, filename=None):
-        """Export all transactions to CSV file"""
+        """Export all transactions to CSV file (gzipped for .csv.gz)"""
         try:
             if not filename:
                 filename = filedialog.asksaveasfilename(
                     defaultextension=".csv",
-                    filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+                    filetypes=[("CSV files", "*.csv"), ("Gzipped CSV", "*.csv.gz"), ("All files", "*.*")],
                     title="Export Transactions to CSV"
                 )
             
             if not filename:
                 return False
             
-            transactions = self.db.query(Transaction).all()
-            
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = ['id', 'date', 'amount', 'type', 'category', 'notes']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                
-                writer.writeheader()
-                for t in transactions:
-                    writer.writerow({
-                        'id': t.id,
-                        'date': t.date,
-                        'amount': t.amount,
-                        'type': t.type,
-                        'category': t.category or '',
-                        'notes': t.notes or ''
-                    })
-            
-            messagebox.showinfo("Success", f"Exported {len(transactions)} transactions to {filename}")
+            count = TransactionExporter(self.db).export_csv(filename)
+            
+            messagebox.showinfo("Success", f"Exported {count} transactions to {filename}")
             return True
             
         except Exception as e:
             messagebox.showerror("Error", f"Export failed: {str(e)}")
             return False
     
-    def import_from_csv(self, filename=None):
-        """Import transactions from CSV file"""
-        try:
-            if not filename:
-                filename = filedialog.askopenfilename(
-                    filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-                    title="Import Transactions from CSV"
-                )
+    @staticmethod
+    def ask_csv_files():
+        """Ask for one or more CSV files to import; returns their names (empty if cancelled)"""
+        return list(filedialog.askopenfilenames(
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+            title="Import Transactions from CSV"
+        ))
+    
+    def import_csv_files(self, filenames, progress=None):
+        """Import CSV files (ledger exports or bank statements) and return a summary message.
+
+        Shows no dialogs, so it can run in a worker thread with its own ImportExport.
+        """
+        rejected, failed = [], []
+        
+        if len(filenames) == 1:
+            def on_reject(line_number, row, reason):
+                # Keep the first few for the summary; the count covers the rest
+                if len(rejected) < 10:
+                    rejected.append(f"Line {line_number}: {reason}")
             
-            if not filename:
+            stats = CSVImporter(self.db).import_file(filenames[0], progress=progress, on_reject=on_reject)
+        else:
+            # Several statements: parse them in parallel, one process per file
+            stats = {'imported': 0, 'rejected': 0, 'duplicates': 0, 'fraction': 0.0}
+            
+            def on_file(name, file_stats):
+                for key in ('imported', 'rejected', 'duplicates'):
+                    stats[key] += file_stats[key]
+                stats['fraction'] += 1 / len(filenames)
+                if progress:
+                    progress(dict(stats))
+            
+            def on_reject(name, line_number, reason):
+                if len(rejected) < 10:
+                    rejected.append(f"{os.path.basename(name)} line {line_number}: {reason}")
+            
+            results = ingest_files(filenames, self.db, progress=on_file, on_reject=on_reject)
+            failed = [f"{os.path.basename(name)}: {result['error']}"
+                      for name, result in results.items() if 'error' in result]
+        
+        message = f"Imported {stats['imported']} transactions from {len(filenames) - len(failed)} file(s)"
+        if stats['duplicates']:
+            message += f"\n\nSkipped {stats['duplicates']} rows already in the ledger"
+        if stats['rejected']:
+            message += f"\n\nSkipped {stats['rejected']} invalid rows:\n" + "\n".join(rejected)
+        if failed:
+            message += f"\n\nCould not import {len(failed)} file(s):\n" + "\n".join(failed)
+        return message
+    
+    def import_from_csv(self, filename=None, progress=None):
+        """Import transactions from one or more CSV files (ledger exports or bank statements)"""
+        try:
+            filenames = [filename] if filename else self.ask_csv_files()
+            if not filenames:
                 return False
             
-            imported_count = 0
-            
-            with open(filename, 'r', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                
-                for row in reader:
-                    # Validate required fields
-                    if not all(key in row for key in ['date', 'amount', 'type']):
-                        continue
-                    
-                    try:
-                        # Create new transaction
-                        transaction = Transaction(
-                            date=row['date'],
-                            amount=float(row['amount']),
-                            type=row['type'].lower(),
-                            category=row.get('category', ''),
-                            notes=row.get('notes', '')
-                        )
-                        
-                        # Validate type
-                        if transaction.type not in ['income', 'expense']:
-                            continue
-                        
-                        self.db.add(transaction)
-                        imported_count += 1
-                        
-                    except (ValueError, TypeError):
-                        continue  # Skip invalid rows
-                
-                self.db.commit()
-            
-            messagebox.showinfo("Success", f"Imported {imported_count} transactions from CSV")
+            messagebox.showinfo("Success", self.import_csv_files(filenames, progress))
             return True
             
         except Exception as e:
             messagebox.showerror("Error", f"Import failed: {str(e)}")
             return False
     
-    def export_to_json(self, filename=None):
-        """Export all transactions to JSON file"""
+    def export_to_json(self, filename=None, ndjson=None):
+        """Export all transactions to JSON file (NDJSON for .ndjson, gzipped for .gz)"""
         try:
             if not filename:
                 filename = filedialog.asksaveasfilename(
                     defaultextension=".json",
-                    filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+                    filetypes=[("JSON files", "*.json"), ("NDJSON files", "*.ndjson"),
+                               ("Gzipped JSON", "*.json.gz *.ndjson.gz"), ("All files", "*.*")],
                     title="Export Transactions to JSON"
                 )
             
             if not filename:
                 return False
             
-            transactions = self.db.query(Transaction).all()
+            if ndjson is None:
+                ndjson = filename.endswith((".ndjson", ".ndjson.gz"))
+            count = TransactionExporter(self.db).export_json(filename, ndjson=ndjson)
             
-            data = {
-                'export_date': datetime.now().isoformat(),
-                'transactions': []
-            }
+            messagebox.showinfo("Success", f"Exported {count} transactions to JSON")
+            return True
             
-            for t in transactions:
-                data['transactions'].append({
-                    'id': t.id,
-                    'date': t.date,
-                    'amount': t.amount,
-                    'type': t.type,
-                    'category': t.category,
-                    'notes': t.notes
-                })
+        except Exception as e:
+            messagebox.showerror("Error", f"JSON export failed: {str(e)}")
+            return False
+    
+    def export_changes(self, filename=None, feed="default"):
+        """Export only the transactions changed since this feed's last export (NDJSON)"""
+        try:
+            if not filename:
+                filename = filedialog.asksaveasfilename(
+                    defaultextension=".ndjson",
+                    filetypes=[("NDJSON files", "*.ndjson"), ("CSV files", "*.csv"),
+                               ("Gzipped", "*.ndjson.gz *.csv.gz"), ("All files", "*.*")],
+                    title="Export Changes Since Last Export"
+                )
+            
+            if not filename:
+                return False
             
-            with open(filename, 'w', encoding='utf-8') as jsonfile:
-                json.dump(data, jsonfile, indent=2, ensure_ascii=False)
+            file_format = "csv" if filename.endswith((".csv", ".csv.gz")) else "ndjson"
+            count = TransactionExporter(self.db).export_changes(filename, feed=feed, file_format=file_format)
             
-            messagebox.showinfo("Success", f"Exported {len(transactions)} transactions to JSON")
+            messagebox.showinfo("Success", f"Exported {count} changed transactions to {filename}")
             return True
             
         except Exception as e:
-            messagebox.showerror("Error", f"JSON export failed: {str(e)}")
+            messagebox.showerror("Error", f"Change export failed: {str(e)}")
             return False
     
-    def backup_database(self):
-        """Create a backup of the database file"""
+    def export_to_parquet(self, filename=None):
+        """Export all transactions to a Parquet (or Arrow IPC, by extension) file"""
         try:
-            backup_filename = filedialog.asksaveasfilename(
-                defaultextension=".db",
-                filetypes=[("Database files", "*.db"), ("All files", "*.*")],
-                title="Backup Database",
-                initialname=f"expense_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-            )
-            
-            if not backup_filename:
+            if not filename:
+                filename = filedialog.asksaveasfilename(
+                    defaultextension=".parquet",
+                    filetypes=[("Parquet files", "*.parquet"), ("Arrow IPC files", "*.arrow *.feather"),
+                               ("All files", "*.*")],
+                    title="Export Transactions to Parquet"
+                )
+            
+            if not filename:
                 return False
             
-            from config import DB_PATH
-            shutil.copy2(DB_PATH, backup_filename)
+            count = export_columnar(filename, self.db)
             
-            messagebox.showinfo("Success", f"Database backed up to {backup_filename}")
+            messagebox.showinfo("Success", f"Exported {count} transactions to {filename}")
             return True
             
         except Exception as e:
-            messagebox.showerror("Error", f"Backup failed: {str(e)}")
+            messagebox.showerror("Error", f"Parquet export failed: {str(e)}")
             return False
     
-    def restore_database(self):
-        """Restore database from backup file"""
+    @staticmethod
+    def ask_parquet_file():
+        """Ask for a Parquet or Arrow IPC file to import; returns its name (empty if cancelled)"""
+        return filedialog.askopenfilename(
+            filetypes=[("Parquet files", "*.parquet"), ("Arrow IPC files", "*.arrow *.feather"),
+                       ("All files", "*.*")],
+            title="Import Transactions from Parquet"
+        )
+    
+    def import_parquet_file(self, filename, progress=None):
+        """Import a Parquet or Arrow IPC file and return a summary message (no dialogs)"""
+        stats = import_columnar(filename, self.db, progress=progress)
+        
+        message = f"Imported {stats['imported']} transactions from {os.path.basename(filename)}"
+        if stats['duplicates']:
+            message += f"\n\nSkipped {stats['duplicates']} rows already in the ledger"
+        if stats['rejected']:
+            message += f"\n\nSkipped {stats['rejected']} invalid rows"
+        return message
+    
+    def import_from_parquet(self, filename=None, progress=None):
+        """Import transactions from a Parquet or Arrow IPC file"""
         try:
-            backup_filename = filedialog.askopenfilename(
-                filetypes=[("Database files", "*.db"), ("All files", "*.*")],
-                title="Restore Database from Backup"
-            )
-            
-            if not backup_filename:
+            filename = filename or self.ask_parquet_file()
+            if not filename:
                 return False
             
-            # Confirm restore
-            confirm = messagebox.askyesno(
-                "Confirm Restore", 
-                "This will replace all current data. Are you sure you want to restore from backup?"
-            )
+            messagebox.showinfo("Success", self.import_parquet_file(filename, progress))
+            return True
             
-            if not confirm:
+        except Exception as e:
+            messagebox.showerror("Error", f"Parquet import failed: {str(e)}")
+            return False
+    
+    def backup_database(self, filename=None):
+        """Create a consistent backup of the live database (gzipped for .gz)"""
+        try:
+            if not filename:
+                filename = filedialog.asksaveasfilename(
+                    defaultextension=".db.gz",
+                    filetypes=[("Compressed backups", "*.db.gz"), ("Database files", "*.db"), ("All files", "*.*")],
+                    title="Backup Database",
+                    initialfile=f"expense_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db.gz"
+                )
+            
+            if not filename:
                 return False
             
-            from config import DB_PATH
-            shutil.copy2(backup_filename, DB_PATH)
+            BackupService().backup_to(filename)
             
-            messagebox.showinfo("Success", "Database restored successfully. Please restart the application.")
+            messagebox.showinfo("Success", f"Database backed up to {filename}")
             return True
             
         except Exception as e:
-            messagebox.showerror("Error", f"Restore failed: {str(e)}")
-            return False
\ No newline at end of file
+            messagebox.showerror("Error", f"Backup failed: {str(e)}")
+            return False
+    
+    @staticmethod
+    def ask_restore_file():
+        """Ask for a backup to restore and confirm it; returns the file name, or None if cancelled"""
+        backup_filename = filedialog.askopenfilename(
+            filetypes=[("Backups", "*.db.gz *.db"), ("All files", "*.*")],
+            title="Restore Database from Backup"
+        )
+        
+        if not backup_filename:
+            return None
+        
+        # Confirm restore
+        confirm = messagebox.askyesno(
+            "Confirm Restore", 
+            "This will replace all current data. Are you sure you want to restore from backup?"
+        )
+        
+        return backup_filename if confirm else None
+    
+    @staticmethod
+    def restore_backup(backup_filename):
+        """Save the current data, then restore a backup over it; returns the safety backup's name.
+
+        Shows no dialogs, so it can run in a worker thread.
+        """
+        # Keep the data being replaced, in case the wrong file was picked
+        saved = BackupService().create_backup()
+        restore_database(backup_filename)
+        return saved
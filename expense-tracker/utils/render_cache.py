@@ -0,0 +1,127 @@
+"""
+Render cache for charts.
+
+Rendered PNGs are keyed by chart name, parameters, pixel size and the
+ledger's data version (services.changelog.data_version), which moves on
+every write to the transactions table. A key can therefore never serve
+a stale picture: after a write the version differs and the chart is
+drawn again, and until then every view of it is a dictionary lookup.
+
+Entries live in an in-memory LRU and, if a directory is configured, in
+an on-disk tier that survives restarts. Restoring a backup clears both,
+since the restored database reuses version numbers.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from services.changelog import TransactionChange, data_version
+from services.restore import register_restore_hook
+from utils.charts import LEDGER_CHARTS, render_chart
+from config import RENDER_CACHE_ENTRIES, RENDER_CACHE_DIR, RENDER_CACHE_DISK_ENTRIES
+
+# Bump when chart drawing changes so old files on disk are not reused
+CACHE_FORMAT = 3
+
+def ledger_version(db):
+    """The data version plus the time of that change.
+
+    The time keeps keys from a recreated ledger, whose counter starts
+    again from zero, apart from files left on disk by the old one.
+    """
+    version = data_version(db)
+    changed_at = db.query(TransactionChange.changed_at).filter(TransactionChange.seq == version).scalar()
+    return version, str(changed_at)
+
+class RenderCache:
+    """Thread-safe LRU of rendered chart PNGs with an optional directory tier"""
+
+    def __init__(self, max_entries=RENDER_CACHE_ENTRIES, directory=RENDER_CACHE_DIR,
+                 max_disk_entries=RENDER_CACHE_DISK_ENTRIES):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr((CACHE_FORMAT,) + key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + ".png")
+
+    def get(self, key):
+        """Cached PNG for ``key`` (memory first, then disk), or None"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        if self.directory:
+            try:
+                with open(self._path(key), "rb") as f:
+                    png = f.read()
+            except OSError:
+                pass
+            else:
+                self.put(key, png, disk=False)
+                with self._lock:
+                    self.hits += 1
+                return png
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, png, disk=True):
+        """Store a rendering, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[key] = png
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        if disk and self.directory:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                path = self._path(key)
+                with open(path + ".part", "wb") as f:
+                    f.write(png)
+                os.replace(path + ".part", path)
+                self._prune_disk()
+            except OSError as e:
+                print(f"Error writing chart cache: {e}")
+
+    def _prune_disk(self):
+        files = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".png")]
+        if len(files) <= self.max_disk_entries:
+            return
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in files[:len(files) - self.max_disk_entries]:
+            os.unlink(entry.path)
+
+    def clear(self):
+        """Drop every entry, in memory and on disk"""
+        with self._lock:
+            self._entries.clear()
+        if self.directory and os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".png"):
+                    os.unlink(entry.path)
+
+    def render(self, db, chart, size, **params):
+        """PNG of a CHARTS entry at ``size`` pixels, drawn only if the ledger changed since last time"""
+        if chart not in LEDGER_CHARTS:
+            return render_chart(db, chart, size, **params)
+
+        key = (chart, tuple(sorted(params.items())), size and tuple(size), ledger_version(db))
+        png = self.get(key)
+        if png is None:
+            png = render_chart(db, chart, size, **params)
+            self.put(key, png)
+        return png
+
+# Shared by the report window and the dashboard
+chart_cache = RenderCache()
+register_restore_hook(chart_cache.clear)
@@ -0,0 +1,53 @@
+"""
+Level-of-detail helpers for time-series charts.
+
+pick_granularity() chooses the finest bucket (day, week, month, year)
+that keeps a date window under a bucket budget, so a view reads a
+bounded number of pre-aggregated rows however far it is zoomed out.
+lttb() then thins a series that is still denser than the screen with
+Largest-Triangle-Three-Buckets, which keeps the peaks and troughs a
+plain stride would skip.
+"""
+
+import numpy as np
+from config import TIMELINE_MAX_BUCKETS
+
+GRANULARITIES = ("day", "week", "month", "year")
+
+# Average bucket length in days
+BUCKET_DAYS = {"day": 1, "week": 7, "month": 30.44, "year": 365.25}
+
+def pick_granularity(start, end, max_buckets=TIMELINE_MAX_BUCKETS):
+    """Finest granularity with at most ``max_buckets`` buckets between two dates"""
+    span = (end - start).days + 1
+    for granularity in GRANULARITIES:
+        if span / BUCKET_DAYS[granularity] <= max_buckets:
+            return granularity
+    return GRANULARITIES[-1]
+
+def lttb(x, y, threshold):
+    """Indices of at most ``threshold`` points of (x, y) chosen by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; x must be ascending.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # threshold - 2 buckets over the points between the first and the last
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Third corner: the average of the next bucket (the last point for the last bucket)
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected